@@ -0,0 +1,204 @@
+"""
+Command line runner of the model for many inputs files, e.g. for nightly regressions over client inputs.
+
+Every inputs file is expanded lazily into its parameter sets, which are registered in the sys_param table like in the
+app. The parameter sets are simulated in chunks in a pool of worker processes, and their results are written to the
+results store as soon as they finish.
+
+Usage from the root directory of the repository:
+python -m Model.batch data/ --param product_users_after_10y=2600000 --processes 8
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Get the current directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up one folder
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+
+# Append the parent directory to sys.path
+sys.path.append(parent_dir)
+
+from Model.state_variables import get_initial_states_sweep
+from Model.simulation import simulate_parameter_set, simulate_monte_carlo, MONTE_CARLO_RUNS
+from Model.storage import create_results_tables, simulation_data_exists, save_simulation_data
+from Model.result_cache import create_result_cache_table, record_simulation, evict_simulations
+from Model.database import connect_database
+from Model.parts.utils import get_run_seed
+from Model.sweep_grid import SWEEP_CHUNK_SIZE, SWEEP_GRIDS, iterate_chunks
+
+# file name pattern of the QTM radCAD inputs files within a directory
+INPUTS_FILE_PATTERN = '*radCAD_inputs*.csv'
+
+
+def find_input_files(paths):
+    """
+    Get the inputs files of a list of file and directory paths. Directories are searched for QTM radCAD inputs files.
+    """
+    input_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            input_files += sorted(glob.glob(os.path.join(path, INPUTS_FILE_PATTERN)))
+        elif os.path.isfile(path):
+            input_files.append(path)
+        else:
+            raise FileNotFoundError(f"Inputs file or directory {path} does not exist.")
+
+    return input_files
+
+def parse_param_overrides(overrides):
+    """
+    Parse the parameter overrides of the form key=value. Values are parsed as JSON, e.g. numbers, and kept as text
+    otherwise, e.g. dates like 01.12.23.
+    """
+    adjusted_params = {}
+    for override in overrides:
+        if '=' not in override:
+            raise ValueError(f"Parameter override {override} has to be of the form key=value.")
+        key, value = override.split('=', 1)
+        try:
+            adjusted_params[key.strip()] = json.loads(value)
+        except json.JSONDecodeError:
+            adjusted_params[key.strip()] = value
+
+    return adjusted_params
+
+def iterate_scenarios(input_files, adjusted_params, grid, force, param_ids, failures):
+    """
+    Enumerate the parameter sets of the inputs files lazily and register them in the sys_param table. Parameter sets
+    with stored results are skipped unless force is set.
+
+    Parameters:
+    input_files: list of paths of QTM radCAD inputs files
+    adjusted_params: dictionary of parameters overriding the inputs files
+    grid: 'cartesian' or 'zip' grid of the parameter sweeps
+    force: simulate parameter sets again even if their results are stored already
+    param_ids: dictionary which collects the parameter ids per inputs file
+    failures: list which collects the inputs files which could not be loaded
+
+    Yields the inputs file, parameter id, initial state, system parameters and stakeholder name mapping of every
+    parameter set to simulate.
+    """
+    scheduled_param_ids = set()
+    for input_file in input_files:
+        param_ids[input_file] = []
+        conn = None
+        try:
+            initial_states_sweep, stakeholder_name_mapping, stakeholder_names, conn, cur = get_initial_states_sweep(input_file, adjusted_params, grid)
+            create_results_tables(conn)
+            create_result_cache_table(conn)
+            for initial_state, sys_param, param_id, execute_sim in initial_states_sweep:
+                param_ids[input_file].append(param_id)
+                if not execute_sim:
+                    print("Skipping parameter set ", param_id, " of ", input_file, " due to invalid inputs.")
+                elif param_id not in scheduled_param_ids and (force or not simulation_data_exists(conn, param_id)):
+                    scheduled_param_ids.add(param_id)
+                    yield input_file, param_id, initial_state, sys_param, stakeholder_name_mapping
+        except Exception:
+            print("Failed to load inputs file ", input_file, ":\n", traceback.format_exc())
+            failures.append(input_file)
+        finally:
+            if conn is not None:
+                conn.close()
+
+def run_batch(input_files, adjusted_params=None, processes=None, backend=None, force=False, grid='cartesian', chunk_size=SWEEP_CHUNK_SIZE, runs=MONTE_CARLO_RUNS, keep_runs=True):
+    """
+    Simulate all parameter sets of the inputs files in a pool of worker processes and save their results. The
+    parameter sets are enumerated lazily and passed to the worker pool in chunks.
+
+    Parameters:
+    input_files: list of paths of QTM radCAD inputs files
+    adjusted_params: dictionary of parameters overriding the inputs files
+    processes: number of worker processes, defaults to all available cores
+    backend: results backend, 'sqlite' or 'arrow', defaults to the RESULTS_BACKEND of the storage
+    force: simulate parameter sets again even if their results are stored already
+    grid: 'cartesian' or 'zip' grid of the parameter sweeps
+    chunk_size: amount of parameter sets passed to the worker pool at once
+    runs: total amount of Monte Carlo runs per parameter set, stored runs are not simulated again
+    keep_runs: store the simulation data of every Monte Carlo run, otherwise only their summary
+
+    Returns a dictionary of the parameter ids per inputs file and the list of failed inputs files and parameter sets.
+    """
+    adjusted_params = {} if adjusted_params is None else adjusted_params
+    start_time = time.time()
+    param_ids = {}
+    failures = []
+    simulated_param_ids = []
+
+    conn = connect_database()
+    processes = processes if processes is not None else os.cpu_count()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk in iterate_chunks(iterate_scenarios(input_files, adjusted_params, grid, force, param_ids, failures), chunk_size):
+            futures = {executor.submit(simulate_parameter_set, initial_state, sys_param, stakeholder_name_mapping, seed=get_run_seed(param_id, 1)): (input_file, param_id)
+                       for input_file, param_id, initial_state, sys_param, stakeholder_name_mapping in chunk}
+
+            # save the results in the order in which the simulations finish
+            for future in as_completed(futures):
+                input_file, param_id = futures[future]
+                simulated_param_ids.append(param_id)
+                try:
+                    save_simulation_data(future.result(), param_id, conn, backend=backend)
+                    record_simulation(conn, param_id)
+                    print(f"[{len(simulated_param_ids)}] Finished parameter set {param_id} of {os.path.basename(input_file)} after {time.time() - start_time:.1f} s")
+                except Exception:
+                    print(f"[{len(simulated_param_ids)}] Failed parameter set {param_id} of {os.path.basename(input_file)}:\n", traceback.format_exc())
+                    failures.append(param_id)
+
+    if len(simulated_param_ids) == 0:
+        print("All parameter sets have been simulated already.")
+
+    # the simulated parameter sets are the first Monte Carlo runs
+    if runs > 1:
+        for param_id in dict.fromkeys(param_id for file_param_ids in param_ids.values() for param_id in file_param_ids):
+            if param_id in failures or not simulation_data_exists(conn, param_id):
+                continue
+            try:
+                simulate_monte_carlo(param_id, runs, processes, keep_runs)
+                simulated_param_ids.append(param_id)
+            except Exception:
+                print(f"Failed Monte Carlo runs of parameter set {param_id}:\n", traceback.format_exc())
+                failures.append(param_id)
+
+    # the results of the batch stay cached
+    evict_simulations(conn, keep=simulated_param_ids)
+    conn.close()
+
+    print("Batch time: ", time.time() - start_time, " s")
+
+    return param_ids, failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Quantitative Token Model for one or more QTM radCAD inputs files.")
+    parser.add_argument('inputs', nargs='+', help="QTM radCAD inputs files or directories containing them")
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE', help="override a parameter of all inputs files, can be repeated")
+    parser.add_argument('--processes', type=int, default=None, help="number of worker processes, defaults to all available cores")
+    parser.add_argument('--backend', choices=['sqlite', 'arrow'], default=None, help="results backend, defaults to the RESULTS_BACKEND of the storage")
+    parser.add_argument('--force', action='store_true', help="simulate parameter sets again even if their results are stored already")
+    parser.add_argument('--grid', choices=SWEEP_GRIDS, default='cartesian', help="grid of the parameter sweeps within the inputs files")
+    parser.add_argument('--chunk-size', type=int, default=SWEEP_CHUNK_SIZE, help="amount of parameter sets passed to the worker pool at once")
+    parser.add_argument('--runs', type=int, default=MONTE_CARLO_RUNS, help="total amount of Monte Carlo runs per parameter set, stored runs are not simulated again")
+    parser.add_argument('--summary-only', action='store_true', help="store only the summary of the Monte Carlo runs instead of every run")
+    args = parser.parse_args(argv)
+
+    input_files = find_input_files(args.inputs)
+    if len(input_files) == 0:
+        parser.error("No QTM radCAD inputs files found.")
+
+    param_ids, failures = run_batch(input_files, parse_param_overrides(args.param), args.processes, args.backend, args.force, args.grid, args.chunk_size, args.runs, not args.summary_only)
+    for input_file, file_param_ids in param_ids.items():
+        print(os.path.basename(input_file), ": ", ", ".join(file_param_ids))
+    if len(failures) > 0:
+        print("Failed: ", ", ".join(failures))
+        return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
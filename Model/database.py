@@ -0,0 +1,98 @@
+"""
+Access to the SQLite database simulationData.db of the parameter sets and simulation results.
+
+Connections are opened in WAL mode, so that readers, e.g. the UI pages, do not block the writer and vice versa.
+Writes run in explicit BEGIN IMMEDIATE transactions, which take the write lock up front. Concurrent writers, e.g. two
+Streamlit sessions or parallel sweeps, therefore wait for each other instead of interleaving their lookups and inserts,
+and a failed write leaves the database unchanged.
+"""
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import pandas as pd
+from contextlib import contextmanager
+
+# path of the SQLite database, relative to the working directory of the app
+DATABASE_PATH = 'simulationData.db'
+
+# seconds a writer waits for the write lock of another writer
+BUSY_TIMEOUT = 60
+
+# amount of idle read connections kept open per database
+READ_POOL_SIZE = 4
+
+# idle read connections per database path
+_read_pools = {}
+_read_pools_lock = threading.Lock()
+
+
+def connect_database(path=DATABASE_PATH):
+    """
+    Open a connection to the SQLite database in WAL mode. Transactions are controlled explicitly by write_transaction.
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+
+    return conn
+
+@contextmanager
+def read_connection(path=DATABASE_PATH):
+    """
+    Borrow a read-only connection from the connection pool of the database, e.g. for the queries of the UI pages.
+    The connection is returned to the pool at the end of the block. Pooled connections run in autocommit mode, so every
+    query sees the latest committed data. Unlike connect_database it does not create a missing database, but raises a
+    FileNotFoundError.
+    """
+    with _read_pools_lock:
+        pool = _read_pools.setdefault(path, queue.LifoQueue())
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Database {path} does not exist. Please run a simulation first.")
+        # read-only mode -> the database file is never created or written by the pooled connections
+        conn = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + '?mode=ro', uri=True, timeout=BUSY_TIMEOUT,
+                               isolation_level=None, check_same_thread=False)
+
+    try:
+        yield conn
+    finally:
+        if pool.qsize() < READ_POOL_SIZE:
+            pool.put(conn)
+        else:
+            conn.close()
+
+@contextmanager
+def write_transaction(conn):
+    """
+    Run the enclosed writes in one transaction, which holds the write lock of the database from its start. The
+    transaction is committed at the end of the block and rolled back on errors. Nested write transactions join the
+    outer one.
+    """
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+def insert_rows(conn, table, df):
+    """
+    Append the rows of a data frame to a table with plain INSERT statements, creating the table if it does not exist.
+    Unlike DataFrame.to_sql this does not commit, so that it can be part of a write transaction.
+    """
+    if conn.execute("SELECT count(name) FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()[0] == 0:
+        # same column types as DataFrame.to_sql
+        conn.execute(pd.io.sql.get_schema(df, table, con=conn))
+    columns = ', '.join(f'"{column}"' for column in df.columns)
+    placeholders = ', '.join('?' * len(df.columns))
+    values = df.astype(object).where(df.notna(), None).values.tolist()
+    conn.executemany(f'INSERT INTO "{table}" ({columns}) VALUES ({placeholders})', values)
@@ -0,0 +1,216 @@
+"""
+Opt-in instrumentation of the state update pipeline of the radCAD model, e.g. to find the substeps which dominate the
+runtime and to catch regressions when new utilities are added.
+
+A SubstepProfiler wraps every policy and state update function of the state update blocks and records its calls, wall
+and CPU time and the bytes it allocates (by tracemalloc) per substep and timestep. The recorded calls are exported as
+summary table, as Chrome trace file, which is opened in chrome://tracing, Perfetto or speedscope, and as folded stacks
+for flamegraph.pl.
+
+Usage from the root directory of the repository:
+python -m Model.instrumentation "data/Quantitative_Token_Model_V1.89_radCAD_integration - radCAD_inputs.csv" --timesteps 24 --trace trace.json
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+# Get the current directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up one folder
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+
+# Append the parent directory to sys.path
+sys.path.append(parent_dir)
+
+from Model.sys_params import load_sys_param, calculate_derived_parameters, stakeholder_name_mapping
+from Model.state_variables import compose_initial_state, add_precomputed_params
+from Model.simulation import run_simulation, TIMESTEPS
+
+# columns of the recorded calls
+CALL_COLUMNS = ['run', 'timestep', 'substep', 'kind', 'function', 'start', 'wall_time', 'cpu_time', 'allocated_bytes', 'retained_bytes']
+
+
+class SubstepProfiler:
+    """
+    Recorder of the calls of the instrumented policy and state update functions. Use it as context manager around the
+    simulation, so that tracemalloc is only active while the simulation runs.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.run = 1
+        self.timestep = 0
+        self.calls = []
+        self._start_time = time.perf_counter()
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def start_timestep(self, run, timestep):
+        """
+        Mark the start of a timestep, the following calls are recorded for it.
+        """
+        self.run = run
+        self.timestep = timestep
+
+    def instrument(self, state_update_blocks):
+        """
+        Get a copy of the state update blocks with instrumented policy and state update functions.
+        """
+        return [{**block,
+                 'policies': {name: self._wrap(function, substep, 'policy', name) for name, function in block.get('policies', {}).items()},
+                 'variables': {name: self._wrap(function, substep, 'variable', name) for name, function in block.get('variables', {}).items()}}
+                for substep, block in enumerate(state_update_blocks, start=1)]
+
+    def _wrap(self, function, substep, kind, name):
+        trace_memory = self.trace_memory
+        label = name if name == function.__name__ else f"{name}: {function.__name__}"
+
+        @functools.wraps(function)
+        def instrumented(*args, **kwargs):
+            if trace_memory:
+                tracemalloc.reset_peak()
+                start_memory = tracemalloc.get_traced_memory()[0]
+            start_cpu = time.process_time()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                wall_time = time.perf_counter() - start
+                cpu_time = time.process_time() - start_cpu
+                allocated_bytes = retained_bytes = 0
+                if trace_memory:
+                    current_memory, peak_memory = tracemalloc.get_traced_memory()
+                    allocated_bytes = peak_memory - start_memory
+                    retained_bytes = current_memory - start_memory
+                self.calls.append((self.run, self.timestep, substep, kind, label,
+                                   start - self._start_time, wall_time, cpu_time, allocated_bytes, retained_bytes))
+
+        return instrumented
+
+    def get_calls(self):
+        """
+        Get the recorded calls as data frame with one row per call.
+        """
+        return pd.DataFrame(self.calls, columns=CALL_COLUMNS)
+
+    def summary(self):
+        """
+        Get the summary of the recorded calls per substep and function, sorted by their total wall time.
+        """
+        calls = self.get_calls()
+        summary = calls.groupby(['substep', 'kind', 'function'], as_index=False).agg(
+            calls=('wall_time', 'size'), wall_time=('wall_time', 'sum'), cpu_time=('cpu_time', 'sum'),
+            allocated_bytes=('allocated_bytes', 'sum'), retained_bytes=('retained_bytes', 'sum'))
+        summary['wall_share'] = summary['wall_time'] / summary['wall_time'].sum()
+
+        return summary.sort_values('wall_time', ascending=False, ignore_index=True)
+
+    def substep_summary(self):
+        """
+        Get the summary of the recorded calls per substep in the order of the state update blocks.
+        """
+        calls = self.get_calls()
+        summary = calls.groupby('substep', as_index=False).agg(
+            calls=('wall_time', 'size'), wall_time=('wall_time', 'sum'), cpu_time=('cpu_time', 'sum'),
+            allocated_bytes=('allocated_bytes', 'sum'), retained_bytes=('retained_bytes', 'sum'))
+        summary['wall_share'] = summary['wall_time'] / summary['wall_time'].sum()
+
+        return summary
+
+    def timestep_summary(self):
+        """
+        Get the summary of the recorded calls per run and timestep, e.g. to find timesteps which get slower over time.
+        """
+        calls = self.get_calls()
+
+        return calls.groupby(['run', 'timestep'], as_index=False).agg(
+            calls=('wall_time', 'size'), wall_time=('wall_time', 'sum'), cpu_time=('cpu_time', 'sum'),
+            allocated_bytes=('allocated_bytes', 'sum'), retained_bytes=('retained_bytes', 'sum'))
+
+    def export_chrome_trace(self, path):
+        """
+        Write the recorded calls as Chrome trace file with nested timestep, substep and function spans.
+        """
+        calls = self.get_calls()
+        calls['end'] = calls['start'] + calls['wall_time']
+        events = []
+        for level, keys in [('timestep', ['run', 'timestep']), ('substep', ['run', 'timestep', 'substep'])]:
+            spans = calls.groupby(keys, as_index=False).agg(start=('start', 'min'), end=('end', 'max'))
+            for span in spans.itertuples(index=False):
+                events.append({'name': f"substep {span.substep}" if level == 'substep' else f"timestep {span.timestep}",
+                               'cat': level, 'ph': 'X', 'ts': span.start * 1e6, 'dur': (span.end - span.start) * 1e6,
+                               'pid': 1, 'tid': int(span.run), 'args': {key: int(getattr(span, key)) for key in keys}})
+        for call in calls.itertuples(index=False):
+            events.append({'name': call.function, 'cat': call.kind, 'ph': 'X', 'ts': call.start * 1e6, 'dur': call.wall_time * 1e6,
+                           'pid': 1, 'tid': int(call.run),
+                           'args': {'timestep': int(call.timestep), 'substep': int(call.substep), 'cpu_time': call.cpu_time,
+                                    'allocated_bytes': int(call.allocated_bytes), 'retained_bytes': int(call.retained_bytes)}})
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export_folded_stacks(self, path):
+        """
+        Write the wall time of the recorded calls as folded stacks in microseconds, e.g. for flamegraph.pl.
+        """
+        calls = self.get_calls()
+        stacks = calls.groupby(['substep', 'kind', 'function'])['wall_time'].sum()
+        with open(path, 'w') as f:
+            for (substep, kind, function), wall_time in stacks.items():
+                f.write(f"substep {substep};{kind};{function.replace(';', ',').replace(' ', '_')} {round(wall_time * 1e6)}\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the substeps of the radCAD model of the Quantitative Token Model for a QTM radCAD inputs file.")
+    parser.add_argument('input_file', help="QTM radCAD inputs file")
+    parser.add_argument('--timesteps', type=int, default=TIMESTEPS, help="amount of simulated months")
+    parser.add_argument('--no-memory', action='store_true', help="do not trace the allocated bytes, which slows down the simulation")
+    parser.add_argument('--trace', default=None, help="path of the Chrome trace file")
+    parser.add_argument('--folded', default=None, help="path of the folded stacks file for flamegraph.pl")
+    parser.add_argument('--top', type=int, default=20, help="amount of functions in the printed summary")
+    args = parser.parse_args(argv)
+
+    # the profiled parameter set is not registered in the database
+    sys_param = calculate_derived_parameters(load_sys_param(args.input_file, {}))
+    initial_state = compose_initial_state(sys_param, stakeholder_name_mapping)
+    add_precomputed_params(sys_param, stakeholder_name_mapping)
+
+    start_time = time.time()
+    with SubstepProfiler(trace_memory=not args.no_memory) as profiler:
+        run_simulation(initial_state, sys_param, timesteps=args.timesteps, profiler=profiler)
+    simulation_time = time.time() - start_time
+    print("Simulation time: ", simulation_time, " s")
+
+    # the rest of the simulation time is spent by radCAD between the substeps, e.g. copying the states
+    print("Time in policy and state update functions: ", profiler.get_calls()['wall_time'].sum(), " s")
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.max_colwidth', 80):
+        print(profiler.substep_summary().to_string(index=False))
+        print(profiler.summary().head(args.top).to_string(index=False))
+    if args.trace is not None:
+        profiler.export_chrome_trace(args.trace)
+        print("Chrome trace written to ", args.trace)
+    if args.folded is not None:
+        profiler.export_folded_stacks(args.folded)
+        print("Folded stacks written to ", args.folded)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
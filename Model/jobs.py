@@ -0,0 +1,327 @@
+"""
+Queue of simulation jobs in the SQLite database, which are executed by a local pool of worker processes.
+
+The app submits a parameter set as job and polls its status and progress instead of running the simulation in its
+script thread. The parameter set is registered in the sys_param table on submission, so that its id is known right
+away, and the workers simulate it from the stored parameters. The results are saved to the results store under the
+parameter id like the ones of simulation(). Meanwhile the metrics of every simulated month are streamed to the
+simulation_stream table, so that the app can chart a simulation while it is in progress.
+
+Workers are started by the app with start_job_workers or on the command line from the root directory of the
+repository by python -m Model.jobs --workers 4. Both create the tables of the simulations once at startup, so that
+the pages of the app only read them.
+
+Tables:
+simulation_jobs: job_id, param_id, status, simulated and total timesteps, error, submission, start and finish time,
+process id of the worker
+
+Job status: queued -> running -> finished or failed
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+# Get the current directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up one folder
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+
+# Append the parent directory to sys.path
+sys.path.append(parent_dir)
+
+from Model.database import connect_database, write_transaction, read_connection
+from Model.state_variables import get_stored_initial_state
+from Model.sys_params import get_sys_param
+from Model.simulation import simulate_parameter_set, TIMESTEPS, MONTE_CARLO_RUNS
+from Model.storage import create_results_tables, simulation_data_exists, save_simulation_data
+from Model.result_cache import create_result_cache_table, record_simulation, touch_simulation, evict_simulations
+from Model.parts.utils import get_run_seed
+from Model.streaming import STREAM_METRICS, create_stream_table, create_stream_sink, clear_stream
+from Model.run_summary import create_summary_tables
+
+# default amount of worker processes of the app
+JOB_WORKERS = 2
+
+# seconds an idle worker waits before it looks for new jobs again
+JOB_POLL_INTERVAL = 0.5
+
+# worker processes started by this process
+_worker_processes = []
+_worker_processes_lock = threading.Lock()
+
+
+def create_jobs_table(conn):
+    """
+    Create the simulation_jobs table if it does not exist yet.
+    """
+    with write_transaction(conn):
+        conn.execute('''CREATE TABLE IF NOT EXISTS simulation_jobs (
+                        job_id TEXT PRIMARY KEY,
+                        param_id TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        progress INTEGER NOT NULL DEFAULT 0,
+                        total INTEGER NOT NULL,
+                        error TEXT,
+                        submitted REAL NOT NULL,
+                        started REAL,
+                        finished REAL,
+                        worker INTEGER)''')
+        # job tables of former versions do not record the workers yet
+        if 'worker' not in [column_info[1] for column_info in conn.execute('PRAGMA table_info(simulation_jobs)').fetchall()]:
+            conn.execute('ALTER TABLE simulation_jobs ADD COLUMN worker INTEGER')
+        conn.execute('''CREATE INDEX IF NOT EXISTS simulation_jobs_status ON simulation_jobs (status, submitted)''')
+
+def create_simulation_tables(conn):
+    """
+    Create the tables of the simulation results, the result cache, the run summaries, the job queue and the stream if
+    they do not exist yet, and migrate former result tables. Called once at the startup of the app and the workers, so
+    that the pages only read.
+    """
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    create_summary_tables(conn)
+    create_jobs_table(conn)
+    create_stream_table(conn)
+
+def submit_simulation(input_file, adjusted_params):
+    """
+    Register the parameter set of the inputs file and the adjusted parameters and queue its simulation. Parameter
+    sets with stored results are finished right away.
+
+    Returns the job id, the parameter id and the execute_sim flag. The job id is None if the parameter set is invalid
+    and the one of the queued or running job if the parameter set is being simulated already.
+    """
+    sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim = get_sys_param(input_file, adjusted_params)
+    if not execute_sim:
+        conn.close()
+        return None, param_id, execute_sim
+
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    create_jobs_table(conn)
+    job_id = str(uuid.uuid4()).replace("-", "")
+    total = TIMESTEPS * MONTE_CARLO_RUNS
+    with write_transaction(conn):
+        active_job = conn.execute('''SELECT job_id FROM simulation_jobs WHERE param_id = ? AND status IN ('queued', 'running')
+                                     ORDER BY submitted LIMIT 1''', (param_id,)).fetchone()
+        if active_job is not None:
+            # a second job of the same parameter set would simulate it twice and clear the stream of the first one
+            job_id = active_job[0]
+        elif simulation_data_exists(conn, param_id):
+            touch_simulation(conn, param_id)
+            conn.execute('''INSERT INTO simulation_jobs (job_id, param_id, status, progress, total, submitted, started, finished)
+                            VALUES (?, ?, 'finished', ?, ?, ?, ?, ?)''', (job_id, param_id, total, total, time.time(), time.time(), time.time()))
+        else:
+            conn.execute('''INSERT INTO simulation_jobs (job_id, param_id, status, total, submitted)
+                            VALUES (?, ?, 'queued', ?, ?)''', (job_id, param_id, total, time.time()))
+    conn.close()
+
+    return job_id, param_id, execute_sim
+
+def get_job(job_id):
+    """
+    Get the status of a job as dictionary of the columns of the simulation_jobs table or None if it does not exist.
+    """
+    with read_connection() as conn:
+        cursor = conn.execute('SELECT * FROM simulation_jobs WHERE job_id = ?', (job_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        return dict(zip([column[0] for column in cursor.description], row))
+
+def get_active_job(param_id):
+    """
+    Get the status of the queued or running job of a parameter set as dictionary or None if it is not being simulated.
+    """
+    try:
+        with read_connection() as conn:
+            cursor = conn.execute('''SELECT * FROM simulation_jobs WHERE param_id = ? AND status IN ('queued', 'running')
+                                     ORDER BY submitted LIMIT 1''', (param_id,))
+            row = cursor.fetchone()
+    except (FileNotFoundError, sqlite3.OperationalError):
+        # no job has been submitted yet
+        return None
+    if row is None:
+        return None
+
+    return dict(zip([column[0] for column in cursor.description], row))
+
+def claim_job(conn):
+    """
+    Take the oldest queued job and mark it as running by this worker process. Concurrent workers cannot claim the
+    same job, as the lookup and the update run in one write transaction.
+
+    Returns the job id and parameter id or None if no job is queued.
+    """
+    with write_transaction(conn):
+        job = conn.execute('''SELECT job_id, param_id FROM simulation_jobs WHERE status = 'queued'
+                              ORDER BY submitted LIMIT 1''').fetchone()
+        if job is not None:
+            conn.execute('''UPDATE simulation_jobs SET status = 'running', started = ?, worker = ? WHERE job_id = ?''', (time.time(), os.getpid(), job[0]))
+
+    return job
+
+def update_job_progress(conn, job_id, progress, total):
+    """
+    Store the amount of simulated timesteps of a running job.
+    """
+    with write_transaction(conn):
+        conn.execute('UPDATE simulation_jobs SET progress = ?, total = ? WHERE job_id = ?', (progress, total, job_id))
+
+def finish_job(conn, job_id, error=None):
+    """
+    Mark a job as finished, or as failed if an error is given.
+    """
+    with write_transaction(conn):
+        conn.execute('''UPDATE simulation_jobs SET status = ?, error = ?, finished = ? WHERE job_id = ?''',
+                     ('finished' if error is None else 'failed', error, time.time(), job_id))
+
+def is_worker_alive(pid):
+    """
+    Check whether the worker process with this process id is still running on this machine.
+    """
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process exists, but belongs to another user
+        return True
+
+    return True
+
+def requeue_interrupted_jobs(conn, workers=None):
+    """
+    Queue the jobs again which were running when their workers were stopped, e.g. by a restart of the app or a
+    crashed worker. Jobs of workers which are still running, e.g. the ones of a second app server or of
+    python -m Model.jobs, are not touched.
+
+    Parameters:
+    conn: SQLite connection
+    workers: process ids of the stopped workers, defaults to all workers which are no longer running
+    """
+    with write_transaction(conn):
+        if workers is None:
+            # jobs without a recorded worker have been claimed by the workers of former versions
+            running_workers = [worker for worker, in conn.execute("SELECT DISTINCT worker FROM simulation_jobs WHERE status = 'running'")]
+            workers = [worker for worker in running_workers if not is_worker_alive(worker)]
+        for worker in workers:
+            conn.execute('''UPDATE simulation_jobs SET status = 'queued', progress = 0, started = NULL, worker = NULL
+                            WHERE status = 'running' AND worker IS ?''', (worker,))
+
+def run_job(conn, job_id, param_id):
+    """
+    Simulate the parameter set of a job, stream its completed timesteps and save its results.
+    """
+    try:
+        if not simulation_data_exists(conn, param_id):
+            initial_state, sys_param, stakeholder_name_mapping = get_stored_initial_state(param_id)
+            if sys_param is None:
+                raise KeyError(f"Parameter set {param_id} does not exist.")
+            stream_sink = create_stream_sink(conn, param_id)
+
+            def sink(row):
+                # the streamed timestep and the progress of the job are written in one transaction
+                with write_transaction(conn):
+                    stream_sink(row)
+                    update_job_progress(conn, job_id, (int(row['run']) - 1) * TIMESTEPS + int(row['timestep']), MONTE_CARLO_RUNS * TIMESTEPS)
+
+            data = simulate_parameter_set(initial_state, sys_param, stakeholder_name_mapping, sink=sink, seed=get_run_seed(param_id, 1),
+                                          sink_metrics=STREAM_METRICS)
+            save_simulation_data(data, param_id, conn)
+            record_simulation(conn, param_id)
+            evict_simulations(conn, keep=[param_id])
+        finish_job(conn, job_id)
+    except Exception:
+        print("Job ", job_id, " failed:\n", traceback.format_exc())
+        finish_job(conn, job_id, error=traceback.format_exc())
+    finally:
+        # the complete results replace the streamed timesteps
+        clear_stream(conn, param_id)
+
+def run_job_worker(poll_interval=JOB_POLL_INTERVAL, stop_when_idle=False):
+    """
+    Execute queued jobs one after another.
+
+    Parameters:
+    poll_interval: seconds to wait for new jobs when the queue is empty
+    stop_when_idle: stop as soon as the queue is empty instead of waiting for new jobs
+    """
+    conn = connect_database()
+    create_simulation_tables(conn)
+    while True:
+        job = claim_job(conn)
+        if job is None:
+            if stop_when_idle:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(conn, *job)
+    conn.close()
+
+def start_job_workers(workers=JOB_WORKERS, worker_processes=None):
+    """
+    Start the worker processes of the job queue, if they are not running yet. Stopped workers, e.g. crashed or killed
+    ones, are replaced and their interrupted jobs are queued again. Cheap enough to be called on every run of an app
+    page.
+
+    Parameters:
+    workers: amount of worker processes
+    worker_processes: list of the worker processes, which is updated in place, defaults to the workers of this process
+
+    Returns the running worker processes.
+    """
+    worker_processes = _worker_processes if worker_processes is None else worker_processes
+    with _worker_processes_lock:
+        stopped_workers = [process.pid for process in worker_processes if not process.is_alive()]
+        worker_processes[:] = [process for process in worker_processes if process.is_alive()]
+        if len(worker_processes) == 0 or len(stopped_workers) > 0:
+            conn = connect_database()
+            if len(worker_processes) == 0 and len(stopped_workers) == 0:
+                # startup -> jobs of the stopped workers of a former app server are interrupted as well
+                create_simulation_tables(conn)
+                requeue_interrupted_jobs(conn)
+            else:
+                requeue_interrupted_jobs(conn, stopped_workers)
+            conn.close()
+
+        # spawned workers do not inherit the threads of the app
+        context = multiprocessing.get_context('spawn')
+        while len(worker_processes) < workers:
+            process = context.Process(target=run_job_worker, daemon=True)
+            process.start()
+            worker_processes.append(process)
+
+    return worker_processes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run worker processes of the simulation job queue of the Quantitative Token Model.")
+    parser.add_argument('--workers', type=int, default=JOB_WORKERS, help="number of worker processes")
+    parser.add_argument('--stop-when-idle', action='store_true', help="stop the workers as soon as the queue is empty")
+    args = parser.parse_args(argv)
+
+    conn = connect_database()
+    create_simulation_tables(conn)
+    requeue_interrupted_jobs(conn)
+    conn.close()
+
+    workers = [multiprocessing.Process(target=run_job_worker, kwargs={'stop_when_idle': args.stop_when_idle}) for worker in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
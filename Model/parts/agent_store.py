@@ -0,0 +1,184 @@
+import numpy as np
+
+# agent attributes that are not stored as float64 columns
+OBJECT_FIELDS = ['a_name', 'a_type', 'a_actions', 'a_current_action']
+
+
+class AgentView:
+    """
+    Dictionary-like view of a single agent row of an AgentStore. Reading and writing attributes reads and writes the store columns.
+    """
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, field):
+        store = self._store
+        if field in store._field_index:
+            return float(store._values[self._index, store._field_index[field]])
+        return store._objects[field][self._index]
+
+    def __setitem__(self, field, value):
+        store = self._store
+        if field in store._field_index:
+            store._values[self._index, store._field_index[field]] = value
+        else:
+            store._objects[field][self._index] = value
+
+    def __iter__(self):
+        return iter(self._store._agent_keys)
+
+    def __len__(self):
+        return len(self._store._agent_keys)
+
+    def __contains__(self, field):
+        return field in self._store._agent_keys
+
+    def __eq__(self, other):
+        return dict(self.items()) == (dict(other.items()) if isinstance(other, AgentView) else other)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def keys(self):
+        return list(self._store._agent_keys)
+
+    def values(self):
+        return [self[field] for field in self._store._agent_keys]
+
+    def items(self):
+        return [(field, self[field]) for field in self._store._agent_keys]
+
+    def get(self, field, default=None):
+        return self[field] if field in self else default
+
+    def copy(self):
+        return dict(self.items())
+
+
+class AgentStore:
+    """
+    Struct-of-arrays store of all token ecosystem agents aka stakeholders.
+
+    The numeric agent attributes live in one stakeholder x field float64 matrix with fixed stakeholder indices. Boolean
+    stakeholder masks per type and per name are precomputed, so that aggregations over agents are single NumPy reductions.
+    The store behaves like the former dictionary of agent dictionaries keyed by uuid4, so policies can still use
+    agents[key]['a_tokens'] += ... while hot policies work on agents.column('a_tokens') and the masks directly.
+    """
+
+    def __init__(self, agents):
+        """
+        Build the store from a dictionary of agent dictionaries as generated by new_agent.
+        """
+        self._keys = list(agents.keys())
+        self._key_index = {key: i for i, key in enumerate(self._keys)}
+        first_agent = next(iter(agents.values())) if len(agents) > 0 else {}
+        self._agent_keys = list(first_agent.keys())
+        self.fields = [field for field in self._agent_keys if field not in OBJECT_FIELDS]
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+        self._values = np.array([[agent[field] for field in self.fields] for agent in agents.values()], dtype=np.float64).reshape(len(self._keys), len(self.fields))
+        self._objects = {field: [agent[field] for agent in agents.values()] for field in self._agent_keys if field in OBJECT_FIELDS}
+
+        self.names = np.array(self._objects.get('a_name', []), dtype=object)
+        self.types = np.array(self._objects.get('a_type', []), dtype=object)
+        self._masks = {}
+
+    # columns and masks
+    def column(self, field):
+        """
+        Get the values of a numeric attribute of all agents as writable float64 array view.
+        """
+        return self._values[:, self._field_index[field]]
+
+    def field_values(self, field):
+        """
+        Get the values of an attribute of all agents in stakeholder order, i.e. the float64 array view of a numeric
+        attribute or the list of an object attribute like the agent actions.
+        """
+        if field in self._field_index:
+            return self.column(field)
+        return self._objects[field]
+
+    def agent_keys(self):
+        """
+        Get the attribute names of the agents in their original order.
+        """
+        return list(self._agent_keys)
+
+    def type_mask(self, *stakeholder_types):
+        """
+        Get the boolean mask of all agents of the given stakeholder types.
+        """
+        mask_key = ('type',) + stakeholder_types
+        if mask_key not in self._masks:
+            self._masks[mask_key] = np.isin(self.types, stakeholder_types)
+        return self._masks[mask_key]
+
+    def name_mask(self, name_part):
+        """
+        Get the boolean mask of all agents whose name contains name_part (case-insensitive), e.g. a payout source bucket.
+        """
+        mask_key = ('name', name_part.lower())
+        if mask_key not in self._masks:
+            self._masks[mask_key] = np.array([name_part.lower() in name.lower() for name in self.names], dtype=bool)
+        return self._masks[mask_key]
+
+    def name_in_mask(self, text):
+        """
+        Get the boolean mask of all agents whose name is contained in text (case-insensitive), e.g. a buyback bucket parameter.
+        """
+        mask_key = ('name_in', text.lower())
+        if mask_key not in self._masks:
+            self._masks[mask_key] = np.array([name.lower() in text.lower() for name in self.names], dtype=bool)
+        return self._masks[mask_key]
+
+    def to_dict(self):
+        """
+        Convert the store back into a dictionary of agent dictionaries.
+        """
+        return {key: self[key].copy() for key in self._keys}
+
+    # dictionary interface
+    def __getitem__(self, key):
+        return AgentView(self, self._key_index[key])
+
+    def __setitem__(self, key, agent):
+        if key not in self._key_index:
+            raise KeyError(f"Agent {key} is not part of the agent store. Agents can only be added when the store is created.")
+        view = AgentView(self, self._key_index[key])
+        for field, value in agent.items():
+            view[field] = value
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._key_index
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return [AgentView(self, i) for i in range(len(self._keys))]
+
+    def items(self):
+        return [(key, AgentView(self, i)) for i, key in enumerate(self._keys)]
+
+    def get(self, key, default=None):
+        return self[key] if key in self._key_index else default
+
+    def copy(self):
+        """
+        Shallow copy like dict.copy(): the new store shares the agent rows, i.e. the attribute values, with this store.
+        """
+        store = object.__new__(AgentStore)
+        store.__dict__.update(self.__dict__)
+        return store
@@ -1,3 +1,23 @@
+import numpy as np
+
+# default concentration of the Dirichlet distribution of the stochastic agent behavior, which is used if the parameter
+# set has no stochastic_behavior_concentration, e.g. the parameter sets of former inputs files. Higher values keep the
+# drawn meta bucket shares closer to the average allocations.
+STOCHASTIC_BEHAVIOR_CONCENTRATION = 50
+
+# HELPER FUNCTIONS
+def get_stochastic_behavior_concentration(params):
+    """
+    Get the concentration of the Dirichlet distribution of the stochastic agent behavior from the system parameters.
+    """
+    concentration = params.get('stochastic_behavior_concentration')
+    if concentration is None or np.isnan(float(concentration)):
+        return STOCHASTIC_BEHAVIOR_CONCENTRATION
+    if float(concentration) <= 0:
+        raise ValueError(f"params['stochastic_behavior_concentration'] must be positive, but is {concentration}. Please choose a positive concentration.")
+
+    return float(concentration)
+
 # POLICY FUNCTIONS
 def generate_agent_meta_bucket_behavior(params, substep, state_history, prev_state, **kwargs):
     """
@@ -8,102 +28,31 @@ def generate_agent_meta_bucket_behavior(params, substep, state_history, prev_sta
         if params['agent_behavior'] == 'stochastic':
             """
             Define the agent behavior for each agent type for the stochastic agent behavior
-            Agent actions are based on a weighted random choices.
+            The meta bucket shares of every agent are drawn from a Dirichlet distribution around the average static
+            allocations, params['stochastic_behavior_concentration'] controls their spread around them. The random
+            numbers are derived from the seed of the Monte Carlo run and the timestep, so that every run is
+            reproducible.
             """
-            agent_behavior_dict = {
-                'angle': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'seed': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'presale_1': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'presale_2': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'public_sale': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'team': {
-                    'trade': params['avg_token_selling_allocation']-params['avg_token_utility_removal']/3,
-                    'hold': params['avg_token_holding_allocation']-params['avg_token_utility_removal']/3,
-                    'utility': params['avg_token_utility_allocation']-params['avg_token_utility_removal']/3,
-                    'remove_locked_tokens': params['avg_token_utility_removal'],
-                },
-                'reserve': {
-                    'trade': 0,
-                    'hold': 50,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 50
-                },
-                'community': {
-                    'trade': 0,
-                    'hold': 100,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 0
-                },
-                'foundation': {
-                    'trade': 0,
-                    'hold': 100,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 0
-                },
-                'incentivisation': {
-                    'trade': 0,
-                    'hold': 100,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 0
-                },
-                'staking_vesting': {
-                    'trade': 0,
-                    'hold': 100,
-                    'utility': 0,
-                    'remove_locked_tokens': 0,
-                    'incentivise': 0
-                },
-                'market_investors': {
-                    'trade': 60,
-                    'hold': 10,
-                    'utility': 25,
-                    'remove_locked_tokens': 5,
-                    'incentivise': 0
-                },
-                'airdrop_receivers': {
-                    'trade': 60,
-                    'hold': 10,
-                    'utility': 25,
-                    'remove_locked_tokens': 5,
-                    'incentivise': 0
-                },
-                'incentivisation_receivers': {
-                    'trade': 60,
-                    'hold': 10,
-                    'utility': 25,
-                    'remove_locked_tokens': 5,
-                    'incentivise': 0
+            agents = prev_state['agents'].copy()
+            rng = np.random.default_rng(None if params.get('monte_carlo_seed') is None else [params['monte_carlo_seed'], prev_state['timestep']])
+            avg_allocations = np.array([params['avg_token_selling_allocation'], params['avg_token_holding_allocation'], params['avg_token_utility_allocation']], dtype=float)
+            drawn_allocations = avg_allocations > 0
+            concentration = get_stochastic_behavior_concentration(params)
+
+            # initialize agent behavior dictionary
+            agent_behavior_dict = {}
+
+            # populate agent behavior dictionary
+            for agent in agents:
+                allocations = np.zeros(3)
+                if drawn_allocations.any():
+                    allocations[drawn_allocations] = rng.dirichlet(avg_allocations[drawn_allocations] / avg_allocations.sum() * concentration) * avg_allocations.sum()
+                agent_behavior_dict[agent] = {
+                    'sell': allocations[0],
+                    'hold': allocations[1],
+                    'utility': allocations[2],
+                    'remove_tokens': params['avg_token_utility_removal'],
                 }
-            }
         
         elif params['agent_behavior'] == 'static':
             """
@@ -1,4 +1,5 @@
 from ..utils import *
+from Model.parts.simulation_calendar import get_params_calendar
 
 
 
@@ -20,8 +21,6 @@ def business_assumption_metrics(params, substep, state_history, prev_state, **kw
     buyback_perc_per_month = params['buyback_perc_per_month']
     buyback_fixed_per_month = params['buyback_fixed_per_month']
     buyback_bucket = params['buyback_bucket']
-    buyback_start = pd.to_datetime(params['buyback_start'], format='%d.%m.%y')
-    buyback_end = pd.to_datetime(params['buyback_end'], format='%d.%m.%y')
     burn_per_month = params['burn_per_month']
     burn_start = params['burn_start']
     burn_end = params['burn_end']
@@ -31,7 +30,7 @@ def business_assumption_metrics(params, substep, state_history, prev_state, **kw
 
     # state variables
     current_month = prev_state['timestep']
-    date = prev_state['date']
+    calendar = get_params_calendar(params, current_month)
     prev_cash_balance = prev_state['business_assumptions']['ba_cash_balance']
     buyback_from_revenue_share = prev_state['utilities']['u_buyback_from_revenue_share_usd']
     product_revenue = prev_state['user_adoption']['ua_product_revenue']
@@ -47,7 +46,7 @@ def business_assumption_metrics(params, substep, state_history, prev_state, **kw
     # buybacks
     buybacks = buyback_from_revenue_share
 
-    if buyback_start <= date and buyback_end > date:
+    if calendar.at[current_month, 'buyback_window']:
         if buyback_type == "Fixed":
             buybacks += buyback_fixed_per_month
 
@@ -1,5 +1,7 @@
 import math
+import numpy as np
 from Model.parts.utils import *
+from Model.parts.simulation_calendar import get_params_calendar
 
 
 
@@ -15,10 +17,11 @@ def calculate_user_adoption(initial_users,final_users,velocity,timestamp,total_d
         timstep: current timestep in days
         total_days: length of full simulation
     
+    All parameters can also be NumPy arrays to evaluate the adoption for many timesteps or parameter sets at once.
     """
 
-    term1 = (1 / (1 + math.exp(-velocity * 0.002 * (timestamp - 1825) / velocity))) * final_users + initial_users
-    term2 = (1 / (1 + math.exp(-velocity * 0.002 * (0 - 1825) / velocity))) * final_users
+    term1 = (1 / (1 + np.exp(-velocity * 0.002 * (timestamp - 1825) / velocity))) * final_users + initial_users
+    term2 = (1 / (1 + np.exp(-velocity * 0.002 * (0 - 1825) / velocity))) * final_users
     term3 = initial_users * (timestamp / total_days)
     term4 = final_users - (term1 - term2 - term3)
     result = term1 - term2 - term3 + (term4 * (timestamp / total_days))
@@ -26,6 +29,46 @@ def calculate_user_adoption(initial_users,final_users,velocity,timestamp,total_d
     return result
 
 
+def calculate_user_adoption_curves(params, days, total_days=3653):
+    """
+    Definition:
+        Closed-form user adoption, product revenue and token buy curves for all months at once
+    
+    Parameters:
+        params: dictionary with the user adoption parameters, each parameter can be a scalar or a NumPy array, e.g. of adoption velocities of a sweep
+        days: days since launch at the end of each month as array with the month as first axis, broadcastable against the parameters
+        total_days: length of the user adoption period
+    
+    Returns a dictionary with the month-first arrays of the user adoption state variables.
+    """
+    first_month = (np.arange(np.shape(days)[0]) == 0).reshape((-1,) + (1,) * (np.ndim(days) - 1))
+
+    ## Product user adoption and revenue
+    product_users = calculate_user_adoption(params['initial_product_users'], params['product_users_after_10y'], params['product_adoption_velocity'], days, total_days)
+    prev_product_users = np.concatenate([np.zeros_like(product_users[:1]), product_users[:-1]])
+    product_revenue = np.where(first_month, product_users*(params['one_time_product_revenue_per_user']+params['regular_product_revenue_per_user']),
+                               (product_users-prev_product_users)*params['one_time_product_revenue_per_user']+product_users*params['regular_product_revenue_per_user'])
+
+    ## Token holder adoption and token buys
+    token_holders = calculate_user_adoption(params['initial_token_holders'], params['token_holders_after_10y'], params['token_adoption_velocity'], days, total_days)
+    prev_token_holders = np.concatenate([np.zeros_like(token_holders[:1]), token_holders[:-1]])
+    token_buys = np.where(first_month, (params['one_time_token_buy_per_user']+params['regular_token_buy_per_user'])*token_holders,
+                          ((token_holders-prev_token_holders)*params['one_time_token_buy_per_user'])+token_holders*params['regular_token_buy_per_user'])
+
+    return {'ua_product_users': product_users, 'ua_token_holders': token_holders, 'ua_product_revenue': product_revenue, 'ua_token_buys': token_buys}
+
+def get_user_adoption_curves(params, months=120):
+    """
+    Precompute the user adoption state variables of all months of a simulation run.
+
+    Returns a data frame with the month (starting at 1) as index and the user adoption state variables as columns.
+    """
+    params = {key: value[0] if isinstance(value, list) else value for key, value in params.items()}
+    days = get_params_calendar(params, months)['days_since_launch'].values[:months]
+
+    return pd.DataFrame(calculate_user_adoption_curves(params, days), index=pd.RangeIndex(1, months+1, name='month'))
+
+
 # POLICY FUNCTIONS
 def user_adoption_metrics(params, substep, state_history, prev_state, **kwargs):
     """
@@ -33,10 +76,12 @@ def user_adoption_metrics(params, substep, state_history, prev_state, **kwargs):
     """
 
     current_month = prev_state['timestep']
-    current_date = prev_state['date']
-    launchDate = pd.to_datetime(params['launch_date'], format='%d.%m.%y')
 
-    current_day = (pd.to_datetime(current_date)+pd.DateOffset(months=1) - launchDate).days
+    # use the precomputed user adoption curves if available
+    if 'user_adoption_curves' in params and current_month in params['user_adoption_curves'].index:
+        return params['user_adoption_curves'].loc[current_month].to_dict()
+
+    current_day = get_params_calendar(params, current_month).at[current_month, 'days_since_launch']
 
     # This is what is shown in the model as a constant as the user adoption numbers refer to 10 years (product_users_after_10y & token_holers_after_10y)
     total_days = 3653                        
@@ -1,4 +1,5 @@
 import pandas as pd
+from Model.parts.simulation_calendar import get_params_calendar
 
 # POLICY FUNCTIONS
 def airdrops(params, substep, state_history, prev_state, **kwargs):
@@ -8,25 +9,23 @@ def airdrops(params, substep, state_history, prev_state, **kwargs):
     # get parameters
     total_token_supply = params['initial_total_supply']
     airdrop_allocation = params['airdrop_allocation']
-    airdrop_date1 = pd.to_datetime(params['airdrop_date1'], format='%d.%m.%y')
-    airdrop_date2 = pd.to_datetime(params['airdrop_date2'], format='%d.%m.%y')
-    airdrop_date3 = pd.to_datetime(params['airdrop_date3'], format='%d.%m.%y')
     airdrop_amount1 = params['airdrop_amount1']
     airdrop_amount2 = params['airdrop_amount2']
     airdrop_amount3 = params['airdrop_amount3']
 
     # get state variables
-    current_date = pd.to_datetime(prev_state['date'])
+    current_month = prev_state['timestep']
+    calendar = get_params_calendar(params, current_month)
 
     # policy logic
     # calculate airdrop amounts
     airdrop_tokens = 0
     # check if current month is airdrop month
-    if current_date <= airdrop_date1 and current_date+pd.DateOffset(months=1) > airdrop_date1:
+    if calendar.at[current_month, 'airdrop_month1']:
         airdrop_tokens += total_token_supply * airdrop_allocation/100 * airdrop_amount1/100
-    if current_date <= airdrop_date2 and current_date+pd.DateOffset(months=1) > airdrop_date2:
+    if calendar.at[current_month, 'airdrop_month2']:
         airdrop_tokens += total_token_supply * airdrop_allocation/100 * airdrop_amount2/100
-    if current_date <= airdrop_date3 and current_date+pd.DateOffset(months=1) > airdrop_date3:
+    if calendar.at[current_month, 'airdrop_month3']:
         airdrop_tokens += total_token_supply * airdrop_allocation/100 * airdrop_amount3/100
 
     # ensuring that the number of airdrop tokens is never negative
@@ -47,20 +46,17 @@ def update_agents_after_airdrops(params, substep, state_history, prev_state, pol
 
     # update logic
     # add airdropped tokens to airdrop receivers stakeholder group
-    airdrop_receivers = sum([1 for agent in updated_agents if (updated_agents[agent]['a_type'] == 'airdrop_receivers')])
+    airdrop_receivers = updated_agents.type_mask('airdrop_receivers')
     if airdrop_tokens > 0:
         
-        if airdrop_receivers == 0:
+        if not airdrop_receivers.any():
             raise ValueError("No airdrop receivers found. Please add at least one airdrop receiver in the stakeholder agents if you plan to airdrop tokens.")
         
-        for agent in updated_agents:
-            if updated_agents[agent]['a_type'] == 'airdrop_receivers':
-                
-                airdrop_per_airdrop_receiver = airdrop_tokens / airdrop_receivers
+        airdrop_per_airdrop_receiver = airdrop_tokens / airdrop_receivers.sum()
 
-                updated_agents[agent]['a_tokens'] += airdrop_per_airdrop_receiver
-                updated_agents[agent]['a_tokens_airdropped'] = airdrop_per_airdrop_receiver
-                updated_agents[agent]['a_tokens_airdropped_cum'] += airdrop_per_airdrop_receiver
+        updated_agents.column('a_tokens')[airdrop_receivers] += airdrop_per_airdrop_receiver
+        updated_agents.column('a_tokens_airdropped')[airdrop_receivers] = airdrop_per_airdrop_receiver
+        updated_agents.column('a_tokens_airdropped_cum')[airdrop_receivers] += airdrop_per_airdrop_receiver
 
     return ('agents', updated_agents)
 
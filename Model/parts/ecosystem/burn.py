@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+from Model.parts.simulation_calendar import get_params_calendar
 
 # POLICY FUNCTIONS
 def burn_from_protocol_bucket(params, substep, state_history, prev_state, **kwargs):
@@ -7,16 +9,15 @@ def burn_from_protocol_bucket(params, substep, state_history, prev_state, **kwar
     """
     # get parameters
     total_token_supply = params['initial_total_supply']
-    burn_start = pd.to_datetime(params['burn_start'], format='%d.%m.%y')
-    burn_end = pd.to_datetime(params['burn_end'], format='%d.%m.%y')
     burn_per_month = params['burn_per_month']
 
     # get state variables
-    current_date = pd.to_datetime(prev_state['date'])
+    current_month = prev_state['timestep']
+    calendar = get_params_calendar(params, current_month)
 
     # policy logic
     # calculate burn amount
-    if burn_start <= current_date and burn_end > current_date:
+    if calendar.at[current_month, 'burn_window']:
         burn_token_amount = total_token_supply * burn_per_month/100
     else:
         burn_token_amount = 0
@@ -41,11 +42,11 @@ def update_protocol_bucket_agent_after_burn(params, substep, state_history, prev
     # update logic
     # subtract burn tokens from protocol bucket
     if burn_token_amount > 0:
-        for agent in updated_agents:
-            if updated_agents[agent]['a_type'] == 'protocol_bucket' and burn_project_bucket.lower() in updated_agents[agent]['a_name'].lower():
-                updated_agents[agent]['a_tokens'] -= [burn_token_amount if burn_token_amount < updated_agents[agent]['a_tokens'] else updated_agents[agent]['a_tokens']][0]
-                updated_agents[agent]['a_tokens_burned'] = burn_token_amount
-                updated_agents[agent]['a_tokens_burned_cum'] += burn_token_amount
+        burn_buckets = updated_agents.type_mask('protocol_bucket') & updated_agents.name_mask(burn_project_bucket)
+        agent_tokens = updated_agents.column('a_tokens')
+        agent_tokens[burn_buckets] -= np.minimum(burn_token_amount, agent_tokens[burn_buckets])
+        updated_agents.column('a_tokens_burned')[burn_buckets] = burn_token_amount
+        updated_agents.column('a_tokens_burned_cum')[burn_buckets] += burn_token_amount
 
     return ('agents', updated_agents)
 
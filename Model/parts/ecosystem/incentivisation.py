@@ -1,3 +1,5 @@
+import numpy as np
+
 # POLICY FUNCTIONS
 def incentivisation(params, substep, state_history, prev_state, **kwargs):
     """
@@ -13,9 +15,10 @@ def incentivisation(params, substep, state_history, prev_state, **kwargs):
 
     # policy logic
     # Incentivisation through protocol bucket vesting
-    for agent in agents:
-        if agents[agent]['a_type'] == 'protocol_bucket' and incentivisation_payout_source.lower() in agents[agent]['a_name'].lower():
-            vested_incentivisation_tokens = agents[agent]['a_tokens']
+    incentivisation_buckets = np.flatnonzero(agents.type_mask('protocol_bucket') & agents.name_mask(incentivisation_payout_source))
+    if len(incentivisation_buckets) == 0:
+        raise ValueError("No protocol bucket found for the incentivisation payout source. Please check the parameter incentivisation_payout_source.")
+    vested_incentivisation_tokens = agents.column('a_tokens')[incentivisation_buckets[-1]]
 
     # Incentivisation through minting
     if incentivisation_payout_source == 'Minting':
@@ -42,21 +45,17 @@ def update_agents_after_incentivisation(params, substep, state_history, prev_sta
     # update logic
     if vested_incentivisation_tokens > 0:
         # subtract vested incentivisation tokens from protocol bucket
-        for agent in updated_agents:
-            if updated_agents[agent]['a_type'] == 'protocol_bucket' and incentivisation_payout_source.lower() in updated_agents[agent]['a_name'].lower():
-                updated_agents[agent]['a_tokens'] -= vested_incentivisation_tokens
+        updated_agents.column('a_tokens')[updated_agents.type_mask('protocol_bucket') & updated_agents.name_mask(incentivisation_payout_source)] -= vested_incentivisation_tokens
 
         # add vested incentivisation tokens to market participants
-        # count amount of market_investors and early_investors in updated_agents
-        incentivisation_receivers = sum([1 for agent in updated_agents if (updated_agents[agent]['a_type'] == 'incentivisation_receivers')])
-        for agent in updated_agents:
-            if updated_agents[agent]['a_type'] == 'incentivisation_receivers':
-
-                incentivisation_per_incentivisation_receiver = vested_incentivisation_tokens / incentivisation_receivers
-
-                updated_agents[agent]['a_tokens'] += incentivisation_per_incentivisation_receiver
-                updated_agents[agent]['a_tokens_incentivised'] = incentivisation_per_incentivisation_receiver
-                updated_agents[agent]['a_tokens_incentivised_cum'] += incentivisation_per_incentivisation_receiver
+        # count amount of incentivisation receivers in updated_agents
+        incentivisation_receivers = updated_agents.type_mask('incentivisation_receivers')
+        if incentivisation_receivers.any():
+            incentivisation_per_incentivisation_receiver = vested_incentivisation_tokens / incentivisation_receivers.sum()
+
+            updated_agents.column('a_tokens')[incentivisation_receivers] += incentivisation_per_incentivisation_receiver
+            updated_agents.column('a_tokens_incentivised')[incentivisation_receivers] = incentivisation_per_incentivisation_receiver
+            updated_agents.column('a_tokens_incentivised_cum')[incentivisation_receivers] += incentivisation_per_incentivisation_receiver
 
     return ('agents', updated_agents)
 
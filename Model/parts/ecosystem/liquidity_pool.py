@@ -99,11 +99,10 @@ def liquidity_pool_tx2_after_vesting_sell(params, substep, state_history, prev_s
     agent_sell_from_holding_dict = {}
     a_selling_tokens_sum = 0
     a_selling_from_holding_tokens_sum = 0
-    for agent in agents:
-        # selling from vesting + airdrops + incentivisation allocations
-        tokens_to_sell += agents[agent]['a_selling_tokens'] + agents[agent]['a_selling_from_holding_tokens']
-        a_selling_tokens_sum += agents[agent]['a_selling_tokens']
-        a_selling_from_holding_tokens_sum += agents[agent]['a_selling_from_holding_tokens']
+    # selling from vesting + airdrops + incentivisation allocations
+    a_selling_tokens_sum = agents.column('a_selling_tokens').sum()
+    a_selling_from_holding_tokens_sum = agents.column('a_selling_from_holding_tokens').sum()
+    tokens_to_sell = a_selling_tokens_sum + a_selling_from_holding_tokens_sum
     
     # consistency check for the amount of tokens to be sold being equivalent to meta bucket selling allocation
     error_message = (
@@ -147,9 +146,7 @@ def liquidity_pool_tx3_after_liquidity_addition(params, substep, state_history,
 
     # policy logic
     # get amount of tokens to be used for liquidity mining
-    tokens_for_liquidity = 0
-    for agent in agents:
-        tokens_for_liquidity += (agents[agent]['a_tokens_liquidity_mining'] - agents[agent]['a_tokens_liquidity_mining_remove'])
+    tokens_for_liquidity = (agents.column('a_tokens_liquidity_mining') - agents.column('a_tokens_liquidity_mining_remove')).sum()
 
     # calculate the liquidity pool after the vesting sells
     lp_usdc = lp_usdc + tokens_for_liquidity * token_price
@@ -227,16 +224,13 @@ def update_agents_tx1_after_adoption(params, substep, state_history, prev_state,
 
     if bought_tokens > 0:
         # distribute the bought tokens to the market_investors agents
-        market_investors = sum([1 for agent in updated_agents if (updated_agents[agent]['a_type'] == 'market_investors')])
-        if market_investors == 0:
+        market_investors = updated_agents.type_mask('market_investors')
+        if not market_investors.any():
             raise ValueError("No market investors found. Please add at least one market investor in the stakeholder agents if you plan to buy tokens from the open market dex liquidity with agents.")
         
-        for agent in updated_agents:
-            if updated_agents[agent]['a_type'] == 'market_investors':
-                
-                bought_tokens_per_market_investor = bought_tokens / market_investors
+        bought_tokens_per_market_investor = bought_tokens / market_investors.sum()
 
-                updated_agents[agent]['a_tokens'] += bought_tokens_per_market_investor
+        updated_agents.column('a_tokens')[market_investors] += bought_tokens_per_market_investor
 
     return ('agents', updated_agents)
 
@@ -1,18 +1,20 @@
 import pandas as pd
+from Model.parts.simulation_calendar import get_params_calendar
 
 # POLICY FUNCTIONS
 def generate_date(params, substep, state_history, prev_state, **kwargs):
     """
     Generate the current date from timestep
     """
-    # parameters
-    initial_date = pd.to_datetime(params['launch_date'], format='%d.%m.%y')
-    
     # state variables
     old_timestep = prev_state['timestep']
-    
+
+    # parameters
+    calendar = get_params_calendar(params, old_timestep)
+
     # policy logic
-    new_date = pd.to_datetime(initial_date)+pd.DateOffset(months=old_timestep-1)
+    # launch date + (timestep - 1) months from the precomputed calendar
+    new_date = calendar.at[old_timestep, 'date']
 
     return {'new_date': new_date}
 
@@ -44,23 +46,17 @@ def token_economy_metrics(params, substep, state_history, prev_state, **kwargs):
     # unvested supply variable
     te_airdrop_tokens_cum = token_economy['te_airdrop_tokens_cum']
 
-    protocol_bucket_tokens = 0
-    held_tokens = 0
-    for stakeholder in agents:
-        # calculate protocol bucket tokens
-        if agents[stakeholder]['a_type'] == 'protocol_bucket':
-            protocol_bucket_tokens += agents[stakeholder]['a_tokens']
-        # calculate protocol bucket tokens
-        if agents[stakeholder]['a_type'] != 'protocol_bucket':
-            held_tokens += agents[stakeholder]['a_tokens']
+    # calculate protocol bucket and held tokens
+    protocol_buckets = agents.type_mask('protocol_bucket')
+    agent_tokens = agents.column('a_tokens')
+    protocol_bucket_tokens = agent_tokens[protocol_buckets].sum()
+    held_tokens = agent_tokens[~protocol_buckets].sum()
 
     circulating_tokens += protocol_bucket_tokens + held_tokens + lp_tokens
     circulating_tokens += u_staking_base_apr_allocation_cum + u_staking_revenue_share_allocation_cum + u_staking_vesting_allocation_cum
     
 
-    vested_cum = 0 
-    for stakeholder in agents:
-        vested_cum += agents[stakeholder]['a_tokens_vested_cum']
+    vested_cum = agents.column('a_tokens_vested_cum').sum()
     
     unvested_tokens = total_token_supply-vested_cum-te_airdrop_tokens_cum-initial_lp_tokens
 
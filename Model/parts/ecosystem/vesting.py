@@ -1,43 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Vesting schedule
+def calculate_vesting_matrix(param_sets, stakeholder_names, months):
+    """
+    Calculate the vested tokens of all stakeholders for every month as month x parameter set x stakeholder array.
+
+    The schedule consists of the initial unlock in the first month and the linear vesting after the cliff.
+    param_sets: list of parameter dictionaries with single values
+    """
+    def agent_params(suffix):
+        return np.array([[float(param_set[name+suffix]) if name+suffix in param_set else 0.0 for name in stakeholder_names] for param_set in param_sets]).reshape(len(param_sets), len(stakeholder_names))
+
+    total_token_supply = np.array([float(param_set['initial_total_supply']) for param_set in param_sets])
+    token_allocation = agent_params('_token_allocation')
+    initial_vesting_perc = agent_params('_initial_vesting')
+    cliff_months = agent_params('_cliff')
+    vesting_duration = agent_params('_vesting_duration')
+
+    # parameter integrity checks
+    for s, a in zip(*np.nonzero((vesting_duration <= 0) & (initial_vesting_perc > 0) & (initial_vesting_perc != 100))):
+        print("ERROR: agent "+str(stakeholder_names[a])+" vesting duration is 0 but initial vesting percentage is not 100%! It is "+str(initial_vesting_perc[s, a])+"%. Setting vesting amount to 0.")
+
+    allocated_tokens = token_allocation * total_token_supply[:, None]
+    initial_vesting = initial_vesting_perc / 100 * allocated_tokens
+    vesting_period_token_amount = np.where(vesting_duration > 0, (allocated_tokens - initial_vesting) / np.where(vesting_duration > 0, vesting_duration, 1), 0)
+
+    month = np.arange(1, months+1)[:, None, None]
+    vesting_active = (month > cliff_months) & (month <= cliff_months + vesting_duration)
+
+    return vesting_period_token_amount * vesting_active + initial_vesting * (month == 1)
+
+def calculate_vesting_schedule(param, stakeholder_names, months=None):
+    """
+    Calculate the vesting schedule of all stakeholders from the system parameters without running a simulation.
+
+    param: parameter dictionary with single values or radCAD parameter lists
+    months: amount of months, defaults to the end of the longest vesting period
+
+    Returns a data frame of the vested tokens per month (index starting at 1) and stakeholder (columns).
+    """
+    param = {key: value[0] if isinstance(value, list) else value for key, value in param.items()}
+    if months is None:
+        vesting_ends = [float(param.get(name+'_cliff', 0) or 0) + float(param.get(name+'_vesting_duration', 0) or 0) for name in stakeholder_names]
+        months = max(int(np.ceil(max(vesting_ends, default=0))), 1)
+
+    vesting_matrix = calculate_vesting_matrix([param], stakeholder_names, months)[:, 0, :]
+
+    return pd.DataFrame(vesting_matrix, index=pd.RangeIndex(1, months+1, name='month'), columns=stakeholder_names)
+
 # POLICIY FUNCTIONS
 def vest_tokens(params, substep, state_history, prev_state, **kwargs):
     """
-    Policy function to vest tokens for each stakeholder.
+    Policy function to vest tokens for each stakeholder from the precomputed vesting schedule.
     """
-    agents = prev_state['agents'].copy()
-    total_token_supply = params['initial_total_supply']
+    agents = prev_state['agents']
     current_month = prev_state['timestep']
-    
-    agent_token_vesting_dict = {}
-    for key, agent in agents.items():
-        # Get all invesotor info
-        agent_type = agent['a_name']
-        agent_token_allocation = [params[agent_type+"_token_allocation"] if agent_type+"_token_allocation" in params else 0][0]
-        agent_initial_vesting_perc = [params[agent_type+"_initial_vesting"] if agent_type+"_initial_vesting" in params else 0][0]
-        agent_cliff_months = [params[agent_type+"_cliff"] if agent_type+"_cliff" in params else 0][0]
-        agent_vesting_duration = [params[agent_type+"_vesting_duration"] if agent_type+"_vesting_duration" in params else 0][0]
-
-        # initial vesting
-        if current_month == 1:
-            initial_agent_tokens_vested = (agent_initial_vesting_perc / 100) * (agent_token_allocation * total_token_supply)
-            agent_token_vesting_dict[key] = initial_agent_tokens_vested
-
-        # Parameter integrity checks
-        if agent_vesting_duration <= 0 and agent_initial_vesting_perc <= 0:
-            vesting_period_token_amount = 0
-        elif agent_vesting_duration <= 0 and agent_initial_vesting_perc != 100:
-            print("ERROR: agent "+str(agent_type)+" vesting duration is 0 but initial vesting percentage is not 100%! It is "+str(agent_initial_vesting_perc)+"%. Setting vesting amount to 0.")
-            vesting_period_token_amount = 0
-        elif agent_vesting_duration <= 0:
-            agent_vesting_duration = 0
-        else:
-            vesting_period_token_amount = (agent_token_allocation * total_token_supply - (agent_initial_vesting_perc / 100 * agent_token_allocation* total_token_supply)) / agent_vesting_duration
-        
-        if (current_month > agent_cliff_months + agent_vesting_duration) or current_month <= agent_cliff_months:
-            vesting_period_token_amount = 0
-
-        agent_token_vesting_dict[key] = [vesting_period_token_amount + agent_token_vesting_dict[key] if key in agent_token_vesting_dict else vesting_period_token_amount][0]
-
-    return {'agent_token_vesting_dict': agent_token_vesting_dict}
+
+    if 'vesting_schedule' in params:
+        vesting_schedule = params['vesting_schedule']
+    else:
+        vesting_schedule = calculate_vesting_schedule(params, list(dict.fromkeys(agents.names)))
+
+    # no more vesting after the end of the schedule
+    if current_month in vesting_schedule.index:
+        agent_tokens_vested = vesting_schedule.loc[current_month].reindex(agents.names, fill_value=0).values
+    else:
+        agent_tokens_vested = np.zeros(len(agents))
+
+    return {'agent_tokens_vested': agent_tokens_vested}
 
 # STATE UPDATE FUNCTIONS
 def update_agent_vested_tokens(params, substep, state_history, prev_state, policy_input, **kwargs):
@@ -45,12 +76,11 @@ def update_agent_vested_tokens(params, substep, state_history, prev_state, polic
     Function to update the vested tokens for each investor based on some criteria
     """
     updated_agents = prev_state['agents']
-    agent_token_vesting_dict = policy_input['agent_token_vesting_dict']
+    agent_tokens_vested = policy_input['agent_tokens_vested']
 
-    if not all(value == 0 for value in agent_token_vesting_dict.values()):
-        for key, value in agent_token_vesting_dict.items():
-            updated_agents[key]['a_tokens'] += value
-            updated_agents[key]['a_tokens_vested'] = value
-            updated_agents[key]['a_tokens_vested_cum'] += value
+    if np.any(agent_tokens_vested != 0):
+        updated_agents.column('a_tokens')[:] += agent_tokens_vested
+        updated_agents.column('a_tokens_vested')[:] = agent_tokens_vested
+        updated_agents.column('a_tokens_vested_cum')[:] += agent_tokens_vested
 
     return ('agents', updated_agents)
\ No newline at end of file
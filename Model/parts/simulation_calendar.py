@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# amount of months of the precomputed calendar if not specified otherwise
+CALENDAR_MONTHS = 120
+
+# date parameters of the airdrop months and the burn and buyback windows
+AIRDROP_DATE_KEYS = ['airdrop_date1', 'airdrop_date2', 'airdrop_date3']
+WINDOW_DATE_KEYS = {'burn_window': ('burn_start', 'burn_end'), 'buyback_window': ('buyback_start', 'buyback_end')}
+
+
+def add_months(dates, months):
+    """
+    Add calendar months to datetime64 dates in the same way as pd.DateOffset(months=...), i.e. clamping the day to the end of the month.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    month_start = dates.astype('datetime64[M]')
+    day = (dates - month_start.astype('datetime64[D]')).astype(int)
+    new_month = month_start + np.asarray(months)
+    days_in_month = ((new_month + 1).astype('datetime64[D]') - new_month.astype('datetime64[D]')).astype(int)
+
+    return new_month.astype('datetime64[D]') + np.minimum(day, days_in_month - 1)
+
+def get_date_array(param_sets, key):
+    """
+    Parse a QTM date parameter of the format dd.mm.yy for all parameter sets into a datetime64 array.
+    """
+    return pd.to_datetime([param_set[key] for param_set in param_sets], format='%d.%m.%y').values.astype('datetime64[D]')
+
+def calculate_calendar(param_sets, months):
+    """
+    Calculate the simulation calendar of a list of parameter sets at once.
+
+    Parameters:
+    param_sets: list of parameter dictionaries with single values
+    months: amount of simulated months
+
+    Returns a dictionary of parameter set x month arrays with
+    date: date of the month, i.e. launch date + (month - 1) months
+    days_since_launch: days from the launch date until the end of the month
+    airdrop_month1..3: whether the airdrop date 1..3 lies within the month
+    burn_window, buyback_window: whether the month lies within the burn or buyback period
+    """
+    launch_date = get_date_array(param_sets, 'launch_date')[:, None]
+    dates = add_months(launch_date, np.arange(months)[None, :])
+    # the month end is derived from the month date as done by date + pd.DateOffset(months=1) in the policies
+    month_ends = add_months(dates, 1)
+
+    calendar = {'date': dates, 'days_since_launch': (month_ends - launch_date).astype(int)}
+    for i, key in enumerate(AIRDROP_DATE_KEYS):
+        airdrop_date = get_date_array(param_sets, key)[:, None]
+        calendar['airdrop_month'+str(i+1)] = (dates <= airdrop_date) & (month_ends > airdrop_date)
+    for window, (start_key, end_key) in WINDOW_DATE_KEYS.items():
+        start = get_date_array(param_sets, start_key)[:, None]
+        end = get_date_array(param_sets, end_key)[:, None]
+        calendar[window] = (start <= dates) & (end > dates)
+
+    return calendar
+
+def get_calendar(params, months=CALENDAR_MONTHS):
+    """
+    Precompute the calendar of a simulation run, so that the policies look up the dates and date conditions of a month
+    instead of parsing and shifting dates every timestep.
+
+    params: parameter dictionary with single values or radCAD parameter lists
+    months: amount of months
+
+    Returns a data frame with the month (starting at 1) as index and the calendar entries as columns.
+    """
+    params = {key: value[0] if isinstance(value, list) else value for key, value in params.items()}
+    calendar = calculate_calendar([params], months)
+
+    return pd.DataFrame({entry: values[0] for entry, values in calendar.items()}, index=pd.RangeIndex(1, months+1, name='month'))
+
+def get_params_calendar(params, month):
+    """
+    Get the precomputed calendar of the parameters. The calendar is calculated on the fly if it is not part of the
+    parameters or does not cover the month, e.g. for runs longer than the precomputed months.
+    """
+    calendar = params.get('calendar')
+    if calendar is None or month not in calendar.index:
+        calendar = get_calendar(params, max(month, CALENDAR_MONTHS))
+
+    return calendar
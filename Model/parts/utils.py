@@ -9,6 +9,19 @@ from typing import *
 import pandas as pd
 import json
 import sqlite3
+import hashlib
+import io
+
+from Model.parts.agent_store import AgentStore, AgentView, OBJECT_FIELDS
+
+# amount of parsed inputs files kept in the parsed inputs cache
+PARSED_INPUTS_CACHE_SIZE = 32
+
+# parsed parameters by content hash of the inputs file and parse options
+_parsed_inputs_cache = {}
+
+# content hashes of the inputs files by path, modification time and size
+_input_file_hashes = {}
 
 # Helper Functions
 def convert_date(sys_param):
@@ -85,9 +98,9 @@ def new_agent(stakeholder_name: str, stakeholder_type: str, usd_funds: float,
     return agent
 
 
-def generate_agents(stakeholder_name_mapping: dict) -> dict:
+def generate_agents(stakeholder_name_mapping: dict) -> AgentStore:
     """
-    Initialize all token ecosystem agents aka stakeholders.
+    Initialize all token ecosystem agents aka stakeholders in a struct-of-arrays agent store.
     """
 
     initial_agents = {}
@@ -130,7 +143,7 @@ def generate_agents(stakeholder_name_mapping: dict) -> dict:
                                     holding_from_holding_tokens = 0,
                                     actions = {},
                                     current_action = 'hold')
-    return initial_agents
+    return AgentStore(initial_agents)
 
 def create_parameter_list(parameter_name, not_iterable_parameters, init_value, min, max, intervals):
     """
@@ -161,23 +174,93 @@ def create_parameter_list(parameter_name, not_iterable_parameters, init_value, m
             else:
                 return list(np.linspace(min, max, int(intervals)))
 
+def parse_numeric_column(values):
+    """
+    Parse a column of the QTM inputs tab into floats at once, ignoring thousands separators and percent signs.
+
+    Returns the parsed values and a mask of the text values, which are no numbers.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float), pd.Series(False, index=values.index)
+
+    is_text = values.map(type) == str
+    cleaned = values.where(~is_text, values.astype(str).str.replace('[,%]', '', regex=True))
+    numbers = pd.to_numeric(cleaned, errors='coerce')
+    invalid = is_text & numbers.isna() & (cleaned.astype(str).str.strip().str.lower() != 'nan')
+
+    return numbers, invalid
+
 def compose_initial_parameters(QTM_inputs, not_iterable_parameters):
     """
     Compose all initial parameter sets from the Quantitative Token Model inputs tab 'cadCAD_inputs'.
+    The columns are parsed at once with the same rules as create_parameter_list.
     """
+    parameter_names = QTM_inputs['Parameter Name'].str.lower().str.replace(' ', '_', regex=False).str.replace('[/()]', '', regex=True)
+    init_values, init_invalid = parse_numeric_column(QTM_inputs['Initial Value'])
+    min_values, min_invalid = parse_numeric_column(QTM_inputs['Min'])
+    max_values, max_invalid = parse_numeric_column(QTM_inputs['Max'])
+    intervals, intervals_invalid = parse_numeric_column(QTM_inputs['Interval Steps'])
+
+    not_iterable = parameter_names.isin(not_iterable_parameters)
+    invalid = ~not_iterable & (init_invalid | min_invalid | max_invalid | intervals_invalid)
+    sweep = ~not_iterable & ~invalid & min_values.notna() & max_values.notna() & intervals.notna() & (max_values > min_values)
+    boundary_error = ~not_iterable & ~invalid & (max_values <= min_values)
+    for min_value, max_value, init_value in zip(min_values[boundary_error], max_values[boundary_error], init_values[boundary_error]):
+        print("Maximum parameter boundary is lower than minimum parameter boundary: Min: ", min_value, "; Max:", max_value, ". Using initial value ", init_value, " instead.")
+
+    # not iterable parameters are kept as text
+    text_values = QTM_inputs['Initial Value'].astype(str).str.replace('[,%]', '', regex=True)
 
     initial_parameters = {}
-    for index, row in QTM_inputs.iterrows():
-        parameter_name = row['Parameter Name'].lower().replace(' ', '_').replace('/', '').replace('(', '').replace(')', '')
-        initial_parameters[parameter_name] = create_parameter_list(parameter_name, not_iterable_parameters, row['Initial Value'], row['Min'], row['Max'], row['Interval Steps'])
+    for parameter_name, is_not_iterable, is_invalid, is_sweep, raw_value, text_value, init_value, is_init_invalid, min_value, max_value, interval in zip(
+            parameter_names, not_iterable, invalid, sweep, QTM_inputs['Initial Value'], text_values, init_values.tolist(), init_invalid, min_values, max_values, intervals):
+        if is_not_iterable:
+            initial_parameters[parameter_name] = [text_value]
+        elif is_invalid:
+            # values which are no numbers are used as they are
+            initial_parameters[parameter_name] = [raw_value if is_init_invalid else init_value]
+        elif is_sweep:
+            initial_parameters[parameter_name] = list(np.linspace(min_value, max_value, int(interval)))
+        else:
+            initial_parameters[parameter_name] = [init_value]
+
     return initial_parameters
 
+def get_input_file_hash(input_file):
+    """
+    Get the content hash of an inputs file. The hash is only recalculated if the modification time or size of the
+    file has changed.
+    """
+    file_stat = os.stat(input_file)
+    file_key = (os.path.abspath(input_file), file_stat.st_mtime_ns, file_stat.st_size)
+    if file_key not in _input_file_hashes:
+        with open(input_file, 'rb') as f:
+            _input_file_hashes[file_key] = hashlib.sha256(f.read()).hexdigest()
+
+    return _input_file_hashes[file_key]
+
+def read_initial_parameters(input_file, not_iterable_parameters):
+    """
+    Read the initial parameter sets of a Quantitative Token Model inputs file. The parsed parameters are cached by the
+    content hash of the file and the parse options, so that an unchanged inputs file is only read and parsed once.
+
+    Returns a copy of the parsed parameters, which can be adjusted by the caller.
+    """
+    cache_key = (get_input_file_hash(input_file), tuple(not_iterable_parameters))
+    if cache_key not in _parsed_inputs_cache:
+        if len(_parsed_inputs_cache) >= PARSED_INPUTS_CACHE_SIZE:
+            # drop the oldest parsed inputs file
+            _parsed_inputs_cache.pop(next(iter(_parsed_inputs_cache)))
+        _parsed_inputs_cache[cache_key] = compose_initial_parameters(pd.read_csv(input_file), not_iterable_parameters)
+
+    return {parameter_name: list(values) for parameter_name, values in _parsed_inputs_cache[cache_key].items()}
+
 def calculate_investor_allocation(sys_param, stakeholder_name):
     """
     Calculate the initial token allocation of a specific stakeholder considering bonus amounts.
     """
     token_launch_price = [x / y for x in sys_param["public_sale_valuation"] for y in sys_param["initial_total_supply"]]
-    effective_token_price = [np.min([x / (1+y/100), z / a]) for x in token_launch_price for y in sys_param[stakeholder_name+"_bonus"] for z in sys_param[stakeholder_name+"_valuation"] for a in sys_param["initial_total_supply"] for a in sys_param["initial_total_supply"]]
+    effective_token_price = [np.min([x / (1+y/100), z / a]) for x in token_launch_price for y in sys_param[stakeholder_name+"_bonus"] for z in sys_param[stakeholder_name+"_valuation"] for a in sys_param["initial_total_supply"]]
     tokens = [x / y for x in sys_param[stakeholder_name+"_raised"] for y in effective_token_price]
     allocation = [x / y for x in tokens for y in sys_param['initial_total_supply']]
     3
@@ -189,7 +272,7 @@ def calculate_investor_effective_token_price(sys_param, stakeholder_name):
     Calculate the initial token allocation of a specific stakeholder considering bonus amounts.
     """
     token_launch_price = [x / y for x in sys_param["public_sale_valuation"] for y in sys_param["initial_total_supply"]]
-    effective_token_price = [np.min([x / (1+y/100), z / a]) for x in token_launch_price for y in sys_param[stakeholder_name+"_bonus"] for z in sys_param[stakeholder_name+"_valuation"] for a in sys_param["initial_total_supply"] for a in sys_param["initial_total_supply"]]
+    effective_token_price = [np.min([x / (1+y/100), z / a]) for x in token_launch_price for y in sys_param[stakeholder_name+"_bonus"] for z in sys_param[stakeholder_name+"_valuation"] for a in sys_param["initial_total_supply"]]
     return effective_token_price
 
 def calc_initial_lp_tokens(agent_token_allocations, sys_param):
@@ -382,3 +465,10 @@ def convert_to_json(x):
         return json.dumps(x)
     except:
         return x
+
+def get_run_seed(param_id, run):
+    """
+    Derive the seed of the random numbers of a Monte Carlo run deterministically from the parameter id and the run
+    index, so that every run can be reproduced and runs can be added later on.
+    """
+    return int.from_bytes(hashlib.sha256(f"{param_id}:{run}".encode()).digest()[:8], 'little')
@@ -1,8 +1,143 @@
+import numpy as np
 import pandas as pd
 import warnings
 
+from Model.parts.agent_store import AgentStore
+
 warnings.filterwarnings("ignore")
 
+def flatten_state_dicts(state_ds):
+    '''
+    Definition:
+    Flatten a column of state dictionaries, e.g. the token economy, into one column per key in a single pass over the rows.
+    The keys are taken from the first row, missing keys result in None like dict.get.
+
+    Parameters:
+    state_ds: series of state dictionaries
+
+    Returns a dictionary of the value lists per key.
+    '''
+    states = list(state_ds)
+    if len(states) == 0:
+        return {}
+
+    return {key: [state.get(key) for state in states] for key in states[0]}
+
+def flatten_agents(agent_ds):
+    '''
+    Definition:
+    Flatten a column of agents into the columns <a_name>_agents with the amount of agents of the same name and
+    <a_name>_<field> with the attributes of the first agent of that name.
+
+    Parameters:
+    agent_ds: series of AgentStores or dictionaries of agent dictionaries
+
+    Returns a dictionary of the value arrays or lists per column.
+    '''
+    agents = list(agent_ds)
+    if len(agents) == 0:
+        return {}
+    first_agents = agents[0]
+    columns = {}
+
+    if all(isinstance(store, AgentStore) and np.array_equal(store.names, first_agents.names) for store in agents):
+        # all rows share the same stakeholders -> stack the stakeholder columns of every field once
+        names = list(first_agents.names)
+        name_indexes = {name: names.index(name) for name in dict.fromkeys(names)}
+        fields = first_agents.agent_keys()
+        field_values = {}
+        for field in fields:
+            if field in first_agents.fields:
+                field_values[field] = np.stack([store.field_values(field) for store in agents])
+            else:
+                field_values[field] = [store.field_values(field) for store in agents]
+        for name, i in name_indexes.items():
+            columns[name+'_agents'] = np.full(len(agents), names.count(name))
+            for field in fields:
+                if field in first_agents.fields:
+                    columns[name+'_'+field] = field_values[field][:, i]
+                else:
+                    columns[name+'_'+field] = [values[i] for values in field_values[field]]
+
+        return columns
+
+    # generic agent dictionaries -> one pass over the agents of every row
+    agent_fields = {}
+    for agent in first_agents.values():
+        agent_fields.setdefault(agent['a_name'], list(agent.keys()))
+    counts = []
+    first_of_name = []
+    for row_agents in agents:
+        row_counts = {}
+        row_first = {}
+        for agent in row_agents.values():
+            row_counts[agent['a_name']] = row_counts.get(agent['a_name'], 0) + 1
+            row_first.setdefault(agent['a_name'], agent)
+        counts.append(row_counts)
+        first_of_name.append(row_first)
+
+    for name in agent_fields:
+        columns[name+'_agents'] = [row_counts.get(name, 0) for row_counts in counts]
+        for field in agent_fields[name]:
+            columns[name+'_'+field] = [row_first[name][field] for row_first in first_of_name]
+
+    return columns
+
+# state categories in the column order of the analysis datasets
+CATEGORIES = ['token_economy', 'liquidity_pool', 'agents', 'utilities', 'user_adoption', 'business_assumptions']
+
+def extract_columns(df, categories):
+    '''
+    Definition:
+    Flatten the state categories of all rows of a simulation dataframe in one pass
+
+    Parameters:
+    df: simulation dataframe
+    categories: list of categories to extract, see CATEGORIES
+
+    Returns a dictionary of the analysis dataset columns starting with timestep, date and run.
+    '''
+    columns = {'timestep': df.timestep,
+               'date': df.date,
+               'run': df.run
+               }
+
+    for category in CATEGORIES:
+        if category in categories:
+            if category == 'agents':
+                columns.update(flatten_agents(df[category]))
+            else:
+                columns.update(flatten_state_dicts(df[category]))
+
+    return columns
+
+def extract_state_metrics(state, metrics):
+    '''
+    Definition:
+    Extract single metrics of the analysis dataset from one simulation state without flattening all state categories,
+    e.g. the streamed metrics of every completed timestep
+
+    Parameters:
+    state: simulation state incl. timestep and run
+    metrics: list of analysis dataset columns, e.g. lp_token_price or reserve_a_tokens
+
+    Returns a dictionary of timestep, date, run and the metrics which are part of the state.
+    '''
+    row = {'timestep': state['timestep'], 'date': state['date'], 'run': state['run']}
+    for metric in metrics:
+        category = next((category for category in CATEGORIES if category != 'agents' and metric in state[category]), None)
+        if category is not None:
+            row[metric] = state[category][metric]
+            continue
+
+        # agent columns <a_name>_<field> of the first agent of that name
+        name, separator, field = metric.partition('_a_')
+        agent = next((agent for agent in state['agents'].values() if agent['a_name'] == name), None)
+        if separator != '' and agent is not None and 'a_'+field in agent:
+            row[metric] = agent['a_'+field]
+
+    return row
+
 def postprocessing(df, substep, category):
     '''
     Definition:
@@ -18,69 +153,43 @@ def postprocessing(df, substep, category):
     # subset to last substep
     df = df[df['substep'] == substep]
 
-    # Get the ABM results
-    timesteps = df.timestep
-    date = df.date
-    
-    # Create an analysis dataset
-    data = (pd.DataFrame({'timestep': timesteps,
-                          'date': date,
-                          'run': df.run
-                          })
-           )
-
-    ## Token Economy ##
-    if category == 'token_economy' or category == 'all':
-        token_economy_ds = df.token_economy
-        for key in token_economy_ds[token_economy_ds.keys()[0]]:
-            key_values = token_economy_ds.apply(lambda s: s.get(key))
-            data[key] = key_values     
-
-    ## Liquidity Pool ##
-    if category == 'liquidity_pool' or category == 'all':
-        liquidity_pool_ds = df.liquidity_pool
-        for key in liquidity_pool_ds[liquidity_pool_ds.keys()[0]]:
-            key_values = liquidity_pool_ds.apply(lambda s: s.get(key))
-            data[key] = key_values  
-    
-    ## AGENTS ##
-    if category == 'agents' or category == 'all':
-        agent_ds = df.agents
-        for key in agent_ds[agent_ds.keys()[0]]:
-            # Agent quantity
-            data[agent_ds[agent_ds.keys()[0]][key]['a_name']+'_agents'] = agent_ds.map(lambda s: sum([1 for agent in s.values() if agent['a_name'] == agent_ds[agent_ds.keys()[0]][key]['a_name']]))
-            
-            # Agent attributes
-            key_values = agent_ds.apply(lambda s: s.get(key))
-            for key2 in key_values[key_values.keys()[0]]:
-                data[agent_ds[agent_ds.keys()[0]][key]['a_name']+'_'+key2] = agent_ds.map(lambda s: [agent[key2] for agent in s.values() if agent['a_name'] == agent_ds[agent_ds.keys()[0]][key]['a_name']][0])
-
-    ## UTILITIES ##
-    if category == 'utilities' or category == 'all':
-        utilities_ds = df.utilities
-        for key in utilities_ds[utilities_ds.keys()[0]]:
-            key_values = utilities_ds.apply(lambda s: s.get(key))
-            data[key] = key_values  
-
-    ## USER ADOPTION ##
-    if category == 'user_adoption' or category == 'all':
-        user_adoption_ds = df.user_adoption
-        for key in user_adoption_ds[user_adoption_ds.keys()[0]]:
-            key_values = user_adoption_ds.apply(lambda s: s.get(key))
-            data[key] = key_values
-
-    ## BUSINESS ASSUMPTIONS ##
-    if category == 'business_assumptions' or category == 'all':
-        business_assumptions_ds = df.business_assumptions
-        for key in business_assumptions_ds[business_assumptions_ds.keys()[0]]:
-            key_values = business_assumptions_ds.apply(lambda s: s.get(key))
-            data[key] = key_values
+    # create all columns of the analysis dataset at once instead of one by one
+    data = pd.DataFrame(extract_columns(df, CATEGORIES if category == 'all' else [category]), index=df.index)
+
+    print("Postprocessing for substep: ", substep, " finished!")
     
-    ## AGGREGATED METRICS ##
+    return data
+
+def postprocessing_substeps(df, substeps, categories="all", combine=False):
+    '''
+    Definition:
+    Refine and extract metrics of several substeps from the simulation in a single pass over the raw results
+
+    Parameters:
+    df: simulation dataframe
+    substeps: list of the substeps you would like to extract the metrics from, e.g. [16, 19, 20, 21, 23] for the
+    liquidity pool transactions and the end of the timestep
+    categories: 'all', a single category or a list of categories, see postprocessing
+    combine: return one dataframe with an additional substep column instead of one dataframe per substep
 
+    Returns a dictionary of the analysis datasets per substep or the combined analysis dataset.
+    '''
+    print("Postprocessing for substeps: ", substeps, " and categories: ", categories, "started..")
+    if categories == 'all':
+        categories = CATEGORIES
+    elif isinstance(categories, str):
+        categories = [categories]
 
+    # subset to the requested substeps
+    df = df[df['substep'].isin(substeps)]
 
+    columns = extract_columns(df, categories)
+    columns = {**{key: columns.pop(key) for key in ['timestep', 'date', 'run']}, 'substep': df.substep, **columns}
+    data = pd.DataFrame(columns, index=df.index)
 
-    print("Postprocessing for substep: ", substep, " finished!")
-    
-    return data
\ No newline at end of file
+    print("Postprocessing for substeps: ", substeps, " finished!")
+
+    if combine:
+        return data
+
+    return {substep: data[data['substep'] == substep].drop(columns='substep') for substep in substeps}
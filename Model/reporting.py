@@ -0,0 +1,35 @@
+"""
+Reporting of validation warnings of the model, e.g. a missing or duplicate project name.
+
+The model core does not depend on a user interface. Warnings are passed to the active reporter, which prints them by
+default. A user interface installs its own reporter with set_reporter, e.g. the Streamlit app shows them with st.warning.
+"""
+
+def print_reporter(message, icon=None):
+    """
+    Default reporter, which prints the warning to the console.
+    """
+    print("Warning: " + message)
+
+# active reporter, called with the message and an optional icon of the warning
+_reporter = print_reporter
+
+
+def set_reporter(reporter):
+    """
+    Install the reporter of the validation warnings and return the former one.
+
+    Parameters:
+    reporter: function of the warning message and an optional icon keyword argument
+    """
+    global _reporter
+    former_reporter = _reporter
+    _reporter = reporter
+
+    return former_reporter
+
+def report_warning(message, icon=None):
+    """
+    Report a validation warning to the active reporter.
+    """
+    _reporter(message, icon=icon)
@@ -0,0 +1,120 @@
+"""
+Bounded cache of the simulation results.
+
+The parameter sets in the sys_param table are kept forever, whereas their simulation results are only cached within
+a disk budget. The result_cache table records the size and the last access of the simulation results of every
+parameter set. When the results exceed the budget, the least recently used ones are evicted. An evicted parameter
+set is simulated again from its stored parameters as soon as its results are requested. SQLite reuses the pages of
+evicted results for new ones, so that the database file stops growing.
+
+Tables:
+result_cache: param_id, size of the simulation results in bytes, last access as unix time
+"""
+import os
+import time
+
+from Model.database import write_transaction
+from Model.storage import RESULTS_DIR, get_arrow_path, get_arrow_paths, delete_simulation_data
+
+# disk budget of all cached simulation results in bytes
+RESULT_CACHE_BUDGET = 2 * 1024**3
+
+# approximate bytes of the key columns of a row in the results table
+RESULT_ROW_OVERHEAD = 16
+
+
+def create_result_cache_table(conn):
+    """
+    Create the result_cache table if it does not exist yet and register the simulation results which are not tracked
+    yet, e.g. the ones stored before the result cache was introduced. Requires the results tables of the storage.
+    """
+    with write_transaction(conn):
+        conn.execute('''CREATE TABLE IF NOT EXISTS result_cache (
+                        param_id TEXT PRIMARY KEY,
+                        size INTEGER NOT NULL,
+                        last_access REAL NOT NULL)''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS result_cache_last_access ON result_cache (last_access)''')
+
+        tracked_param_ids = set(row[0] for row in conn.execute('SELECT param_id FROM result_cache').fetchall())
+        param_ids = [row[0] for row in conn.execute('SELECT param_id FROM simulations').fetchall()]
+        if os.path.isdir(RESULTS_DIR):
+            param_ids += [file_name[:-len('.arrow')] for file_name in os.listdir(RESULTS_DIR) if file_name.endswith('.arrow')]
+        untracked_param_ids = [param_id for param_id in dict.fromkeys(param_ids) if param_id not in tracked_param_ids]
+        if len(untracked_param_ids) > 0:
+            print("Registering ", len(untracked_param_ids), " stored simulations in the result cache..")
+            # untracked simulation results count as least recently used
+            conn.executemany('INSERT INTO result_cache (param_id, size, last_access) VALUES (?, ?, 0)',
+                             [(param_id, get_simulation_size(conn, param_id)) for param_id in untracked_param_ids])
+
+def get_simulation_size(conn, param_id):
+    """
+    Get the size of the simulation results of a parameter set in bytes. The size of results in the shared results
+    table is estimated from the size of their values.
+    """
+    if os.path.exists(get_arrow_path(param_id)):
+        return sum(os.path.getsize(path) for path in get_arrow_paths(param_id))
+
+    size = conn.execute(f'''SELECT sum({RESULT_ROW_OVERHEAD} + length(param_id) + CASE typeof(value)
+                                WHEN 'text' THEN length(CAST(value AS BLOB))
+                                WHEN 'blob' THEN length(value)
+                                WHEN 'null' THEN 0
+                                ELSE 8 END)
+                            FROM simulation_results WHERE param_id = ?''', (param_id,)).fetchone()[0]
+
+    return 0 if size is None else size
+
+def record_simulation(conn, param_id):
+    """
+    Record the size of freshly stored simulation results of a parameter set and mark them as accessed.
+    """
+    with write_transaction(conn):
+        conn.execute('INSERT OR REPLACE INTO result_cache (param_id, size, last_access) VALUES (?, ?, ?)',
+                     (param_id, get_simulation_size(conn, param_id), time.time()))
+
+def touch_simulation(conn, param_id):
+    """
+    Mark the simulation results of a parameter set as accessed.
+    """
+    with write_transaction(conn):
+        conn.execute('UPDATE result_cache SET last_access = ? WHERE param_id = ?', (time.time(), param_id))
+
+def get_result_cache_size(conn):
+    """
+    Get the size of all cached simulation results in bytes.
+    """
+    size = conn.execute('SELECT sum(size) FROM result_cache').fetchone()[0]
+
+    return 0 if size is None else size
+
+def evict_simulations(conn, budget=None, keep=()):
+    """
+    Evict the least recently used simulation results until all cached results fit into the disk budget. The parameter
+    sets stay in the sys_param table.
+
+    Parameters:
+    conn: SQLite connection
+    budget: disk budget in bytes, defaults to RESULT_CACHE_BUDGET
+    keep: parameter ids whose results must not be evicted, e.g. the ones of the current simulation
+
+    Returns the parameter ids of the evicted simulation results.
+    """
+    budget = RESULT_CACHE_BUDGET if budget is None else budget
+    cache_size = get_result_cache_size(conn)
+    if cache_size <= budget:
+        return []
+
+    evicted_param_ids = []
+    for param_id, size in conn.execute('SELECT param_id, size FROM result_cache ORDER BY last_access').fetchall():
+        if cache_size <= budget:
+            break
+        if param_id in keep:
+            continue
+        with write_transaction(conn):
+            delete_simulation_data(conn, param_id)
+            conn.execute('DELETE FROM result_cache WHERE param_id = ?', (param_id,))
+        cache_size -= size
+        evicted_param_ids.append(param_id)
+
+    print("Evicted the simulation results of ", len(evicted_param_ids), " parameter sets from the result cache.")
+
+    return evicted_param_ids
@@ -0,0 +1,257 @@
+"""
+Streaming aggregation of Monte Carlo runs into a compact summary per timestep and metric.
+
+The runs of a parameter set are added to a RunAggregator one by one as they finish. The aggregator keeps the running
+mean and variance by Welford's algorithm, the minimum and maximum and a P² quantile sketch (Jain & Chlamtac) per
+SUMMARY_QUANTILES, so its memory does not grow with the amount of runs. The summary and the state of the aggregator
+are stored in the database, so that fan charts are plotted without loading the runs and further runs are added to the
+summary later on.
+
+Tables:
+run_summaries: param_id, aggregated run indexes, state of the aggregator
+run_summary_values: param_id, metric_id, timestep, runs, mean, std, min, max and quantiles of the metric
+"""
+import io
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from Model.database import write_transaction
+from Model.storage import KEY_COLUMNS, get_metric_ids
+
+# quantiles of the run summaries, e.g. for the bands of the fan charts
+SUMMARY_QUANTILES = [0.05, 0.5, 0.95]
+
+# amount of markers of a P² quantile sketch
+P2_MARKERS = 5
+
+
+def get_quantile_column(quantile):
+    """
+    Get the summary column of a quantile, e.g. p5 for the 0.05 quantile.
+    """
+    return f"p{round(quantile * 100)}"
+
+class RunAggregator:
+    """
+    Online aggregation of the runs of a parameter set per timestep and metric. Every run has to contain the same
+    timesteps and numeric metrics.
+    """
+
+    def __init__(self, timesteps, metrics, quantiles=SUMMARY_QUANTILES):
+        self.timesteps = np.asarray(timesteps)
+        self.metrics = list(metrics)
+        self.quantiles = list(quantiles)
+        shape = (len(self.timesteps), len(self.metrics))
+
+        # Welford's running mean and sum of squared deviations
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+        # marker heights and positions of the P² sketches, the first runs are buffered as initial markers
+        self.heights = np.zeros((len(self.quantiles), P2_MARKERS) + shape)
+        self.positions = np.tile(np.arange(1, P2_MARKERS + 1, dtype=np.int32).reshape(1, P2_MARKERS, 1, 1), (len(self.quantiles), 1) + shape)
+
+    @classmethod
+    def from_run(cls, data, quantiles=SUMMARY_QUANTILES):
+        """
+        Create an aggregator of the timesteps and numeric metrics of the analysis dataset of a run.
+        """
+        metrics = [column for column in data.select_dtypes('number').columns if column not in KEY_COLUMNS]
+
+        return cls(np.sort(data['timestep'].astype(int).unique()), metrics, quantiles)
+
+    def add_run(self, data):
+        """
+        Add the analysis dataset of a single run to the aggregation.
+        """
+        values = data.assign(timestep=data['timestep'].astype(int)).set_index('timestep').reindex(self.timesteps)[self.metrics].to_numpy(dtype=float)
+
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+        np.minimum(self.min, values, out=self.min)
+        np.maximum(self.max, values, out=self.max)
+
+        if self.count <= P2_MARKERS:
+            self.heights[:, self.count - 1] = values
+            if self.count == P2_MARKERS:
+                self.heights.sort(axis=1)
+        else:
+            for quantile_index in range(len(self.quantiles)):
+                self._update_sketch(quantile_index, values)
+
+    def _update_sketch(self, quantile_index, values):
+        """
+        Add a run to the P² sketch of a quantile, vectorized over all timesteps and metrics.
+        """
+        p = self.quantiles[quantile_index]
+        heights = self.heights[quantile_index]
+        positions = self.positions[quantile_index]
+
+        # cell of the new value between the markers, the outer markers follow the minimum and maximum
+        cell = (values >= heights[1]).astype(np.int32) + (values >= heights[2]) + (values >= heights[3])
+        np.minimum(heights[0], values, out=heights[0])
+        np.maximum(heights[P2_MARKERS - 1], values, out=heights[P2_MARKERS - 1])
+        positions[1:] += np.arange(1, P2_MARKERS, dtype=np.int32).reshape(-1, 1, 1) > cell
+
+        # desired marker positions are the same for all timesteps and metrics
+        desired = 1 + (self.count - 1) * np.array([0, p / 2, p, (1 + p) / 2, 1])
+
+        # move the inner markers towards their desired positions
+        for i in range(1, P2_MARKERS - 1):
+            offset = desired[i] - positions[i]
+            step = np.where((offset >= 1) & (positions[i + 1] - positions[i] > 1), 1,
+                            np.where((offset <= -1) & (positions[i - 1] - positions[i] < -1), -1, 0))
+            if not step.any():
+                continue
+
+            # piecewise parabolic prediction of the marker height, linear if it is not between the neighbouring markers
+            parabolic = heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+                (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i])
+                + (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1]))
+            neighbour = np.where(step > 0, i + 1, i - 1)
+            neighbour_heights = np.take_along_axis(heights, neighbour[None], axis=0)[0]
+            neighbour_positions = np.take_along_axis(positions, neighbour[None], axis=0)[0]
+            linear = heights[i] + step * (neighbour_heights - heights[i]) / (neighbour_positions - positions[i])
+
+            heights[i] = np.where(step == 0, heights[i],
+                                  np.where((heights[i - 1] < parabolic) & (parabolic < heights[i + 1]), parabolic, linear))
+            positions[i] += step.astype(np.int32)
+
+    def get_quantile(self, quantile_index):
+        """
+        Get the estimate of a quantile per timestep and metric. The quantiles of up to P2_MARKERS runs are exact.
+        """
+        if self.count <= P2_MARKERS:
+            return np.quantile(self.heights[quantile_index, :self.count], self.quantiles[quantile_index], axis=0)
+
+        return self.heights[quantile_index, P2_MARKERS // 2].copy()
+
+    def summary(self):
+        """
+        Get the summary of the aggregated runs with one row per timestep and metric.
+        """
+        std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.full(self.mean.shape, np.nan)
+        summary = {'timestep': np.repeat(self.timesteps, len(self.metrics)),
+                   'metric': np.tile(np.asarray(self.metrics, dtype=object), len(self.timesteps)),
+                   'runs': np.full(self.mean.size, self.count),
+                   'mean': self.mean.ravel(),
+                   'std': std.ravel(),
+                   'min': self.min.ravel(),
+                   'max': self.max.ravel()}
+        for quantile_index, quantile in enumerate(self.quantiles):
+            summary[get_quantile_column(quantile)] = self.get_quantile(quantile_index).ravel()
+
+        return pd.DataFrame(summary)
+
+    def to_bytes(self):
+        """
+        Serialize the state of the aggregator, e.g. to continue the aggregation with further runs later on.
+        """
+        buffer = io.BytesIO()
+        np.savez(buffer, timesteps=self.timesteps, metrics=np.asarray(self.metrics), quantiles=np.asarray(self.quantiles),
+                 count=self.count, mean=self.mean, m2=self.m2, min=self.min, max=self.max, heights=self.heights, positions=self.positions)
+
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, state):
+        """
+        Restore an aggregator from its serialized state.
+        """
+        arrays = np.load(io.BytesIO(state))
+        aggregator = cls(arrays['timesteps'], arrays['metrics'].tolist(), arrays['quantiles'].tolist())
+        aggregator.count = int(arrays['count'])
+        for name in ['mean', 'm2', 'min', 'max', 'heights', 'positions']:
+            setattr(aggregator, name, arrays[name])
+
+        return aggregator
+
+def create_summary_tables(conn):
+    """
+    Create the run summary tables if they do not exist yet.
+    """
+    quantile_columns = ''.join(f'{get_quantile_column(quantile)} REAL, ' for quantile in SUMMARY_QUANTILES)
+    with write_transaction(conn):
+        conn.execute('''CREATE TABLE IF NOT EXISTS run_summaries (
+                        param_id TEXT PRIMARY KEY,
+                        runs TEXT NOT NULL,
+                        state BLOB NOT NULL)''')
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS run_summary_values (
+                         param_id TEXT NOT NULL,
+                         metric_id INTEGER NOT NULL,
+                         timestep INTEGER NOT NULL,
+                         runs INTEGER NOT NULL,
+                         mean REAL, std REAL, min REAL, max REAL, {quantile_columns}
+                         PRIMARY KEY (param_id, metric_id, timestep)) WITHOUT ROWID''')
+
+def save_run_summary(conn, param_id, aggregator, runs):
+    """
+    Store the summary and the state of the aggregator of a parameter set and replace its former summary.
+
+    Parameters:
+    conn: SQLite connection
+    param_id: id of the parameter set
+    aggregator: RunAggregator of the runs
+    runs: list of the aggregated run indexes
+    """
+    summary = aggregator.summary()
+    columns = [column for column in summary.columns if column != 'metric']
+    with write_transaction(conn):
+        metric_ids = get_metric_ids(conn, aggregator.metrics, register=True)
+        conn.execute('DELETE FROM run_summary_values WHERE param_id = ?', (param_id,))
+        conn.executemany(f'''INSERT INTO run_summary_values (param_id, metric_id, {', '.join(columns)})
+                             VALUES (?, ?, {', '.join('?' * len(columns))})''',
+                         zip([param_id] * len(summary), summary['metric'].map(metric_ids).tolist(),
+                             *[summary[column].astype(int if column in ['timestep', 'runs'] else float).tolist() for column in columns]))
+        conn.execute('INSERT OR REPLACE INTO run_summaries (param_id, runs, state) VALUES (?, ?, ?)',
+                     (param_id, json.dumps(sorted(int(run) for run in runs)), aggregator.to_bytes()))
+
+def load_run_aggregator(conn, param_id):
+    """
+    Load the aggregator of the runs of a parameter set.
+
+    Returns the RunAggregator and the list of its aggregated run indexes or None and an empty list if the runs of the
+    parameter set have not been aggregated yet.
+    """
+    row = conn.execute('SELECT runs, state FROM run_summaries WHERE param_id = ?', (param_id,)).fetchone()
+    if row is None:
+        return None, []
+
+    return RunAggregator.from_bytes(row[1]), json.loads(row[0])
+
+def load_run_summary(conn, param_id, metrics=None):
+    """
+    Load the summary of the runs of a parameter set.
+
+    Parameters:
+    conn: SQLite connection
+    param_id: id of the parameter set
+    metrics: list of metrics to load, defaults to all aggregated metrics
+
+    Returns the summary with one row per timestep and metric, which is empty if no runs have been aggregated.
+    """
+    metric_filter = '' if metrics is None else f" AND metric_id IN ({','.join(str(metric_id) for metric_id in get_metric_ids(conn, metrics).values())})"
+    summary = pd.read_sql(f'''SELECT result_metrics.metric, run_summary_values.* FROM run_summary_values
+                              JOIN result_metrics USING (metric_id)
+                              WHERE param_id = ?{metric_filter} ORDER BY metric, timestep''', conn, params=(param_id,))
+
+    return summary.drop(columns=['param_id', 'metric_id'])
+
+def count_summary_runs(conn, param_id):
+    """
+    Count the aggregated runs of a parameter set without loading the state of its aggregator.
+    """
+    try:
+        row = conn.execute('SELECT runs FROM run_summaries WHERE param_id = ?', (param_id,)).fetchone()
+    except sqlite3.OperationalError:
+        # no runs have been aggregated yet
+        return 0
+
+    return 0 if row is None else len(json.loads(row[0]))
@@ -5,10 +5,8 @@ import os
 import sys
 import traceback
 import time
-import streamlit as st
-import pandas as pd
 import sqlite3
-import streamlit as st
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # radCAD
 from radcad import Model, Simulation, Experiment
@@ -24,41 +22,335 @@ parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
 sys.path.append(parent_dir)
 
 
-from Model.state_variables import get_initial_state
+from Model.state_variables import get_initial_state, get_initial_states_sweep, get_stored_initial_state
 from Model.state_update_blocks import state_update_blocks
 from Model.parts.utils import *
 from Model.post_processing import *
+from Model.static_engine import run_static_simulation, run_static_simulation_batch, static_engine_data
+from Model.storage import create_results_tables, simulation_data_exists, save_simulation_data, append_simulation_data, load_simulation_runs, load_simulation_data
+from Model.run_summary import RunAggregator, create_summary_tables, save_run_summary, load_run_aggregator
+from Model.result_cache import create_result_cache_table, record_simulation, touch_simulation, evict_simulations
+from Model.database import connect_database, write_transaction, read_connection
+from Model.sweep_grid import SWEEP_CHUNK_SIZE, iterate_chunks
+from Model.reporting import report_warning
 
-@st.cache_data
-def simulation(input_file, adjusted_params):
-    # get simulation parameters
-    initial_state, sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim = get_initial_state(input_file, adjusted_params)
-    start_time = time.process_time()
-    listOfSimulationDataTables = cur.execute(''' SELECT count(name) FROM sqlite_master WHERE type='table' AND name='simulation_data_{param_id}' '''.format(length='multi-line', param_id=param_id))
-    if listOfSimulationDataTables.fetchall()[0][0] == 0 and execute_sim:
-        MONTE_CARLO_RUNS = 1
-        TIMESTEPS = 12*10
+# simulation settings
+MONTE_CARLO_RUNS = 1
+TIMESTEPS = 12*10
 
+def run_simulation(initial_state, sys_param, timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS, retention='last', progress=None, sink=None, seeds=None, profiler=None):
+    """
+    Run the radCAD model of a single parameter set and only keep the results of the retained substeps.
+
+    Parameters:
+    initial_state: initial state of the model
+    sys_param: system parameters of the model
+    timesteps: amount of simulated months
+    runs: amount of Monte Carlo runs
+    retention: 'all' to keep every substep, 'last' to keep only the end of each timestep or a list of substeps to keep,
+    e.g. [16, 19, 20, 21, 23] for the liquidity pool transactions and the end of the timestep
+    progress: optional function of the simulated and the total amount of timesteps, called after every timestep
+    sink: optional function of the state at the end of every timestep, called as soon as the timestep has been simulated
+    seeds: optional list of the random seeds of the runs, passed to the model as monte_carlo_seed parameter
+    profiler: optional SubstepProfiler, which records the calls of the policy and state update functions
+
+    Returns the retained radCAD results incl. the initial state as data frame.
+    """
+    if progress is None and sink is None and seeds is None and profiler is None and (retention == 'all' or retention == 'last'):
+        # radCAD drops the substeps of each timestep right after it has been simulated
         model = Model(initial_state=initial_state, params=sys_param, state_update_blocks=state_update_blocks)
-        simulation = Simulation(model=model, timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS)
+        simulation = Simulation(model=model, timesteps=timesteps, runs=runs)
+        simulation.engine = Engine(drop_substeps=(retention == 'last'))
 
-        result = simulation.run()
-        df = pd.DataFrame(result)
+        return pd.DataFrame(simulation.run())
+
+    # step through the model timestep by timestep and keep only the retained substeps
+    if retention == 'all':
+        retained_substeps = set(range(1, len(state_update_blocks) + 1))
+    elif retention == 'last':
+        retained_substeps = {len(state_update_blocks)}
+    else:
+        retained_substeps = set(retention)
+    blocks = state_update_blocks if profiler is None else profiler.instrument(state_update_blocks)
+    records = []
+    for run in range(runs):
+        params = sys_param if seeds is None else {**sys_param, 'monte_carlo_seed': [seeds[run]]}
+        model = Model(initial_state=initial_state, params=params, state_update_blocks=blocks)
+        records.append({**model.state, 'run': run + 1})
+        model_steps = iter(model)
+        for timestep in range(timesteps):
+            if profiler is not None:
+                profiler.start_timestep(run + 1, timestep + 1)
+            next(model_steps)
+            records.extend({**substate, 'run': run + 1} for substate in model.substeps if substate['substep'] in retained_substeps)
+            if sink is not None:
+                sink({**model.substeps[-1], 'run': run + 1})
+            if progress is not None:
+                progress(run * timesteps + timestep + 1, runs * timesteps)
+
+    return pd.DataFrame(records)
+
+def simulate_parameter_set(initial_state, sys_param, stakeholder_name_mapping, progress=None, sink=None, seed=None, sink_metrics=None):
+    """
+    Simulate a single parameter set and return its postprocessed simulation data at the end of every timestep.
+
+    progress: optional function of the simulated and the total amount of timesteps
+    sink: optional function of the postprocessed metrics of every completed timestep, e.g. of create_stream_sink
+    seed: random seed of the stochastic agent behavior, e.g. get_run_seed(param_id, 1)
+    sink_metrics: metrics the sink stores, e.g. STREAM_METRICS. Only these are taken from the states of the radCAD
+    model instead of postprocessing every state completely.
+    """
+    if sys_param['agent_behavior'][0] == 'static':
+        # deterministic agent behavior -> vectorized engine with the same output as the radCAD post processing
+        data, data_lp_transactions = run_static_simulation(sys_param, stakeholder_name_mapping, TIMESTEPS)
+        # all timesteps are computed at once
+        if sink is not None:
+            for row in data.to_dict('records'):
+                sink(row)
+        if progress is not None:
+            progress(TIMESTEPS, TIMESTEPS)
+    else:
+        # postprocess the end of every timestep for the sink as soon as it has been simulated
+        if sink is None:
+            timestep_sink = None
+        elif sink_metrics is not None:
+            timestep_sink = lambda state: sink(extract_state_metrics(state, sink_metrics))
+        else:
+            timestep_sink = lambda state: sink({key: values[0] for key, values in extract_columns(pd.DataFrame([state]), CATEGORIES).items()})
+        df = run_simulation(initial_state, sys_param, retention='last', progress=progress, sink=timestep_sink, seeds=None if seed is None else [seed])
 
         # post processing
         data = postprocessing(df, substep=df.substep.max(), category="all") # at the end of the timestep = last substep
 
-        # Apply the conversion function to each column in the DataFrame
-        for col in data.columns:
-            data[col] = data[col].apply(convert_to_json)
-        
-        # Save the DataFrame to a new SQLite table
-        data.to_sql('simulation_data_'+param_id, conn, if_exists='replace', index=False)
-        
-        # Close the connection
-        conn.close()
+    return data
+
+def simulation(input_file, adjusted_params, runs=MONTE_CARLO_RUNS, processes=None):
+    # get simulation parameters
+    initial_state, sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim = get_initial_state(input_file, adjusted_params)
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    start_time = time.process_time()
+    if not simulation_data_exists(conn, param_id) and execute_sim:
+        data = simulate_parameter_set(initial_state, sys_param, stakeholder_name_mapping, seed=get_run_seed(param_id, 1))
+
+        save_simulation_data(data, param_id, conn)
+        record_simulation(conn, param_id)
+        evict_simulations(conn, keep=[param_id])
 
         # display necessery time
         print("Simulation time: ", time.process_time() - start_time, " s")
+    elif execute_sim:
+        touch_simulation(conn, param_id)
+
+    # Close the connection
+    conn.close()
+
+    # the single simulation is the first Monte Carlo run
+    if execute_sim and runs > 1:
+        simulate_monte_carlo(param_id, runs, processes)
+
+    return param_id, execute_sim
+
+def simulate_run(initial_state, sys_param, stakeholder_name_mapping, param_id, run):
+    """
+    Simulate a single Monte Carlo run of a parameter set with the random seed of the run.
+
+    Returns the postprocessed simulation data of the run at the end of every timestep.
+    """
+    data = simulate_parameter_set(initial_state, sys_param, stakeholder_name_mapping, seed=get_run_seed(param_id, run))
+    data['run'] = run
+
+    return data
+
+def simulate_monte_carlo(param_id, runs, processes=None, keep_runs=True):
+    """
+    Simulate the Monte Carlo runs of a stored parameter set in a pool of worker processes. Every run is seeded by
+    get_run_seed(param_id, run), so stored runs are reproducible and only the missing runs are simulated, e.g. 100 runs
+    on top of 100 stored ones when the parameter set is topped up to 200 runs. The runs are aggregated into the run
+    summary of the parameter set as they finish.
+
+    Parameters:
+    param_id: id of the parameter set
+    runs: total amount of Monte Carlo runs of the parameter set
+    processes: number of worker processes, defaults to all available cores
+    keep_runs: store the simulation data of every run, otherwise only the run summary is stored
+
+    Returns the sorted list of the aggregated run indexes.
+    """
+    conn = connect_database()
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    create_summary_tables(conn)
+    initial_state, sys_param, stakeholder_name_mapping = get_stored_initial_state(param_id)
+    if sys_param is None:
+        conn.close()
+        raise KeyError(f"Parameter set {param_id} does not exist.")
+    if sys_param['agent_behavior'][0] != 'stochastic':
+        report_warning(f"The Monte Carlo runs of parameter set {param_id} are identical with the {sys_param['agent_behavior'][0]} agent behavior. Please choose the stochastic agent behavior for varying runs.")
+
+    # stored runs which are not part of the run summary yet, e.g. the first run of a single simulation
+    aggregator, aggregated_runs = load_run_aggregator(conn, param_id)
+    stored_runs = load_simulation_runs(conn, param_id) if simulation_data_exists(conn, param_id) else []
+    for run in stored_runs:
+        if run not in aggregated_runs:
+            data = load_simulation_data(conn, param_id, runs=[run])
+            aggregator = RunAggregator.from_run(data) if aggregator is None else aggregator
+            aggregator.add_run(data)
+            aggregated_runs.append(run)
+
+    missing_runs = [run for run in range(1, runs + 1) if run not in aggregated_runs]
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=processes if processes is not None else os.cpu_count()) as executor:
+        futures = [executor.submit(simulate_run, initial_state, sys_param, stakeholder_name_mapping, param_id, run) for run in missing_runs]
+
+        # aggregate and store the runs in the order in which they finish
+        for finished_runs, future in enumerate(as_completed(futures), start=1):
+            data = future.result()
+            run = int(data['run'].iloc[0])
+            aggregator = RunAggregator.from_run(data) if aggregator is None else aggregator
+            aggregator.add_run(data)
+            aggregated_runs.append(run)
+            if keep_runs and simulation_data_exists(conn, param_id):
+                append_simulation_data(data, param_id, conn)
+            elif keep_runs:
+                save_simulation_data(data, param_id, conn)
+            print(f"[{finished_runs}/{len(missing_runs)}] Finished run {run} of parameter set {param_id} after {time.time() - start_time:.1f} s")
+
+    if aggregator is not None:
+        save_run_summary(conn, param_id, aggregator, aggregated_runs)
+    if simulation_data_exists(conn, param_id):
+        record_simulation(conn, param_id)
+    evict_simulations(conn, keep=[param_id])
+    conn.close()
+
+    return sorted(aggregated_runs)
+
+def ensure_simulation_data(param_id):
+    """
+    Make sure that the simulation data of a stored parameter set is available, e.g. before plotting it. The check is a
+    single read of a pooled read connection. Simulation data which has been evicted from the result cache is simulated
+    again from the stored parameter set. The tables are created by the app or the job workers at startup.
+
+    Returns False if no parameter set with this id exists.
+    """
+    try:
+        with read_connection() as conn:
+            if simulation_data_exists(conn, param_id):
+                return True
+    except (FileNotFoundError, sqlite3.OperationalError):
+        # no simulation has been stored yet
+        pass
+
+    initial_state, sys_param, stakeholder_name_mapping = get_stored_initial_state(param_id)
+    if sys_param is None:
+        return False
+
+    print("Simulating evicted parameter set ", param_id, " again..")
+    data = simulate_parameter_set(initial_state, sys_param, stakeholder_name_mapping, seed=get_run_seed(param_id, 1))
+    conn = connect_database()
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    save_simulation_data(data, param_id, conn)
+    record_simulation(conn, param_id)
+    evict_simulations(conn, keep=[param_id])
+    conn.close()
+
+    return True
+
+def touch_simulation_data(param_id):
+    """
+    Mark the stored simulation data of a parameter set as recently used in the result cache, e.g. once per page of the
+    app instead of once per chart. Parameter sets without stored simulation data are skipped without a write.
+    """
+    try:
+        with read_connection() as conn:
+            if not simulation_data_exists(conn, param_id):
+                return
+    except (FileNotFoundError, sqlite3.OperationalError):
+        # no simulation has been stored yet
+        return
+
+    conn = connect_database()
+    touch_simulation(conn, param_id)
+    conn.close()
+
+def run_sweep_chunk(chunk, stakeholder_name_mapping, conn, processes=None, backend=Backend.DEFAULT):
+    """
+    Simulate and save the parameter sets of a chunk of a parameter sweep, which have not been simulated yet. Parameter
+    sets with static agent behavior are evaluated as one batch by the vectorized static engine, all others as one
+    radCAD experiment.
+    """
+    simulations = []
+    simulation_param_ids = []
+    static_sys_params = []
+    static_param_ids = []
+    for initial_state, sys_param, param_id, execute_sim in chunk:
+        if execute_sim and not simulation_data_exists(conn, param_id) and param_id not in simulation_param_ids + static_param_ids:
+            if sys_param['agent_behavior'][0] == 'static':
+                static_sys_params.append(sys_param)
+                static_param_ids.append(param_id)
+            else:
+                model = Model(initial_state=initial_state, params={**sys_param, 'monte_carlo_seed': [get_run_seed(param_id, 1)]}, state_update_blocks=state_update_blocks)
+                simulations.append(Simulation(model=model, timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS))
+                simulation_param_ids.append(param_id)
+
+    if len(static_sys_params) > 0:
+        # deterministic parameter subsets are evaluated together as one array computation
+        print("Running ", len(static_sys_params), " static parameter subsets..")
+        history = run_static_simulation_batch(static_sys_params, stakeholder_name_mapping, TIMESTEPS)
+        for scenario_index, param_id in enumerate(static_param_ids):
+            save_simulation_data(static_engine_data(history, scenario_index, stakeholder_name_mapping), param_id, conn)
+            record_simulation(conn, param_id)
+
+    if len(simulations) > 0:
+        print("Running ", len(simulations), " parameter subsets..")
+        experiment = Experiment(simulations)
+        experiment.engine = Engine(backend=backend, processes=processes if processes is not None else os.cpu_count(), drop_substeps=True)
+
+        result = experiment.run()
+        df = pd.DataFrame(result)
+
+        # post processing and saving of every parameter subset under its own id
+        for simulation_index, param_id in enumerate(simulation_param_ids):
+            df_subset = df[df['simulation'] == simulation_index]
+            data = postprocessing(df_subset, substep=df_subset.substep.max(), category="all") # at the end of the timestep = last substep
+            save_simulation_data(data, param_id, conn)
+            record_simulation(conn, param_id)
+
+def simulation_sweep(input_file, adjusted_params, processes=None, backend=Backend.DEFAULT, grid='cartesian', chunk_size=SWEEP_CHUNK_SIZE):
+    """
+    Run all parameter subsets of the parameter sweep lists in the inputs file. The parameter subsets are enumerated
+    lazily and simulated in chunks, so that the memory use does not grow with the size of the sweep.
+
+    Parameters:
+    input_file: path to the QTM radCAD inputs file
+    adjusted_params: dictionary of parameters overriding the inputs file
+    processes: number of worker processes, defaults to all available cores
+    backend: radCAD execution backend, e.g. Backend.PATHOS, Backend.MULTIPROCESSING or Backend.SINGLE_PROCESS
+    grid: 'cartesian' for all combinations of the sweep lists or 'zip' for the radCAD parameter sweep
+    chunk_size: amount of parameter subsets simulated together
+
+    Returns the parameter ids of all subsets in the order of the sweep.
+    """
+    # get simulation parameters for every parameter subset
+    initial_states_sweep, stakeholder_name_mapping, stakeholder_names, conn, cur = get_initial_states_sweep(input_file, adjusted_params, grid)
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    start_time = time.time()
+
+    sweep_param_ids = []
+    for chunk in iterate_chunks(initial_states_sweep, chunk_size):
+        sweep_param_ids += [param_id for initial_state, sys_param, param_id, execute_sim in chunk]
+        run_sweep_chunk(chunk, stakeholder_name_mapping, conn, processes, backend)
+
+        # display necessery time
+        print("Simulated ", len(sweep_param_ids), " parameter subsets after ", time.time() - start_time, " s")
+
+    # the results of the whole sweep stay cached
+    with write_transaction(conn):
+        for param_id in sweep_param_ids:
+            touch_simulation(conn, param_id)
+    evict_simulations(conn, keep=sweep_param_ids)
+    conn.close()
 
-    return param_id, execute_sim
\ No newline at end of file
+    return sweep_param_ids
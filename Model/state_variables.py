@@ -1,5 +1,8 @@
-from Model.sys_params import get_sys_param
+from Model.sys_params import get_sys_param, get_sys_param_sweep, read_parameter_set, stakeholder_name_mapping
 from Model.parts.utils import *
+from Model.parts.ecosystem.vesting import calculate_vesting_schedule
+from Model.parts.business.user_adoption import get_user_adoption_curves
+from Model.parts.simulation_calendar import get_calendar
 
 # Get the current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,9 +13,60 @@ parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
 # Append the parent directory to sys.path
 sys.path.append(parent_dir)
 
+def add_precomputed_params(sys_param, stakeholder_name_mapping):
+    """
+    Add the parameter-only schedules, which are computed once per run instead of every timestep, to the system parameters.
+    """
+    sys_param['calendar'] = [get_calendar(sys_param)]
+    sys_param['vesting_schedule'] = [calculate_vesting_schedule(sys_param, list(stakeholder_name_mapping.keys()))]
+    sys_param['user_adoption_curves'] = [get_user_adoption_curves(sys_param)]
+
+    return sys_param
+
 def get_initial_state(input_file, adjusted_params):
     sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim = get_sys_param(input_file, adjusted_params)
 
+    initial_state = compose_initial_state(sys_param, stakeholder_name_mapping)
+    add_precomputed_params(sys_param, stakeholder_name_mapping)
+
+    return initial_state, sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim
+
+def get_initial_states_sweep(input_file, adjusted_params, grid='cartesian'):
+    """
+    Get the initial state for every parameter subset of a parameter sweep. The parameter subsets and their initial
+    states are generated lazily while iterating over the returned sweep.
+    """
+    sweep, stakeholder_name_mapping, stakeholder_names, conn, cur = get_sys_param_sweep(input_file, adjusted_params, grid)
+
+    return iterate_initial_states(sweep, stakeholder_name_mapping), stakeholder_name_mapping, stakeholder_names, conn, cur
+
+def iterate_initial_states(sweep, stakeholder_name_mapping):
+    """
+    Compose the initial state of every parameter subset of a sweep one by one.
+    """
+    for sys_param, param_id, execute_sim in sweep:
+        add_precomputed_params(sys_param, stakeholder_name_mapping)
+        yield compose_initial_state(sys_param, stakeholder_name_mapping), sys_param, param_id, execute_sim
+
+def get_stored_initial_state(param_id):
+    """
+    Get the initial state of a parameter set stored in the sys_param table, e.g. to simulate it again after its
+    simulation results have been evicted.
+    """
+    parameter_set = read_parameter_set(param_id)
+    if parameter_set is None:
+        return None, None, stakeholder_name_mapping
+
+    sys_param = {key: [value] for key, value in parameter_set.items()}
+    initial_state = compose_initial_state(sys_param, stakeholder_name_mapping)
+    add_precomputed_params(sys_param, stakeholder_name_mapping)
+
+    return initial_state, sys_param, stakeholder_name_mapping
+
+def compose_initial_state(sys_param, stakeholder_name_mapping):
+    """
+    Compose the initial state of the simulation from the system parameters.
+    """
     # initialize the initial stakeholders
     initial_stakeholders = generate_agents(stakeholder_name_mapping)
 
@@ -42,4 +96,4 @@ def get_initial_state(input_file, adjusted_params):
         'utilities': utilities 
     }
 
-    return initial_state, sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim
+    return initial_state
@@ -0,0 +1,526 @@
+"""
+Vectorized NumPy engine for the static agent behavior.
+
+The static agent behavior makes the whole state update pipeline deterministic. Instead of walking the
+radCAD state dictionaries agent by agent, this engine keeps all agents in one stakeholder x field matrix
+and runs the same logic as the policies in Model/parts as array operations. All quantities carry a leading
+parameter set axis, so the same code evaluates one or many parameter sets at once.
+
+The output columns match the ones of post_processing.postprocessing(df, substep=df.substep.max(), category='all').
+"""
+import numpy as np
+import pandas as pd
+
+from Model.parts.utils import *
+from Model.parts.business.user_adoption import calculate_user_adoption_curves
+from Model.parts.ecosystem.vesting import calculate_vesting_matrix
+from Model.parts.simulation_calendar import calculate_calendar
+
+# substeps of the liquidity pool transactions in state_update_blocks
+LP_TRANSACTION_SUBSTEPS = {1: 16, 2: 19, 3: 20, 4: 21}
+
+# numeric agent attributes that are stored in the stakeholder x field matrix
+AGENT_FIELDS = generate_agents({'stakeholder': 'stakeholder'}).fields
+FIELD = {field: i for i, field in enumerate(AGENT_FIELDS)}
+
+
+def get_param_array(param_sets, key, default=0.0):
+    """
+    Get a float parameter for all parameter sets as array.
+    """
+    return np.array([float(param_set[key]) if key in param_set else default for param_set in param_sets])
+
+def get_name_mask(param_sets, key, names, match):
+    """
+    Get a parameter set x stakeholder mask of the agents whose name matches a string parameter like a payout source.
+
+    match: 'param_in_name' for param.lower() in a_name.lower() or 'name_in_param' for a_name.lower() in param.lower()
+    """
+    if match == 'param_in_name':
+        return np.array([[str(param_set[key]).lower() in name.lower() for name in names] for param_set in param_sets])
+    else:
+        return np.array([[name.lower() in str(param_set[key]).lower() for name in names] for param_set in param_sets])
+
+def run_static_engine(param_sets, stakeholder_name_mapping, timesteps, keep_agents=True):
+    """
+    Run the static QTM state update pipeline for a list of parameter sets at once.
+
+    Parameters:
+    param_sets: list of parameter dictionaries with single values, e.g. the parameter subsets of a radCAD sweep
+    stakeholder_name_mapping: mapping of the stakeholder names to their type categories
+    timesteps: amount of simulated months
+    keep_agents: record the agent states of every timestep, which is by far the largest part of the history
+
+    Returns a dictionary with the timestep x parameter set arrays of all state variables at the end of each timestep
+    and of the liquidity pool after each of the four liquidity pool transactions.
+    """
+    for param_set in param_sets:
+        if param_set['agent_behavior'] != 'static':
+            raise ValueError("The static engine only supports params['agent_behavior'] == 'static'.")
+
+    S = len(param_sets)
+    names = list(stakeholder_name_mapping.keys())
+    types = np.array(list(stakeholder_name_mapping.values()))
+    A = len(names)
+
+    # stakeholder type masks
+    is_protocol_bucket = types == 'protocol_bucket'
+    is_investor = (types == 'early_investor') | (types == 'team')
+    is_market_investor = types == 'market_investors'
+    is_airdrop_receiver = types == 'airdrop_receivers'
+    is_incentivisation_receiver = types == 'incentivisation_receivers'
+    n_market_investors = is_market_investor.sum()
+    n_airdrop_receivers = is_airdrop_receiver.sum()
+    n_incentivisation_receivers = is_incentivisation_receiver.sum()
+    staking_vesting_index = names.index('staking_vesting')
+    is_staking_vesting = np.array([name.lower() == 'staking_vesting' for name in names])
+
+    # parameters
+    # parameter arrays are gathered from the parameter sets only once per key
+    param_arrays = {}
+    def p(key):
+        if key not in param_arrays:
+            param_arrays[key] = get_param_array(param_sets, key)
+        return param_arrays[key]
+    total_token_supply = p('initial_total_supply')
+    initial_lp_token_allocation = p('initial_lp_token_allocation')
+    initial_required_usdc = p('initial_required_usdc')
+    initial_token_price = p('initial_token_price')
+    sum_of_raised_capital = np.array([calculate_raised_capital(param_set) for param_set in param_sets])
+    selling_perc = p('avg_token_selling_allocation')
+    utility_perc = p('avg_token_utility_allocation')
+    holding_perc = p('avg_token_holding_allocation')
+    remove_perc = p('avg_token_utility_removal')
+
+    if np.any(initial_required_usdc > sum_of_raised_capital):
+        s = np.argmax(initial_required_usdc > sum_of_raised_capital)
+        raise ValueError(f'The required funds to seed the DEX liquidity are {initial_required_usdc[s]}, '
+                         f'which is higher than the sum of raised capital {sum_of_raised_capital[s]}!')
+
+    # payout source and destination masks
+    incentivisation_source_mask = get_name_mask(param_sets, 'incentivisation_payout_source', names, 'param_in_name') & is_protocol_bucket
+    if not np.all(incentivisation_source_mask.any(axis=1)):
+        raise ValueError("No protocol bucket found for the incentivisation payout source. Please check the parameter incentivisation_payout_source.")
+    incentivisation_source_index = A - 1 - np.argmax(incentivisation_source_mask[:, ::-1], axis=1)
+    incentivisation_minting = np.array([param_set['incentivisation_payout_source'] == 'Minting' for param_set in param_sets])
+    burn_bucket_mask = get_name_mask(param_sets, 'burn_project_bucket', names, 'param_in_name') & is_protocol_bucket
+    lock_payout_mask = get_name_mask(param_sets, 'lock_payout_source', names, 'name_in_param')
+    buyback_bucket_mask = get_name_mask(param_sets, 'buyback_bucket', names, 'name_in_param')
+    transfer_destination_mask = get_name_mask(param_sets, 'transfer_destination', names, 'name_in_param')
+    holding_payout_mask = get_name_mask(param_sets, 'holding_payout_source', names, 'name_in_param')
+    liquidity_mining_payout_mask = get_name_mask(param_sets, 'liquidity_mining_payout_source', names, 'name_in_param')
+    buyback_fixed = np.array([param_set['buyback_type'] == 'Fixed' for param_set in param_sets])
+    buyback_percentage = np.array([param_set['buyback_type'] == 'Percentage' for param_set in param_sets])
+
+    # calendar
+    calendar = calculate_calendar(param_sets, timesteps)
+    dates = calendar['date']
+    days_since_launch = calendar['days_since_launch']
+    airdrop_tokens_per_month = np.maximum(sum(total_token_supply[:, None] * p('airdrop_allocation')[:, None]/100 * p('airdrop_amount'+str(i))[:, None]/100 * calendar['airdrop_month'+str(i)]
+                                              for i in [1, 2, 3]), 0)
+    burn_tokens_per_month = np.maximum(np.where(calendar['burn_window'], (total_token_supply * p('burn_per_month')/100)[:, None], 0), 0)
+    buyback_window = calendar['buyback_window']
+    if np.any(buyback_window & ~(buyback_fixed | buyback_percentage)[:, None]):
+        raise ValueError('The buyback type is not defined!')
+
+    # user adoption curves as timestep x parameter set arrays
+    user_adoption_curves = calculate_user_adoption_curves({key: p(key) for key in ['initial_product_users', 'product_users_after_10y', 'product_adoption_velocity',
+                                                                                  'one_time_product_revenue_per_user', 'regular_product_revenue_per_user',
+                                                                                  'initial_token_holders', 'token_holders_after_10y', 'token_adoption_velocity',
+                                                                                  'one_time_token_buy_per_user', 'regular_token_buy_per_user']},
+                                                          days_since_launch.T)
+
+    # vesting schedule
+    vesting = calculate_vesting_matrix(param_sets, names, timesteps)
+
+    # state variables
+    agents = np.zeros((S, A, len(AGENT_FIELDS)))
+    a = {field: agents[..., FIELD[field]] for field in AGENT_FIELDS} # views into the stakeholder x field matrix
+    lp = {key: np.zeros(S) for key in initialize_dex_liquidity()}
+    te = {key: np.zeros(S) for key in generate_initial_token_economy_metrics()}
+    ua = {key: np.zeros(S) for key in initialize_user_adoption()}
+    ba = {key: np.zeros(S) for key in initialize_business_assumptions()}
+    u = {key: np.zeros(S) for key in initialize_utilities()}
+
+    # state history
+    history = {'agents': np.zeros((timesteps, S, A, len(AGENT_FIELDS))) if keep_agents else None}
+    for category, state in [('liquidity_pool', lp), ('token_economy', te), ('user_adoption', ua), ('business_assumptions', ba), ('utilities', u)]:
+        history[category] = {key: np.zeros((timesteps, S)) for key in state}
+    history['lp_transactions'] = {tx: {key: np.zeros((timesteps, S)) for key in lp} for tx in LP_TRANSACTION_SUBSTEPS}
+
+    def update_liquidity_pool_after_transaction(t, tx, lp_tokens, lp_usdc, constant_product, token_price):
+        # see ecosystem/liquidity_pool.py
+        if tx == 1:
+            lp['lp_token_price_max'] = token_price.copy()
+            lp['lp_token_price_min'] = token_price.copy()
+        else:
+            lp['lp_token_price_max'] = np.maximum(np.maximum(lp['lp_token_price_max'], token_price), initial_token_price if t == 1 else 0)
+            lp['lp_token_price_min'] = np.minimum(np.minimum(lp['lp_token_price_min'], token_price), initial_token_price if t == 1 else 1e20)
+        lp['lp_tokens'] = lp_tokens
+        lp['lp_usdc'] = lp_usdc
+        lp['lp_constant_product'] = constant_product
+        lp['lp_token_price'] = token_price
+        lp['lp_valuation'] = lp_usdc + lp_tokens * token_price
+        lp['lp_volatility'] = (lp['lp_token_price_max'] - lp['lp_token_price_min']) / lp['lp_token_price_max'] * 100
+        if tx == 1:
+            lp['lp_tokens_after_adoption'] = lp_tokens
+        elif tx == 3:
+            lp['lp_tokens_after_liquidity_addition'] = lp_tokens
+        elif tx == 4:
+            lp['lp_tokens_after_buyback'] = lp_tokens
+        for key in lp:
+            history['lp_transactions'][tx][key][t-1] = lp[key]
+
+    token_lp_weight = 0.5
+    usdc_lp_weight = 0.5
+    for t in range(1, timesteps+1):
+        # substep 1: liquidity pool seeding
+        if t == 1:
+            lp['lp_tokens'] = initial_lp_token_allocation.copy()
+            lp['lp_usdc'] = initial_required_usdc.copy()
+            lp['lp_constant_product'] = initial_required_usdc * initial_lp_token_allocation
+            lp['lp_token_price'] = initial_required_usdc / initial_lp_token_allocation
+
+        # substep 3: vesting
+        vested = vesting[t-1]
+        vesting_update = np.any(vested != 0, axis=1)[:, None]
+        a['a_tokens'] += vested
+        a['a_tokens_vested'][...] = np.where(vesting_update, vested, a['a_tokens_vested'])
+        a['a_tokens_vested_cum'] += vested
+
+        # substep 4: incentivisation
+        vested_incentivisation_tokens = a['a_tokens'][np.arange(S), incentivisation_source_index]
+        minted_incentivisation_tokens = np.where(incentivisation_minting, total_token_supply * p('mint_incentivisation')/100, 0)
+        incentivise = (vested_incentivisation_tokens > 0)[:, None]
+        a['a_tokens'] -= np.where(incentivise & incentivisation_source_mask, vested_incentivisation_tokens[:, None], 0)
+        incentivisation_receivers = incentivise & is_incentivisation_receiver
+        incentivisation_per_receiver = (vested_incentivisation_tokens / max(n_incentivisation_receivers, 1))[:, None]
+        a['a_tokens'] += np.where(incentivisation_receivers, incentivisation_per_receiver, 0)
+        a['a_tokens_incentivised'][...] = np.where(incentivisation_receivers, incentivisation_per_receiver, a['a_tokens_incentivised'])
+        a['a_tokens_incentivised_cum'] += np.where(incentivisation_receivers, incentivisation_per_receiver, 0)
+        incentivisation_tokens = vested_incentivisation_tokens + minted_incentivisation_tokens
+        te['te_minted_tokens'] = minted_incentivisation_tokens
+        te['te_minted_tokens_cum'] = minted_incentivisation_tokens * lp['lp_token_price']
+        te['te_incentivised_tokens'] = incentivisation_tokens
+        te['te_incentivised_tokens_cum'] = te['te_incentivised_tokens_cum'] + incentivisation_tokens
+
+        # substep 5: airdrops
+        airdrop_tokens = airdrop_tokens_per_month[:, t-1]
+        if np.any(airdrop_tokens > 0) and n_airdrop_receivers == 0:
+            raise ValueError("No airdrop receivers found. Please add at least one airdrop receiver in the stakeholder agents if you plan to airdrop tokens.")
+        airdrop_receivers = (airdrop_tokens > 0)[:, None] & is_airdrop_receiver
+        airdrop_per_receiver = (airdrop_tokens / max(n_airdrop_receivers, 1))[:, None]
+        a['a_tokens'] += np.where(airdrop_receivers, airdrop_per_receiver, 0)
+        a['a_tokens_airdropped'][...] = np.where(airdrop_receivers, airdrop_per_receiver, a['a_tokens_airdropped'])
+        a['a_tokens_airdropped_cum'] += np.where(airdrop_receivers, airdrop_per_receiver, 0)
+        te['te_airdrop_tokens'] = airdrop_tokens
+        te['te_airdrop_tokens_cum'] = te['te_airdrop_tokens_cum'] + airdrop_tokens
+        te['te_airdrop_tokens_usd'] = airdrop_tokens * lp['lp_token_price']
+
+        # substep 6: protocol bucket burn
+        burn_token_amount = burn_tokens_per_month[:, t-1]
+        burn_buckets = (burn_token_amount > 0)[:, None] & burn_bucket_mask
+        a['a_tokens'] -= np.where(burn_buckets, np.minimum(burn_token_amount[:, None], a['a_tokens']), 0)
+        a['a_tokens_burned'][...] = np.where(burn_buckets, burn_token_amount[:, None], a['a_tokens_burned'])
+        a['a_tokens_burned_cum'] += np.where(burn_buckets, burn_token_amount[:, None], 0)
+        te['te_tokens_burned'] = burn_token_amount
+        te['te_tokens_burned_cum'] = te['te_tokens_burned_cum'] + burn_token_amount
+        te['te_tokens_burned_usd'] = burn_token_amount * lp['lp_token_price']
+
+        # substep 7 & 8: static agent behavior and meta bucket allocations
+        sell_tokens = np.where(is_investor, a['a_tokens_vested'] * selling_perc[:, None], 0)
+        utility_tokens = np.where(is_investor, a['a_tokens_vested'] * utility_perc[:, None], 0)
+        holding_tokens = np.where(is_investor, a['a_tokens_vested'] * holding_perc[:, None], 0)
+        token_holdings_tm1 = a['a_tokens'] - a['a_tokens_vested']
+        sell_from_holding = np.where(is_protocol_bucket, 0, token_holdings_tm1 * selling_perc[:, None])
+        utility_from_holding = np.where(is_protocol_bucket, 0, token_holdings_tm1 * utility_perc[:, None])
+        hold_from_holding = np.where(is_protocol_bucket, 0, token_holdings_tm1 * holding_perc[:, None])
+        a['a_selling_tokens'][...] = sell_tokens
+        a['a_utility_tokens'][...] = utility_tokens
+        a['a_holding_tokens'][...] = holding_tokens
+        a['a_selling_from_holding_tokens'][...] = sell_from_holding
+        a['a_utility_from_holding_tokens'][...] = utility_from_holding
+        a['a_holding_from_holding_tokens'][...] = hold_from_holding
+        a['a_tokens'] -= sell_tokens + utility_tokens + sell_from_holding + utility_from_holding
+        for meta_bucket, allocation in [('selling', sell_tokens + sell_from_holding), ('utility', utility_tokens + utility_from_holding), ('holding', holding_tokens + hold_from_holding)]:
+            te['te_'+meta_bucket+'_allocation'] = allocation.sum(axis=1)
+            te['te_'+meta_bucket+'_allocation_cum'] = te['te_'+meta_bucket+'_allocation_cum'] + te['te_'+meta_bucket+'_allocation']
+        agent_utility_tokens = a['a_utility_tokens'] + a['a_utility_from_holding_tokens']
+
+        # substep 9: user adoption
+        ua = {key: curve[t-1] for key, curve in user_adoption_curves.items()}
+        product_revenue = ua['ua_product_revenue']
+        token_buys = ua['ua_token_buys']
+
+        # substep 10: staking base apr
+        lock_share = p('lock_share')/100
+        lock_apr = p('lock_apr')/100
+        staking = (lock_share > 0)[:, None]
+        allocations = np.where(staking, agent_utility_tokens * lock_share[:, None], 0)
+        removal = np.where(staking, a['a_tokens_apr_locked_cum'] * remove_perc[:, None], 0)
+        rewards = np.where(staking, (a['a_tokens_apr_locked_cum'] + allocations - removal) * lock_apr[:, None]/12, 0)
+        u['u_staking_base_apr_rewards'] = rewards.sum(axis=1)
+        u['u_staking_base_apr_allocation'] = allocations.sum(axis=1)
+        u['u_staking_base_apr_allocation_cum'] = u['u_staking_base_apr_allocation_cum'] + allocations.sum(axis=1) - removal.sum(axis=1)
+        u['u_staking_base_apr_remove'] = removal.sum(axis=1)
+        a['a_tokens_apr_locked'][...] = np.where(staking, allocations, a['a_tokens_apr_locked'])
+        a['a_tokens_apr_locked_cum'] += allocations - removal
+        a['a_tokens_apr_locked_remove'][...] = np.where(staking, removal, a['a_tokens_apr_locked_remove'])
+        a['a_tokens_apr_locked_rewards'][...] = np.where(staking, rewards, a['a_tokens_apr_locked_rewards'])
+        a['a_tokens'] += rewards + removal - np.where(staking & lock_payout_mask, rewards.sum(axis=1)[:, None], 0)
+
+        # substep 11: staking revenue share buyback amount
+        u['u_buyback_from_revenue_share_usd'] = np.where(p('lock_buyback_distribute_share') > 0, product_revenue * p('lock_buyback_from_revenue_share')/100, 0)
+
+        # substep 12: staking vesting
+        lock_vesting_share = p('lock_vesting_share')/100
+        staking_vesting_bucket_tokens = a['a_tokens'][:, staking_vesting_index].copy()
+        staking = ((lock_vesting_share > 0) | (staking_vesting_bucket_tokens > 0))[:, None]
+        allocations = np.where(staking, agent_utility_tokens * lock_vesting_share[:, None], 0)
+        removal = np.where(staking, a['a_tokens_staking_vesting_locked_cum'] * remove_perc[:, None], 0)
+        staked_sum = u['u_staking_vesting_allocation_cum'] + allocations.sum(axis=1) - removal.sum(axis=1)
+        rewards = np.where(staking & (staked_sum > 0)[:, None], staking_vesting_bucket_tokens[:, None] * (a['a_tokens_staking_vesting_locked_cum'] + allocations - removal)
+                           / np.where(staked_sum > 0, staked_sum, 1)[:, None], 0)
+        u['u_staking_vesting_rewards'] = staking_vesting_bucket_tokens
+        u['u_staking_vesting_allocation'] = allocations.sum(axis=1)
+        u['u_staking_vesting_allocation_cum'] = staked_sum
+        u['u_staking_vesting_remove'] = removal.sum(axis=1)
+        a['a_tokens_staking_vesting_locked'][...] = np.where(staking, allocations, a['a_tokens_staking_vesting_locked'])
+        a['a_tokens_staking_vesting_locked_cum'] += allocations - removal
+        a['a_tokens_staking_vesting_locked_remove'][...] = np.where(staking, removal, a['a_tokens_staking_vesting_locked_remove'])
+        a['a_tokens_staking_vesting_locked_rewards'][...] = np.where(staking, rewards, a['a_tokens_staking_vesting_locked_rewards'])
+        a['a_tokens'] += rewards + removal - np.where(staking & is_staking_vesting, staking_vesting_bucket_tokens[:, None], 0)
+
+        # substep 13: burning
+        burning_share = p('burning_share')/100
+        burning = (burning_share > 0)[:, None]
+        allocations = np.where(burning, agent_utility_tokens * burning_share[:, None], 0)
+        a['a_tokens_burned'][...] = np.where(burning, allocations, a['a_tokens_burned'])
+        a['a_tokens_burned_cum'] += allocations
+        u['u_burning_allocation'] = allocations.sum(axis=1)
+        u['u_burning_allocation_cum'] = u['u_burning_allocation_cum'] + allocations.sum(axis=1)
+
+        # substep 14: transfer
+        transfer_share = p('transfer_share')/100
+        transfer = (transfer_share > 0)[:, None]
+        allocations = np.where(transfer, agent_utility_tokens * transfer_share[:, None], 0)
+        a['a_tokens_transferred'][...] = np.where(transfer, allocations, a['a_tokens_transferred'])
+        a['a_tokens_transferred_cum'] += allocations
+        a['a_tokens'] += np.where(transfer & transfer_destination_mask, allocations.sum(axis=1)[:, None], 0)
+        u['u_transfer_allocation'] = allocations.sum(axis=1)
+        u['u_transfer_allocation_cum'] = u['u_transfer_allocation_cum'] + allocations.sum(axis=1)
+
+        # substep 15: business assumptions
+        expenditures = p('salaries_per_month') + p('license_costs_per_month') + p('other_monthly_costs')
+        revenue_streams = np.maximum(p('royalty_income_per_month') + p('other_income_per_month') + p('treasury_income_per_month'), 0)
+        buybacks = u['u_buyback_from_revenue_share_usd'] + np.where(buyback_window[:, t-1], np.where(buyback_fixed, p('buyback_fixed_per_month'), ba['ba_cash_balance'] * p('buyback_perc_per_month')/100), 0)
+        if t == 1:
+            cash_flow = (sum_of_raised_capital - initial_lp_token_allocation * initial_token_price + revenue_streams +
+                         product_revenue - (expenditures + p('one_time_payments_1') + p('one_time_payments_2') + buybacks))
+        else:
+            cash_flow = revenue_streams + product_revenue - (expenditures + buybacks)
+        ba = {'ba_cash_balance': ba['ba_cash_balance'] + cash_flow, 'ba_buybacks_usd': buybacks}
+
+        # substep 16: liquidity pool tx1 after adoption buys
+        lp_tokens = lp['lp_tokens'] - lp['lp_tokens'] * (1 - (lp['lp_usdc'] / (lp['lp_usdc'] + token_buys))**(usdc_lp_weight/token_lp_weight))
+        lp_usdc = lp['lp_usdc'] + token_buys
+        bought_tokens = lp['lp_tokens'] - lp_tokens
+        if np.any(bought_tokens > 0) and n_market_investors == 0:
+            raise ValueError("No market investors found. Please add at least one market investor in the stakeholder agents if you plan to buy tokens from the open market dex liquidity with agents.")
+        a['a_tokens'] += np.where((bought_tokens > 0)[:, None] & is_market_investor, (bought_tokens / max(n_market_investors, 1))[:, None], 0)
+        update_liquidity_pool_after_transaction(t, 1, lp_tokens, lp_usdc, lp['lp_constant_product'], lp_usdc / lp_tokens)
+
+        # substep 17: holding
+        holding_share = p('holding_share')/100
+        holding_apr = p('holding_apr')/100
+        holding = ((holding_apr > 0) & (holding_share > 0))[:, None]
+        allocations = np.where(holding, agent_utility_tokens * holding_share[:, None], 0)
+        rewards = np.where(holding & ~is_protocol_bucket, (a['a_tokens'] - a['a_tokens_apr_locked_rewards'] - a['a_tokens_apr_locked_remove']
+                                                           - a['a_tokens_staking_vesting_locked_rewards'] - a['a_tokens_staking_vesting_locked_remove']
+                                                           + allocations) * holding_apr[:, None]/12, 0)
+        a['a_tokens'] += allocations + rewards - np.where(holding & holding_payout_mask, rewards.sum(axis=1)[:, None], 0)
+        u['u_holding_rewards'] = rewards.sum(axis=1)
+        u['u_holding_allocation'] = allocations.sum(axis=1)
+        u['u_holding_allocation_cum'] = u['u_holding_allocation_cum'] + allocations.sum(axis=1)
+
+        # substep 18: liquidity mining
+        liquidity_mining_share = p('liquidity_mining_share')/100
+        liquidity_mining_apr = p('liquidity_mining_apr')/100
+        IL_adjustment_factor = np.where(lp['lp_tokens_after_liquidity_addition'] > 0, (lp['lp_tokens'] + te['te_selling_allocation'])
+                                        / np.where(lp['lp_tokens_after_liquidity_addition'] > 0, lp['lp_tokens_after_liquidity_addition'], 1), 1)
+        mining = (liquidity_mining_share > 0)[:, None]
+        allocations = np.where(mining, agent_utility_tokens * liquidity_mining_share[:, None], 0)
+        removal = np.where(mining, a['a_tokens_liquidity_mining_cum'] * remove_perc[:, None], 0)
+        rewards = np.where(mining, (a['a_tokens_liquidity_mining_cum'] * (1 + (IL_adjustment_factor[:, None] - 1)) + allocations - removal) * liquidity_mining_apr[:, None]/12, 0)
+        a['a_tokens_liquidity_mining'][...] = np.where(mining, allocations, a['a_tokens_liquidity_mining'])
+        a['a_tokens_liquidity_mining_cum'][...] = np.where(mining, a['a_tokens_liquidity_mining_cum'] * (1 + (IL_adjustment_factor[:, None] - 1)) + allocations - removal, a['a_tokens_liquidity_mining_cum'])
+        a['a_tokens_liquidity_mining_remove'][...] = np.where(mining, removal, a['a_tokens_liquidity_mining_remove'])
+        a['a_tokens_liquidity_mining_rewards'][...] = np.where(mining, rewards, a['a_tokens_liquidity_mining_rewards'])
+        a['a_tokens'] += rewards + removal - np.where(mining & liquidity_mining_payout_mask, rewards.sum(axis=1)[:, None], 0)
+        u['u_liquidity_mining_rewards'] = rewards.sum(axis=1)
+        u['u_liquidity_mining_allocation'] = allocations.sum(axis=1)
+        u['u_liquidity_mining_allocation_cum'] = u['u_liquidity_mining_allocation_cum'] * (1 + (IL_adjustment_factor - 1)) + allocations.sum(axis=1) - removal.sum(axis=1)
+        u['u_liquidity_mining_allocation_remove'] = removal.sum(axis=1)
+
+        # substep 19: liquidity pool tx2 after vesting sell
+        tokens_to_sell = (a['a_selling_tokens'] + a['a_selling_from_holding_tokens']).sum(axis=1)
+        lp_usdc = lp['lp_usdc'] - lp['lp_usdc'] * (1 - (lp['lp_tokens'] / (lp['lp_tokens'] + tokens_to_sell))**(token_lp_weight/usdc_lp_weight))
+        lp_tokens = lp['lp_tokens'] + tokens_to_sell
+        update_liquidity_pool_after_transaction(t, 2, lp_tokens, lp_usdc, lp['lp_constant_product'], lp_usdc / lp_tokens)
+
+        # substep 20: liquidity pool tx3 after liquidity addition
+        tokens_for_liquidity = (a['a_tokens_liquidity_mining'] - a['a_tokens_liquidity_mining_remove']).sum(axis=1)
+        lp_usdc = lp['lp_usdc'] + tokens_for_liquidity * lp['lp_token_price']
+        lp_tokens = lp['lp_tokens'] + tokens_for_liquidity
+        update_liquidity_pool_after_transaction(t, 3, lp_tokens, lp_usdc, lp_usdc * lp_tokens, np.maximum(lp_usdc / lp_tokens, 0))
+
+        # substep 21: liquidity pool tx4 after buyback
+        lp_tokens = lp['lp_tokens'] - lp['lp_tokens'] * (1 - (lp['lp_usdc'] / (lp['lp_usdc'] + ba['ba_buybacks_usd']))**(usdc_lp_weight/token_lp_weight))
+        lp_usdc = lp['lp_usdc'] + ba['ba_buybacks_usd']
+        update_liquidity_pool_after_transaction(t, 4, lp_tokens, lp_usdc, lp['lp_constant_product'], lp_usdc / lp_tokens)
+
+        # substep 22: staking revenue share buyback allocation
+        if np.any(ba['ba_buybacks_usd'] < 0):
+            raise ValueError("Business buybacks in USD terms (ba_buybacks_usd) must not be negative!")
+        bought_back_tokens = lp['lp_tokens_after_liquidity_addition'] - lp['lp_tokens']
+        revenue_share_ratio = np.where(ba['ba_buybacks_usd'] > 0, u['u_buyback_from_revenue_share_usd'] / np.where(ba['ba_buybacks_usd'] > 0, ba['ba_buybacks_usd'], 1), 0)
+        agent_utility_rewards_sum = np.where(ba['ba_buybacks_usd'] > 0, bought_back_tokens * revenue_share_ratio, 0)
+        business_buyback = np.where(ba['ba_buybacks_usd'] > 0, bought_back_tokens * (1 - revenue_share_ratio), 0)
+        lock_buyback_distribute_share = p('lock_buyback_distribute_share')/100
+        staking = (lock_buyback_distribute_share > 0)[:, None]
+        allocations = np.where(staking, agent_utility_tokens * lock_buyback_distribute_share[:, None], 0)
+        removal = np.where(staking, a['a_tokens_buyback_locked_cum'] * remove_perc[:, None], 0)
+        staked_sum = u['u_staking_revenue_share_allocation_cum'] + allocations.sum(axis=1) - removal.sum(axis=1)
+        rewarding = (agent_utility_rewards_sum > 0)[:, None]
+        rewards = np.where(rewarding & (staked_sum > 0)[:, None], agent_utility_rewards_sum[:, None] * (a['a_tokens_buyback_locked_cum'] + allocations - removal)
+                           / np.where(staked_sum > 0, staked_sum, 1)[:, None], 0)
+        staking = staking | rewarding
+        a['a_tokens_buyback_locked'][...] = np.where(staking, allocations, a['a_tokens_buyback_locked'])
+        a['a_tokens_buyback_locked_cum'] += allocations - removal
+        a['a_tokens_buyback_locked_remove'][...] = np.where(staking, removal, a['a_tokens_buyback_locked_remove'])
+        a['a_tokens_buyback_locked_rewards'][...] = np.where(staking, rewards, a['a_tokens_buyback_locked_rewards'])
+        a['a_tokens'] += rewards + removal + np.where(buyback_bucket_mask, business_buyback[:, None], 0)
+        u['u_staking_revenue_share_rewards'] = agent_utility_rewards_sum
+        u['u_staking_revenue_share_allocation'] = allocations.sum(axis=1)
+        u['u_staking_revenue_share_allocation_cum'] = staked_sum
+        u['u_staking_revenue_share_remove'] = removal.sum(axis=1)
+
+        # substep 23: token economy metrics
+        held_tokens = np.where(is_protocol_bucket, 0, a['a_tokens']).sum(axis=1)
+        circulating_tokens = (a['a_tokens'].sum(axis=1) + lp['lp_tokens'] + u['u_staking_base_apr_allocation_cum']
+                              + u['u_staking_revenue_share_allocation_cum'] + u['u_staking_vesting_allocation_cum'])
+        te['te_total_supply'] = total_token_supply
+        te['te_circulating_supply'] = circulating_tokens
+        te['te_unvested_supply'] = total_token_supply - a['a_tokens_vested_cum'].sum(axis=1) - te['te_airdrop_tokens_cum'] - initial_lp_token_allocation
+        te['te_MC'] = lp['lp_token_price'] * circulating_tokens
+        te['te_FDV_MC'] = lp['lp_token_price'] * total_token_supply
+        te['te_selling_perc'] = selling_perc
+        te['te_utility_perc'] = utility_perc
+        te['te_holding_perc'] = holding_perc
+        te['te_remove_perc'] = remove_perc
+        te['te_holding_supply'] = held_tokens
+        te['te_incentivised_tokens_usd'] = te['te_incentivised_tokens'] * lp['lp_token_price']
+        te['te_airdrop_tokens_usd'] = te['te_airdrop_tokens'] * lp['lp_token_price']
+
+        # record the state at the end of the timestep
+        if keep_agents:
+            history['agents'][t-1] = agents
+        for category, state in [('liquidity_pool', lp), ('token_economy', te), ('user_adoption', ua), ('business_assumptions', ba), ('utilities', u)]:
+            for key in state:
+                history[category][key][t-1] = state[key]
+
+    history['date'] = dates.T
+    history['agent_actions'] = [{'sell': selling_perc[s], 'hold': holding_perc[s], 'utility': utility_perc[s], 'remove_tokens': remove_perc[s]} for s in range(S)]
+
+    return history
+
+def static_engine_data(history, s, stakeholder_name_mapping, category="all", substep=None):
+    """
+    Convert the engine state history of parameter set s into the output data frame of post_processing.postprocessing.
+
+    substep: None for the end of the timestep or one of the liquidity pool transaction substeps 16, 19, 20, 21
+    """
+    timesteps = history['date'].shape[0]
+    data = {'timestep': np.arange(1, timesteps+1),
+            'date': pd.to_datetime(history['date'][:, s]),
+            'run': np.ones(timesteps, dtype=int)}
+
+    liquidity_pool = history['liquidity_pool']
+    if substep is not None:
+        tx = {v: k for k, v in LP_TRANSACTION_SUBSTEPS.items()}[substep]
+        liquidity_pool = history['lp_transactions'][tx]
+        category = 'liquidity_pool'
+
+    if category == 'token_economy' or category == 'all':
+        for key, values in history['token_economy'].items():
+            data[key] = values[:, s]
+
+    if category == 'liquidity_pool' or category == 'all':
+        for key, values in liquidity_pool.items():
+            data[key] = values[:, s]
+
+    if (category == 'agents' or category == 'all') and history['agents'] is not None:
+        for i, (stakeholder_name, stakeholder_type) in enumerate(stakeholder_name_mapping.items()):
+            data[stakeholder_name+'_agents'] = np.ones(timesteps, dtype=int)
+            agent = generate_agents({stakeholder_name: stakeholder_type}).values()[0].copy()
+            agent['a_actions'] = history['agent_actions'][s]
+            for key in agent:
+                if key in FIELD:
+                    data[stakeholder_name+'_'+key] = history['agents'][:, s, i, FIELD[key]]
+                else:
+                    data[stakeholder_name+'_'+key] = [agent[key]] * timesteps
+
+    for state_category in ['utilities', 'user_adoption', 'business_assumptions']:
+        if category == state_category or category == 'all':
+            for key, values in history[state_category].items():
+                data[key] = values[:, s]
+
+    return pd.DataFrame(data)
+
+def run_static_simulation(sys_param, stakeholder_name_mapping, timesteps):
+    """
+    Run a single parameter set with the vectorized static engine.
+
+    Returns the end of timestep data frame and a dictionary with the liquidity pool data frames after the transaction substeps 16, 19, 20, 21.
+    """
+    param_sets = [{key: value[0] for key, value in sys_param.items()}]
+    history = run_static_engine(param_sets, stakeholder_name_mapping, timesteps)
+
+    data = static_engine_data(history, 0, stakeholder_name_mapping)
+    data_lp_transactions = {substep: static_engine_data(history, 0, stakeholder_name_mapping, substep=substep) for substep in LP_TRANSACTION_SUBSTEPS.values()}
+
+    return data, data_lp_transactions
+
+def concatenate_histories(histories):
+    """
+    Concatenate engine state histories of several parameter set batches along the parameter set axis.
+    """
+    history = {'agents': None if histories[0]['agents'] is None else np.concatenate([h['agents'] for h in histories], axis=1),
+               'date': np.concatenate([h['date'] for h in histories], axis=1),
+               'agent_actions': [actions for h in histories for actions in h['agent_actions']]}
+    for category in ['liquidity_pool', 'token_economy', 'user_adoption', 'business_assumptions', 'utilities']:
+        history[category] = {key: np.concatenate([h[category][key] for h in histories], axis=1) for key in histories[0][category]}
+    history['lp_transactions'] = {tx: {key: np.concatenate([h['lp_transactions'][tx][key] for h in histories], axis=1) for key in histories[0]['lp_transactions'][tx]}
+                                  for tx in LP_TRANSACTION_SUBSTEPS}
+
+    return history
+
+def run_static_simulation_batch(sys_params, stakeholder_name_mapping, timesteps, batch_size=1000, keep_agents=True):
+    """
+    Run many parameter sets with the vectorized static engine, with the parameter set as leading array axis.
+
+    Parameters:
+    sys_params: list of system parameter dictionaries, e.g. the parameter subsets of get_sys_param_sweep
+    stakeholder_name_mapping: mapping of the stakeholder names to their type categories
+    timesteps: amount of simulated months
+    batch_size: amount of parameter sets that are advanced together, limits the peak memory usage
+    keep_agents: record the agent states, set to False when screening large sweeps on the aggregated metrics only
+
+    Returns the state history of all parameter sets. Use static_engine_data(history, s, stakeholder_name_mapping) to get
+    the post processed data frame of the parameter set with index s.
+    """
+    param_sets = [{key: value[0] if isinstance(value, list) else value for key, value in sys_param.items()} for sys_param in sys_params]
+    histories = [run_static_engine(param_sets[i:i+batch_size], stakeholder_name_mapping, timesteps, keep_agents=keep_agents)
+                 for i in range(0, len(param_sets), batch_size)]
+
+    return histories[0] if len(histories) == 1 else concatenate_histories(histories)
@@ -0,0 +1,413 @@
+"""
+Storage of the simulation results in the SQLite database.
+
+All simulations share one long-format results table with one row per parameter set, run, timestep and metric,
+instead of one table per parameter set. The metric names are stored once in a catalogue table and the column order
+of every simulation in an index table, so that the analysis dataset of a simulation can be restored as before.
+
+Tables:
+simulations: param_id, column order of the analysis dataset
+result_metrics: metric_id, metric name
+simulation_results: param_id, metric_id, run, timestep, value
+
+Alternatively the results are stored as one typed Arrow IPC file per parameter set in RESULTS_DIR, which is read
+memory-mapped and column by column, e.g. to plot a few metrics without parsing the whole analysis dataset. Runs which
+are appended later on, e.g. further Monte Carlo runs, are written as one Arrow IPC file per run into the
+<param_id>.runs directory next to it, so that appending a run does not rewrite the stored ones.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+from Model.parts.utils import convert_to_json
+from Model.database import write_transaction
+
+# backend for new simulation results: 'sqlite' for the results table or 'arrow' for Arrow IPC files
+RESULTS_BACKEND = 'sqlite'
+
+# directory of the Arrow IPC result files
+RESULTS_DIR = 'simulationResults'
+
+# prefix of the former per parameter set result tables
+LEGACY_TABLE_PREFIX = 'simulation_data_'
+
+# key columns of the analysis datasets, all other columns are stored as metrics
+KEY_COLUMNS = ['run', 'timestep']
+
+
+def create_results_tables(conn):
+    """
+    Create the results tables and indexes if they do not exist yet and migrate the results of former
+    simulation_data_<param_id> tables into them.
+    """
+    with write_transaction(conn):
+        conn.execute('''CREATE TABLE IF NOT EXISTS simulations (
+                        param_id TEXT PRIMARY KEY,
+                        columns TEXT NOT NULL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS result_metrics (
+                        metric_id INTEGER PRIMARY KEY,
+                        metric TEXT NOT NULL UNIQUE)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS simulation_results (
+                        param_id TEXT NOT NULL,
+                        metric_id INTEGER NOT NULL,
+                        run INTEGER NOT NULL,
+                        timestep INTEGER NOT NULL,
+                        value,
+                        PRIMARY KEY (param_id, metric_id, run, timestep)) WITHOUT ROWID''')
+        # cross-scenario queries of a metric at a timestep, e.g. all scenarios at month 36
+        conn.execute('''CREATE INDEX IF NOT EXISTS simulation_results_metric_timestep
+                        ON simulation_results (metric_id, timestep)''')
+
+    migrate_simulation_tables(conn)
+
+def encode_value(value):
+    """
+    Encode a single result value for the results table. Numbers and strings are stored natively, dates as text and
+    all other objects, e.g. the agent actions, as JSON like in the former result tables.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return int(value)
+    if isinstance(value, (int, float, str, np.integer, np.floating)) or value is None:
+        return value.item() if isinstance(value, np.generic) else value
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(pd.Timestamp(value))
+
+    return convert_to_json(value)
+
+def encode_column(values):
+    """
+    Encode a column of an analysis dataset as list of result values.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.tolist()
+
+    return [encode_value(value) for value in values]
+
+def get_metric_ids(conn, metrics, register=False):
+    """
+    Get the ids of the metric names from the metric catalogue. Unknown metrics are registered if register is set
+    and omitted otherwise.
+    """
+    if register:
+        conn.executemany('INSERT OR IGNORE INTO result_metrics (metric) VALUES (?)', [(metric,) for metric in metrics])
+    metric_ids = dict(conn.execute('SELECT metric, metric_id FROM result_metrics').fetchall())
+
+    return {metric: metric_ids[metric] for metric in metrics if metric in metric_ids}
+
+def get_arrow_path(param_id):
+    """
+    Get the path of the Arrow IPC result file of a parameter set.
+    """
+    return os.path.join(RESULTS_DIR, param_id + '.arrow')
+
+def get_arrow_run_path(param_id, run):
+    """
+    Get the path of the Arrow IPC file of an appended run of a parameter set.
+    """
+    return os.path.join(RESULTS_DIR, param_id + '.runs', f'{int(run)}.arrow')
+
+def get_arrow_paths(param_id):
+    """
+    Get the paths of all Arrow IPC files of a parameter set, i.e. its result file followed by the files of its
+    appended runs in the order of their run indexes.
+    """
+    paths = [get_arrow_path(param_id)] if os.path.exists(get_arrow_path(param_id)) else []
+    runs_dir = os.path.dirname(get_arrow_run_path(param_id, 1))
+    if os.path.isdir(runs_dir):
+        run_files = [file_name for file_name in os.listdir(runs_dir) if file_name.endswith('.arrow')]
+        paths += [os.path.join(runs_dir, file_name) for file_name in sorted(run_files, key=lambda file_name: int(file_name[:-len('.arrow')]))]
+
+    return paths
+
+def simulation_data_exists(conn, param_id):
+    """
+    Check if the simulation data of a parameter set has already been stored in any backend.
+    """
+    if os.path.exists(get_arrow_path(param_id)):
+        return True
+
+    return conn.execute('SELECT count(*) FROM simulations WHERE param_id = ?', (param_id,)).fetchone()[0] > 0
+
+def save_simulation_data(data, param_id, conn, backend=None):
+    """
+    Save the postprocessed simulation data of a parameter set.
+
+    Parameters:
+    data: analysis dataset of the simulation
+    param_id: id of the parameter set
+    conn: SQLite connection
+    backend: 'sqlite' or 'arrow', defaults to RESULTS_BACKEND
+    """
+    backend = RESULTS_BACKEND if backend is None else backend
+    if backend == 'sqlite':
+        save_simulation_data_sqlite(data, param_id, conn)
+    elif backend == 'arrow':
+        save_simulation_data_arrow(data, param_id)
+    else:
+        raise ValueError(f"Unknown results backend {backend}. Please choose 'sqlite' or 'arrow'.")
+
+def append_simulation_data(data, param_id, conn):
+    """
+    Add runs to the stored simulation data of a parameter set, e.g. additional Monte Carlo runs, in the backend it has
+    been stored in. Stored runs with the same run index are replaced.
+    """
+    if os.path.exists(get_arrow_path(param_id)):
+        append_simulation_data_arrow(data, param_id)
+    else:
+        save_simulation_data_sqlite(data, param_id, conn, replace=False)
+
+def load_simulation_runs(conn, param_id):
+    """
+    Get the sorted list of the stored run indexes of a parameter set.
+    """
+    if os.path.exists(get_arrow_path(param_id)):
+        return sorted(set(load_simulation_data_arrow(param_id, columns=['run'])['run'].astype(int)))
+
+    return [run for run, in conn.execute('SELECT DISTINCT run FROM simulation_results WHERE param_id = ? ORDER BY run', (param_id,))]
+
+def load_simulation_data(conn, param_id, columns=None, runs=None):
+    """
+    Load the analysis dataset of a parameter set from the backend it has been stored in.
+
+    Parameters:
+    conn: SQLite connection
+    param_id: id of the parameter set
+    columns: list of columns to load, defaults to all columns of the simulation
+    runs: list of run indexes to load, defaults to all runs of the simulation
+
+    Returns the analysis dataset with the columns in their original order.
+    """
+    if os.path.exists(get_arrow_path(param_id)):
+        return load_simulation_data_arrow(param_id, columns, runs)
+
+    return load_simulation_data_sqlite(conn, param_id, columns, runs)
+
+def delete_simulation_data(conn, param_id):
+    """
+    Delete the simulation data of a parameter set from all backends. The parameter set itself stays in the
+    sys_param table, so that it can be simulated again.
+    """
+    with write_transaction(conn):
+        conn.execute('DELETE FROM simulation_results WHERE param_id = ?', (param_id,))
+        conn.execute('DELETE FROM simulations WHERE param_id = ?', (param_id,))
+    if os.path.exists(get_arrow_path(param_id)):
+        os.remove(get_arrow_path(param_id))
+    shutil.rmtree(os.path.dirname(get_arrow_run_path(param_id, 1)), ignore_errors=True)
+
+def get_arrow_table(data):
+    """
+    Convert an analysis dataset into a typed Arrow table. Numeric columns keep their dtype, objects like the agent
+    actions are stored as JSON text.
+    """
+    if pa is None:
+        raise ImportError("The arrow results backend requires pyarrow. Please install it with pip install pyarrow.")
+
+    columns = {}
+    for column in data.columns:
+        values = data[column]
+        if pd.api.types.is_object_dtype(values):
+            values = pd.Series([value if isinstance(value, (pd.Timestamp, np.datetime64)) else encode_value(value) for value in values],
+                               index=values.index).infer_objects()
+        columns[column] = values
+
+    return pa.Table.from_pandas(pd.DataFrame(columns), preserve_index=False)
+
+def write_arrow_file(table, path):
+    """
+    Write an Arrow table as Arrow IPC file. The table is written to a temporary file first, so that readers never see
+    a partially written file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(path + '.tmp', path)
+
+def save_simulation_data_arrow(data, param_id):
+    """
+    Save the postprocessed simulation data of a parameter set as typed Arrow IPC file. Former appended runs of the
+    parameter set are deleted.
+    """
+    write_arrow_file(get_arrow_table(data), get_arrow_path(param_id))
+    shutil.rmtree(os.path.dirname(get_arrow_run_path(param_id, 1)), ignore_errors=True)
+
+def append_simulation_data_arrow(data, param_id):
+    """
+    Add runs to the Arrow IPC file of a parameter set. Every run is written to its own file, which replaces a former
+    file of the same run, so the cost of appending a run does not grow with the amount of stored runs.
+    """
+    # the appended runs have the same column order as the stored ones
+    stored_columns = pa.ipc.open_file(pa.memory_map(get_arrow_path(param_id), 'r')).schema.names
+    for run, run_data in data.groupby('run', sort=False):
+        write_arrow_file(get_arrow_table(run_data[stored_columns]), get_arrow_run_path(param_id, run))
+
+def load_simulation_data_arrow(param_id, columns=None, runs=None):
+    """
+    Load the analysis dataset of a parameter set from its Arrow IPC files. The files are memory-mapped and only the
+    requested columns are converted. Appended runs replace the runs with the same index of the result file.
+    """
+    if pa is None:
+        raise ImportError("The arrow results backend requires pyarrow. Please install it with pip install pyarrow.")
+
+    paths = get_arrow_paths(param_id)
+    appended_runs = [int(os.path.basename(path)[:-len('.arrow')]) for path in paths[1:]]
+    if runs is not None:
+        # only the files of the requested runs are read
+        paths = paths[:1] + [path for path, run in zip(paths[1:], appended_runs) if run in runs]
+
+    # the memory maps stay open as long as the returned columns reference them
+    tables = []
+    for path in paths:
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        if columns is not None:
+            table = table.select([column for column in table.column_names if column in columns or column in KEY_COLUMNS])
+        tables.append(table)
+    if len(appended_runs) > 0:
+        tables[0] = tables[0].filter(pc.invert(pc.is_in(tables[0]['run'], value_set=pa.array(appended_runs, type=tables[0]['run'].type))))
+    if len(tables) > 1:
+        # e.g. columns which are empty in one run and text in another
+        schema = pa.unify_schemas([table.schema for table in tables])
+        table = pa.concat_tables([table.cast(schema) for table in tables])
+    else:
+        table = tables[0]
+
+    # split blocks keeps the numeric columns as zero-copy views of the memory-mapped files
+    data = table.to_pandas(split_blocks=True)
+    if runs is not None:
+        data = data[data['run'].astype(int).isin(runs)].reset_index(drop=True)
+
+    return data
+
+def save_simulation_data_sqlite(data, param_id, conn, replace=True):
+    """
+    Save the postprocessed simulation data of a parameter set to the results table. Former results of the same
+    parameter set are replaced, or only the ones of the same runs if replace is False.
+    """
+    columns = list(data.columns)
+    metrics = [column for column in columns if column not in KEY_COLUMNS]
+    runs = data['run'].astype(int).tolist() if 'run' in data.columns else [1] * len(data)
+    timesteps = data['timestep'].astype(int).tolist()
+
+    with write_transaction(conn):
+        if replace:
+            conn.execute('DELETE FROM simulation_results WHERE param_id = ?', (param_id,))
+        metric_ids = get_metric_ids(conn, metrics, register=True)
+        for metric in metrics:
+            metric_id = metric_ids[metric]
+            conn.executemany('INSERT OR REPLACE INTO simulation_results (param_id, metric_id, run, timestep, value) VALUES (?, ?, ?, ?, ?)',
+                             zip([param_id] * len(data), [metric_id] * len(data), runs, timesteps, encode_column(data[metric])))
+        conn.execute('INSERT OR REPLACE INTO simulations (param_id, columns) VALUES (?, ?)', (param_id, json.dumps(columns)))
+
+def load_simulation_data_sqlite(conn, param_id, columns=None, runs=None):
+    """
+    Load the analysis dataset of a parameter set from the results table.
+
+    Parameters:
+    conn: SQLite connection
+    param_id: id of the parameter set
+    columns: list of columns to load, defaults to all columns of the simulation
+    runs: list of run indexes to load, defaults to all runs of the simulation
+
+    Returns the analysis dataset with the columns in their original order.
+    """
+    stored_columns = conn.execute('SELECT columns FROM simulations WHERE param_id = ?', (param_id,)).fetchone()
+    if stored_columns is None:
+        raise KeyError(f"No simulation data found for parameter set {param_id}.")
+    stored_columns = json.loads(stored_columns[0])
+    if columns is not None:
+        stored_columns = [column for column in stored_columns if column in columns or column in KEY_COLUMNS]
+
+    metric_ids = get_metric_ids(conn, [column for column in stored_columns if column not in KEY_COLUMNS])
+    metric_names = {metric_id: metric for metric, metric_id in metric_ids.items()}
+    run_filter = '' if runs is None else f" AND run IN ({','.join(str(int(run)) for run in runs)})"
+    if len(metric_ids) > 0:
+        results = pd.read_sql(f'''SELECT metric_id, run, timestep, value FROM simulation_results
+                                  WHERE param_id = ? AND metric_id IN ({','.join(str(metric_id) for metric_id in metric_ids.values())}){run_filter}''',
+                              conn, params=(param_id,))
+    else:
+        results = pd.read_sql(f'SELECT DISTINCT run, timestep FROM simulation_results WHERE param_id = ?{run_filter}', conn, params=(param_id,))
+        results['metric_id'] = None
+        results['value'] = None
+
+    results['metric'] = results['metric_id'].map(metric_names)
+    data = results.set_index(KEY_COLUMNS + ['metric'])['value'].unstack('metric')
+    data = data.sort_index().reset_index()
+    data.columns.name = None
+
+    return data.reindex(columns=stored_columns).infer_objects()
+
+def load_metrics_across_simulations(conn, metrics, timestep=None, param_ids=None):
+    """
+    Load metrics of several or all stored simulations with one indexed query, e.g. to compare scenarios at a month.
+    Only covers the simulations stored with the sqlite backend.
+
+    Parameters:
+    conn: SQLite connection
+    metrics: list of metric names
+    timestep: only load this timestep, defaults to all timesteps
+    param_ids: only load these parameter sets, defaults to all stored simulations
+
+    Returns a long-format data frame with the columns param_id, run, timestep, metric and value.
+    """
+    metric_ids = get_metric_ids(conn, metrics)
+    metric_names = {metric_id: metric for metric, metric_id in metric_ids.items()}
+    query = f'''SELECT param_id, run, timestep, metric_id, value FROM simulation_results
+                WHERE metric_id IN ({','.join(str(metric_id) for metric_id in metric_ids.values()) or 'NULL'})'''
+    params = []
+    if timestep is not None:
+        query += ' AND timestep = ?'
+        params.append(int(timestep))
+    if param_ids is not None:
+        query += f" AND param_id IN ({','.join('?' * len(param_ids)) or 'NULL'})"
+        params.extend(param_ids)
+
+    results = pd.read_sql(query, conn, params=params)
+    results.insert(3, 'metric', results.pop('metric_id').map(metric_names))
+
+    return results
+
+def decode_legacy_value(value):
+    """
+    Decode a value of a former result table, where all values were stored as JSON text, into a result value.
+    JSON numbers and strings are decoded, JSON objects are kept as text.
+    """
+    if isinstance(value, str):
+        try:
+            decoded_value = json.loads(value)
+        except ValueError:
+            return value
+        if isinstance(decoded_value, (int, float, str)) or decoded_value is None:
+            return encode_value(decoded_value)
+
+    return value
+
+def migrate_simulation_tables(conn, drop=True):
+    """
+    Migrate the results of former simulation_data_<param_id> tables into the results table.
+
+    Parameters:
+    conn: SQLite connection
+    drop: drop the former tables after their migration
+    """
+    legacy_tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+                     if name.startswith(LEGACY_TABLE_PREFIX)]
+    for table in legacy_tables:
+        param_id = table[len(LEGACY_TABLE_PREFIX):]
+        print("Migrating simulation data of parameter set ", param_id, "..")
+        data = pd.read_sql(f'SELECT * FROM "{table}"', conn)
+        data = data.apply(lambda column: column.map(decode_legacy_value))
+        # migrate and drop each table atomically
+        with write_transaction(conn):
+            save_simulation_data_sqlite(data, param_id, conn)
+            if drop:
+                conn.execute(f'DROP TABLE "{table}"')
@@ -0,0 +1,91 @@
+"""
+Streaming of the end of month metrics of a running simulation, e.g. to chart the simulated months while the rest of
+the simulation is still in progress.
+
+The simulation passes the postprocessed metrics of every completed timestep to a sink, which stores the STREAM_METRICS
+in the simulation_stream table right away. The streamed rows are replaced by the complete analysis dataset in the
+results store when the simulation has finished.
+
+Tables:
+simulation_stream: param_id, run, timestep, streamed metrics of the timestep as JSON
+"""
+import json
+import sqlite3
+import pandas as pd
+
+from Model.database import write_transaction
+from Model.storage import encode_value
+
+# end of month metrics of the Business and Token Economy charts, which are streamed while a simulation is running
+STREAM_METRICS = ['lp_token_price', 'lp_volatility', 'lp_tokens', 'te_MC', 'te_FDV_MC',
+                  'te_holding_supply', 'te_unvested_supply', 'te_circulating_supply',
+                  'reserve_a_tokens', 'community_a_tokens', 'foundation_a_tokens', 'incentivisation_a_tokens', 'staking_vesting_a_tokens',
+                  'ba_cash_balance', 'ua_product_users', 'ua_token_holders', 'ua_product_revenue', 'ua_token_buys',
+                  'u_staking_base_apr_allocation', 'u_staking_revenue_share_allocation', 'u_staking_vesting_allocation',
+                  'u_liquidity_mining_allocation', 'u_burning_allocation', 'u_transfer_allocation',
+                  'te_incentivised_tokens', 'te_airdrop_tokens', 'te_holding_allocation',
+                  'u_staking_base_apr_allocation_cum', 'u_staking_revenue_share_allocation_cum', 'u_staking_vesting_allocation_cum',
+                  'u_liquidity_mining_allocation_cum', 'u_burning_allocation_cum', 'u_transfer_allocation_cum',
+                  'te_incentivised_tokens_cum', 'te_airdrop_tokens_cum', 'te_holding_allocation_cum']
+
+
+def create_stream_table(conn):
+    """
+    Create the simulation_stream table if it does not exist yet.
+    """
+    with write_transaction(conn):
+        conn.execute('''CREATE TABLE IF NOT EXISTS simulation_stream (
+                        param_id TEXT NOT NULL,
+                        run INTEGER NOT NULL,
+                        timestep INTEGER NOT NULL,
+                        metrics TEXT NOT NULL,
+                        PRIMARY KEY (param_id, run, timestep)) WITHOUT ROWID''')
+
+def clear_stream(conn, param_id):
+    """
+    Delete the streamed timesteps of a parameter set, e.g. when its complete results have been saved.
+    """
+    with write_transaction(conn):
+        conn.execute('DELETE FROM simulation_stream WHERE param_id = ?', (param_id,))
+
+def create_stream_sink(conn, param_id, metrics=STREAM_METRICS):
+    """
+    Create the sink of the simulation of a parameter set. Former streamed timesteps of the parameter set are deleted.
+
+    Parameters:
+    conn: SQLite connection of the simulating process
+    param_id: id of the simulated parameter set
+    metrics: list of the streamed metrics
+
+    Returns a function of the postprocessed metrics of a completed timestep, which stores them in the stream.
+    """
+    create_stream_table(conn)
+    clear_stream(conn, param_id)
+
+    def sink(row):
+        with write_transaction(conn):
+            conn.execute('INSERT OR REPLACE INTO simulation_stream (param_id, run, timestep, metrics) VALUES (?, ?, ?, ?)',
+                         (param_id, int(row['run']), int(row['timestep']), json.dumps({metric: encode_value(row[metric]) for metric in metrics if metric in row})))
+
+    return sink
+
+def load_stream_data(conn, param_id, columns=None):
+    """
+    Load the streamed timesteps of a parameter set as analysis dataset.
+
+    Parameters:
+    conn: SQLite connection
+    param_id: id of the parameter set
+    columns: list of columns to load, defaults to all streamed metrics. Metrics which are not streamed are empty.
+
+    Returns the analysis dataset of the timesteps simulated so far, sorted by run and timestep.
+    """
+    try:
+        rows = conn.execute('SELECT run, timestep, metrics FROM simulation_stream WHERE param_id = ? ORDER BY run, timestep', (param_id,)).fetchall()
+    except sqlite3.OperationalError:
+        # nothing has been streamed yet
+        rows = []
+    columns = STREAM_METRICS if columns is None else [column for column in columns if column not in ['run', 'timestep']]
+    data = pd.DataFrame([{'run': run, 'timestep': timestep, **json.loads(metrics)} for run, timestep, metrics in rows])
+
+    return data.reindex(columns=['run', 'timestep'] + columns)
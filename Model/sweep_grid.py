@@ -0,0 +1,67 @@
+"""
+Lazy expansion of parameter sweeps into single parameter sets.
+
+The sweep lists of the inputs file are enumerated one parameter combination at a time instead of materialising all
+combinations up front. The derived parameters, e.g. the token allocations, effective token prices and initial
+liquidity pool values, are calculated per combination by the caller, and big sweeps are simulated in chunks of
+SWEEP_CHUNK_SIZE parameter sets.
+
+Grids:
+cartesian: every combination of the values of all sweep lists
+zip: radCAD parameter sweep, i.e. the i-th value of every sweep list, where shorter lists repeat their last value
+"""
+import itertools
+import math
+
+# amount of parameter sets which are simulated together
+SWEEP_CHUNK_SIZE = 64
+
+# available grids of the parameter sweeps
+SWEEP_GRIDS = ['cartesian', 'zip']
+
+
+def count_parameter_grid(sys_param_sweep, grid='cartesian'):
+    """
+    Count the parameter combinations of the sweep lists without enumerating them. Empty lists are unset parameters,
+    which do not reduce the amount of combinations.
+    """
+    lengths = [len(values) for values in sys_param_sweep.values() if len(values) > 0]
+    if grid == 'cartesian':
+        return math.prod(lengths)
+    elif grid == 'zip':
+        return max(lengths, default=1)
+    else:
+        raise ValueError(f"Unknown sweep grid {grid}. Please choose one of {SWEEP_GRIDS}.")
+
+def iterate_parameter_grid(sys_param_sweep, grid='cartesian'):
+    """
+    Enumerate the parameter combinations of the sweep lists lazily.
+
+    Parameters:
+    sys_param_sweep: dictionary of the parameter sweep lists, e.g. of load_sys_param
+    grid: 'cartesian' or 'zip'
+
+    Yields a dictionary with a single value per parameter for every parameter combination. Parameters with empty
+    lists are left out.
+    """
+    if grid == 'cartesian':
+        swept_keys = [key for key, values in sys_param_sweep.items() if len(values) > 1]
+        param_set = {key: values[0] for key, values in sys_param_sweep.items() if len(values) > 0}
+        for combination in itertools.product(*[sys_param_sweep[key] for key in swept_keys]):
+            yield {**param_set, **dict(zip(swept_keys, combination))}
+    elif grid == 'zip':
+        for sweep_index in range(count_parameter_grid(sys_param_sweep, grid)):
+            yield {key: values[sweep_index] if sweep_index < len(values) else values[-1] for key, values in sys_param_sweep.items() if len(values) > 0}
+    else:
+        raise ValueError(f"Unknown sweep grid {grid}. Please choose one of {SWEEP_GRIDS}.")
+
+def iterate_chunks(iterable, chunk_size=SWEEP_CHUNK_SIZE):
+    """
+    Split a lazy sequence into lists of up to chunk_size items, e.g. the parameter sets of a sweep.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if len(chunk) == 0:
+            return
+        yield chunk
@@ -1,8 +1,8 @@
 from Model.parts.utils import *
 import pandas as pd
 import sqlite3
-import streamlit as st
-from collections import Counter
+import hashlib
+import json
 import sys
 import os
 
@@ -15,13 +15,59 @@ parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
 # Append the parent directory to sys.path
 sys.path.append(parent_dir)
 from data.not_iterable_variables import parameter_list
+from Model.database import connect_database, write_transaction, insert_rows, read_connection
+from Model.reporting import report_warning
+from Model.sweep_grid import count_parameter_grid, iterate_parameter_grid
 
-def get_sys_param(input_file, adjusted_params):
+# stakeholder names of the different agents
+stakeholder_names = [
+    'angle',
+    'seed',
+    'presale_1',
+    'presale_2',
+    'public_sale',
+    'team',
+    'ov',
+    'advisor',
+    'strategic_partners',
+    'reserve',
+    'community',
+    'foundation',
+    'incentivisation',
+    'staking_vesting',
+    'market_investors',
+    'airdrop_receivers',
+    'incentivisation_receivers'
+]
+
+# defining the mapping between the stakeholder names and their type categories
+stakeholder_name_mapping = {
+    'angle': 'early_investor',
+    'seed': 'early_investor',
+    'presale_1': 'early_investor',
+    'presale_2': 'early_investor',
+    'public_sale': 'early_investor',
+    'team': 'team',
+    'ov': 'early_investor',
+    'advisor': 'early_investor',
+    'strategic_partners': 'early_investor',
+    'reserve': 'protocol_bucket',
+    'community': 'protocol_bucket',
+    'foundation': 'protocol_bucket',
+    'incentivisation': 'protocol_bucket',
+    'staking_vesting': 'protocol_bucket',
+    'market_investors': 'market_investors',
+    'airdrop_receivers': 'airdrop_receivers',
+    'incentivisation_receivers': 'incentivisation_receivers',
+}
 
-    QTM_inputs = pd.read_csv(input_file)
 
-    # System parameters
-    sys_param = compose_initial_parameters(QTM_inputs, parameter_list)
+def load_sys_param(input_file, adjusted_params):
+    """
+    Load the raw system parameters incl. their parameter sweep lists from the QTM inputs file and apply the adjusted parameters.
+    """
+    # System parameters, parsed once per inputs file content
+    sys_param = read_initial_parameters(input_file, parameter_list)
 
     # adjusting parameters w.r.t. adjusted_params dictionary
     if len(adjusted_params) > 0:
@@ -29,6 +75,12 @@ def get_sys_param(input_file, adjusted_params):
             print("Changed parameter: " + key + " to " + str(value))
             sys_param[key] = [value]
 
+    return sys_param
+
+def calculate_derived_parameters(sys_param):
+    """
+    Calculate all derived system parameters, such as token allocations, initial liquidity pool values and effective token prices.
+    """
     # calculating the token allocations for different agents
     agent_token_allocation = {
         'angle_token_allocation': [x/100 * (y/100 / (1-x/100)) for x in sys_param['equity_external_shareholders_perc'] for y in sys_param['team_allocation']],
@@ -61,48 +113,6 @@ def get_sys_param(input_file, adjusted_params):
     }
     sys_param.update(liquidity_pool_initial_values)
 
-    # calculating the initial values for the different agents
-    stakeholder_names = [
-        'angle',
-        'seed',
-        'presale_1',
-        'presale_2',
-        'public_sale',
-        'team',
-        'ov',
-        'advisor',
-        'strategic_partners',
-        'reserve',
-        'community',
-        'foundation',
-        'incentivisation',
-        'staking_vesting',
-        'market_investors',
-        'airdrop_receivers',
-        'incentivisation_receivers'
-    ]
-
-    # defining the mapping between the stakeholder names and their type categories
-    stakeholder_name_mapping = {
-        'angle': 'early_investor',
-        'seed': 'early_investor',
-        'presale_1': 'early_investor',
-        'presale_2': 'early_investor',
-        'public_sale': 'early_investor',
-        'team': 'team',
-        'ov': 'early_investor',
-        'advisor': 'early_investor',
-        'strategic_partners': 'early_investor',
-        'reserve': 'protocol_bucket',
-        'community': 'protocol_bucket',
-        'foundation': 'protocol_bucket',
-        'incentivisation': 'protocol_bucket',
-        'staking_vesting': 'protocol_bucket',
-        'market_investors': 'market_investors',
-        'airdrop_receivers': 'airdrop_receivers',
-        'incentivisation_receivers': 'incentivisation_receivers',
-    }
-
     # setting initial values for user adoption
     user_adoption_initial_values = {
         'initial_product_users' : [x for x in sys_param['initial_product_users']],
@@ -185,54 +195,212 @@ def get_sys_param(input_file, adjusted_params):
 
     sys_param.update(agent_effective_price)
 
+    return sys_param
+
+# parameters which are precomputed from the others for a simulation run and therefore not part of a parameter set
+PRECOMPUTED_PARAMS = ['calendar', 'vesting_schedule', 'user_adoption_curves']
+
+# bookkeeping columns of the sys_param table which are not part of a parameter set
+SYS_PARAM_ID_COLUMNS = ['id', 'param_hash']
+
+def canonicalize_param_value(value):
+    """
+    Bring a parameter value into a canonical form, so that equal parameter values of the inputs file and of the
+    sys_param table result in the same parameter hash, e.g. 1, 1.0, '1.0' and np.float64(1.0).
+    """
+    if isinstance(value, (list, tuple, np.ndarray)):
+        values = [canonicalize_param_value(single_value) for single_value in value]
+        return values[0] if len(values) == 1 else values
+    if isinstance(value, (bool, np.bool_)):
+        value = int(value)
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return None if np.isnan(value) else repr(float(value))
+
+    return None if value is None else str(value)
+
+def get_param_hash(sys_param):
+    """
+    Get the content hash of a parameter set. Keys are sorted, values canonicalized and missing values are equal to
+    unset parameters. The parameter id and precomputed parameters are not part of the hash.
+    """
+    canonical_param = {key: canonicalize_param_value(value) for key, value in sys_param.items()
+                       if key not in SYS_PARAM_ID_COLUMNS + PRECOMPUTED_PARAMS}
+    canonical_param = {key: value for key, value in canonical_param.items() if value is not None}
+
+    return hashlib.sha256(json.dumps(canonical_param, sort_keys=True).encode()).hexdigest()
+
+def table_exists(cur, table):
+    """
+    Check if a table exists in the SQLite database.
+    """
+    return cur.execute(''' SELECT count(name) FROM sqlite_master WHERE type='table' AND name=? ''', (table,)).fetchall()[0][0] > 0
+
+def create_sys_param_index(conn, cur):
+    """
+    Create the sys_param_index table, which maps the content hashes of the parameter sets to their ids, and fill it
+    with the parameter sets of an existing sys_param table.
+    """
+    if table_exists(cur, 'sys_param_index'):
+        return
+
+    with write_transaction(conn):
+        # another writer may have created the index in the meantime
+        if table_exists(cur, 'sys_param_index'):
+            return
+        cur.execute(''' CREATE TABLE sys_param_index (param_hash TEXT PRIMARY KEY, id TEXT NOT NULL) ''')
+        if table_exists(cur, 'sys_param'):
+            print("Indexing existing parameter sets..")
+            df = pd.read_sql(f'SELECT * FROM sys_param', conn)
+            # the first parameter set of equal ones keeps its id like in the former linear search
+            cur.executemany(''' INSERT OR IGNORE INTO sys_param_index (param_hash, id) VALUES (?, ?) ''',
+                            [(get_param_hash(param_set), param_set['id']) for param_set in df.to_dict('records')])
+
+def append_sys_param(sys_param, param_hash, conn, cur):
+    """
+    Append a parameter set to the sys_param table and register its hash in the sys_param_index table. Has to be
+    called within a write transaction.
+    """
+    sys_param_df = pd.DataFrame({key: value for key, value in sys_param.items() if key not in PRECOMPUTED_PARAMS})
+    if table_exists(cur, 'sys_param'):
+        # add the columns of parameters which are not part of the table yet, e.g. of newer inputs files
+        table_columns = [column_info[1] for column_info in cur.execute(''' PRAGMA table_info(sys_param) ''').fetchall()]
+        for column in sys_param_df.columns:
+            if column not in table_columns:
+                cur.execute(f''' ALTER TABLE sys_param ADD COLUMN "{column}" ''')
+    else:
+        print("Create new table!")
+    insert_rows(conn, 'sys_param', sys_param_df)
+    cur.execute(''' INSERT INTO sys_param_index (param_hash, id) VALUES (?, ?) ''', (param_hash, sys_param['id'][0]))
+
+    # indexes of the parameter set lookups of the UI
+    cur.execute(''' CREATE INDEX IF NOT EXISTS sys_param_id ON sys_param (id) ''')
+    if 'project_name' in sys_param_df.columns:
+        cur.execute(''' CREATE INDEX IF NOT EXISTS sys_param_project_name ON sys_param (project_name) ''')
+
+def save_sys_param(sys_param, conn, cur):
+    """
+    Save the parameter set to the sys_param table if this parameter combination does not exist yet and return its id.
+    Existing parameter sets are looked up by their content hash.
+    """
     execute_sim = True
-    # save parameter to sqlite db
-    conn = sqlite3.connect('simulationData.db')
-    # Save the sys_param DataFrame to a new SQLite table if these parameter combination does not exist yet
-    # check if sys_param table exists
-    cur = conn.cursor()
-    listOfTables = cur.execute(''' SELECT count(name) FROM sqlite_master WHERE type='table' AND name='sys_param' ''')
-    if listOfTables.fetchall()[0][0] == 0:
+    create_sys_param_index(conn, cur)
+
+    param_hash = get_param_hash(sys_param)
+    # look up and insert within one transaction, so that concurrent sessions cannot register the same parameter set twice
+    with write_transaction(conn):
+        existing_param_id = cur.execute(''' SELECT id FROM sys_param_index WHERE param_hash=? ''', (param_hash,)).fetchone()
+        if existing_param_id is not None:
+            print("Already existing parameter set detected! Getting its id..")
+            return existing_param_id[0], execute_sim
+
+        print("New parameter set detected!")
         # create unique identifier for this parameter set
         param_id = str(uuid.uuid4()).replace("-", "")
         sys_param['id'] = [param_id]
         if 'project_name' in sys_param.keys():
             if sys_param['project_name'][0] in ["", " ", "  ", "   ", "    ", "     "]:
-                st.warning(f"Please provide a project name before running the simulation!", icon="⚠️")
+                report_warning(f"Please provide a project name before running the simulation!", icon="⚠️")
                 execute_sim = False
-        if execute_sim:
-            sys_param_df = pd.DataFrame(sys_param)
-            sys_param_df.to_sql('sys_param', conn, if_exists='replace', index=False)
-            print("Create new table!")
-    else:
-        print("Get parameter data from table..")
-        df = pd.read_sql(f'SELECT * FROM sys_param', conn)
-        df_old = df.loc[:, df.columns != 'id']
-        df_new = pd.DataFrame(sys_param)
-
-        # comparing dataframes
-        if not df_new[df_new.columns].values[0].tolist() in df_old[df_old.columns].values[:].tolist():
-            print("New parameter set detected!")
-            param_id = str(uuid.uuid4()).replace("-", "")
-            sys_param['id'] = [param_id]
-            if 'project_name' in sys_param.keys() and 'project_name' in df.columns:
-                if sys_param['project_name'][0] in df['project_name'].to_list():
-                    st.warning(f"Project name {sys_param['project_name'][0]} already exists in database. Please choose a different project name and run the simulation again.", icon="⚠️")
-                    execute_sim = False
-                if sys_param['project_name'][0] in ["", " ", "  ", "   ", "    ", "     "]:
-                    st.warning(f"Please provide a project name before running the simulation!", icon="⚠️")
+            elif table_exists(cur, 'sys_param') and 'project_name' in [column_info[1] for column_info in cur.execute(''' PRAGMA table_info(sys_param) ''').fetchall()]:
+                if cur.execute(''' SELECT count(*) FROM sys_param WHERE project_name=? ''', (sys_param['project_name'][0],)).fetchone()[0] > 0:
+                    report_warning(f"Project name {sys_param['project_name'][0]} already exists in database. Please choose a different project name and run the simulation again.", icon="⚠️")
                     execute_sim = False
-            if execute_sim:
-                sys_param_df = pd.concat([df, pd.DataFrame(sys_param)])
-                sys_param_df.to_sql('sys_param', conn, if_exists='replace', index=False)
-        else:
-            print("Already existing parameter set detected! Getting its id..")
-            # get id of already existing parameter set that equals to the current one
-            same_row_idx = [i for i, x in enumerate(list(df_old[df_old.columns].values[:])) if Counter(x) == Counter(list(df_new[df_new.columns].values[0]))][0]
-            param_id = df.iloc[same_row_idx]['id']
+        if execute_sim:
+            append_sys_param(sys_param, param_hash, conn, cur)
+
+    return param_id, execute_sim
+
+def read_parameter_set(param_id, columns=None):
+    """
+    Read a stored parameter set by its id from the sys_param table.
+
+    Parameters:
+    param_id: id of the parameter set
+    columns: list of parameters to read, defaults to all parameters
+
+    Returns a dictionary of the parameter values or None if the parameter set does not exist.
+    """
+    try:
+        with read_connection() as conn:
+            table_columns = [column_info[1] for column_info in conn.execute(''' PRAGMA table_info(sys_param) ''').fetchall()]
+            selected_columns = table_columns if columns is None else [column for column in columns if column in table_columns]
+            if len(table_columns) == 0 or len(selected_columns) == 0:
+                return None
+            row = conn.execute(f''' SELECT {', '.join(f'"{column}"' for column in selected_columns)} FROM sys_param WHERE id=? LIMIT 1 ''', (param_id,)).fetchone()
+    except FileNotFoundError:
+        # no parameter set has been stored yet
+        return None
+
+    return None if row is None else dict(zip(selected_columns, row))
+
+def parameter_set_exists(param_id):
+    """
+    Check if a parameter set with this id is stored in the sys_param table.
+    """
+    try:
+        with read_connection() as conn:
+            return conn.execute(''' SELECT count(*) FROM sys_param WHERE id=? ''', (param_id,)).fetchone()[0] > 0
+    except (FileNotFoundError, sqlite3.OperationalError):
+        # no parameter set has been stored yet
+        return False
+
+def read_project_names():
+    """
+    Read the ids and project names of all stored parameter sets sorted by project name.
+    """
+    with read_connection() as conn:
+        return pd.read_sql(''' SELECT id, project_name FROM sys_param ORDER BY project_name ''', conn)
+
+def get_sys_param(input_file, adjusted_params):
+    """
+    Get the system parameters of a single parameter set and register them in the sys_param table.
+    """
+    sys_param = calculate_derived_parameters(load_sys_param(input_file, adjusted_params))
+
+    # save parameter to sqlite db
+    conn = connect_database()
+    cur = conn.cursor()
+    param_id, execute_sim = save_sys_param(sys_param, conn, cur)
 
     print("Parameter ID of current simulation: ", param_id)
 
     return sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim
 
-    
\ No newline at end of file
+def get_sys_param_sweep(input_file, adjusted_params, grid='cartesian'):
+    """
+    Expand the parameter sweep lists of the inputs file into single parameter sets, one per parameter combination
+    of the sweep grid, and register each of them in the sys_param table under its own id. The parameter sets are
+    generated lazily while iterating over the returned sweep.
+    """
+    sys_param_sweep = load_sys_param(input_file, adjusted_params)
+
+    conn = connect_database()
+    cur = conn.cursor()
+
+    return iterate_sys_param_sweep(sys_param_sweep, conn, cur, grid), stakeholder_name_mapping, stakeholder_names, conn, cur
+
+def iterate_sys_param_sweep(sys_param_sweep, conn, cur, grid='cartesian'):
+    """
+    Calculate the derived parameters of every parameter combination of the sweep lists one by one and register it
+    in the sys_param table.
+
+    Yields the system parameters, parameter id and execute_sim flag of every parameter set.
+    """
+    subsets = count_parameter_grid(sys_param_sweep, grid)
+    for subset, param_set in enumerate(iterate_parameter_grid(sys_param_sweep, grid)):
+        sys_param = {key: [value] for key, value in param_set.items()}
+
+        # project names have to be unique per parameter set
+        if subsets > 1 and 'project_name' in sys_param and str(sys_param['project_name'][0]).strip() != "":
+            sys_param['project_name'] = [f"{sys_param['project_name'][0]} sweep {subset}"]
+
+        sys_param = calculate_derived_parameters(sys_param)
+        param_id, execute_sim = save_sys_param(sys_param, conn, cur)
+        print("Parameter ID of subset ", subset, ": ", param_id)
+
+        yield sys_param, param_id, execute_sim
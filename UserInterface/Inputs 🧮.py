@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import os, sys
+import os, sys, time
 
 # Get the current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,10 +10,11 @@ parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
 # Append the parent directory to sys.path
 sys.path.append(parent_dir)
 from plots import *
-from Model.simulation import simulation
 from Model.parts.utils import *
 from data.not_iterable_variables import parameter_list
-from UserInterface.helpers import fundraising_style_map, param_help, model_ui_inputs
+from Model.sys_params import read_project_names, parameter_set_exists
+from Model.jobs import submit_simulation, get_job
+from UserInterface.helpers import fundraising_style_map, param_help, model_ui_inputs, start_simulation_workers
 
 input_file_base_path = parent_dir+'/data/'
 
@@ -26,7 +27,7 @@ else:
     param_id_init = ""
 # get all existing project names
 try:
-    db_sorted = get_simulation_data('simulationData.db', 'sys_param').sort_values('project_name', ascending=True)
+    db_sorted = read_project_names()
     project_names = db_sorted['project_name']
     project_names = project_names.to_list()
     project_names.append('')
@@ -44,7 +45,7 @@ else:
     st.session_state['param_id'] = st.sidebar.text_input('Parameter ID', "")
 
 try:
-    if st.session_state['param_id'] not in get_simulation_data('simulationData.db', 'sys_param')['id'].to_list():
+    if not parameter_set_exists(st.session_state['param_id']):
         st.sidebar.markdown(f"Parameter ID: {st.session_state['param_id']} does not exist. Please enter a valid parameter ID or run the simulation with your parameter set to get a parameter ID.")
     else:
         st.sidebar.markdown(f"This is a valid parameter ID ✅")
@@ -92,6 +93,7 @@ else:
 
 
 # Run Simulation
+start_simulation_workers()
 if 'param_id' not in st.session_state:
     st.session_state['param_id'] = ""
 if 'button_clicked' not in st.session_state:
@@ -103,16 +105,27 @@ if 'button_clicked' in st.session_state and st.session_state['button_clicked']:
     new_params.update({'project_name':project_name})
     adjusted_params = new_params
 
-    # Run the simulation.py script
-    st.session_state['param_id'], execute_sim = simulation(input_file_path, adjusted_params=adjusted_params)
-    if execute_sim:
+    # Queue the simulation of the parameter set
+    st.session_state['job_id'], st.session_state['param_id'], execute_sim = submit_simulation(input_file_path, adjusted_params=adjusted_params)
+
+    # Reset the session state variable after submitting the simulation
+    st.session_state['button_clicked'] = False
+
+# Poll the status of the submitted simulation
+if st.session_state.get('job_id') is not None:
+    job = get_job(st.session_state['job_id'])
+    if job is None or job['status'] == 'failed':
+        st.error(f"Simulation with id {st.session_state['param_id']} has failed: {job['error'] if job is not None else 'unknown job'}")
+        st.session_state['job_id'] = None
+    elif job['status'] in ['queued', 'running']:
+        st.progress(job['progress'] / job['total'], text=f"Simulation with id {st.session_state['param_id']} is {job['status']}: {job['progress']} / {job['total']} timesteps")
+        time.sleep(1)
+        st.rerun()
+    else:
         st.write(f"Simulation with id {st.session_state['param_id']} has finished based on these parameters:")
         df = get_simulation_data('simulationData.db', 'sys_param')
         df.insert(0, "id", df.pop("id"))
         df.insert(0, "project_name", df.pop("project_name"))
         st.dataframe(df)
         st.success('Done!')
-
-
-    # Reset the session state variable after running the simulation
-    st.session_state['button_clicked'] = False
+        st.session_state['job_id'] = None
@@ -1,6 +1,8 @@
 import streamlit as st
 from plots import *
 from Model.parts.utils import *
+from Model.jobs import start_job_workers
+from Model.reporting import set_reporter
 
 fundraising_style_map = {
     'Moderate': 2,
@@ -12,6 +14,28 @@ param_help = {
     'fundraising_style': f"The more aggressive the fundraising style, the more advantageous it is to be an early investor: **Moderate** / **Medium** / **Aggressive** : **{fundraising_style_map['Moderate']}x** / **{fundraising_style_map['Medium']}x** / **{fundraising_style_map['Aggressive']}x** public sale to seed round valuation ratio.",
 }
 
+def streamlit_reporter(message, icon=None):
+    """
+    Show the validation warnings of the model in the Streamlit app.
+    """
+    st.warning(message, icon=icon)
+
+set_reporter(streamlit_reporter)
+
+@st.cache_resource
+def get_simulation_workers():
+    """
+    List of the worker processes of the simulation job queue, shared by all sessions of the app server.
+    """
+    return []
+
+def start_simulation_workers():
+    """
+    Start the worker processes of the simulation job queue on every run of a page. Running workers are kept, stopped
+    ones are replaced and their jobs are queued again.
+    """
+    return start_job_workers(worker_processes=get_simulation_workers())
+
 def model_ui_inputs(input_file_path, uploaded_file, parameter_list):
     if 'param_id' in st.session_state:
         parameter_id_choice = st.session_state['param_id']
@@ -21,13 +45,13 @@ def model_ui_inputs(input_file_path, uploaded_file, parameter_list):
     col11, col12, col13 = st.columns(3)
     # Adjusting Parameters
     if parameter_id_choice == "":
-        sys_param = compose_initial_parameters(pd.read_csv(input_file_path), parameter_list)
+        sys_param = read_initial_parameters(input_file_path, parameter_list)
     else:
-        sys_param_df = get_simulation_data('simulationData.db', 'sys_param')
-        if len(sys_param_df[sys_param_df['id'] == parameter_id_choice])<1:
-            sys_param = compose_initial_parameters(pd.read_csv(input_file_path), parameter_list)
+        parameter_set = read_parameter_set(parameter_id_choice)
+        if parameter_set is None:
+            sys_param = read_initial_parameters(input_file_path, parameter_list)
         else:
-            sys_param = {k:[v] for k, v in sys_param_df[sys_param_df['id'] == parameter_id_choice].to_dict('index')[list(sys_param_df[sys_param_df['id'] == parameter_id_choice].to_dict('index').keys())[0]].items()}
+            sys_param = {k:[v] for k, v in parameter_set.items()}
         
     with col11:
         supply_type = st.radio('Supply Type',('Fixed', 'Inflationary'), index=['Fixed', 'Inflationary'].index(sys_param['supply_type'][0]), key='supply_type_radio', help="Determines if a minting functionallity is allowed.")
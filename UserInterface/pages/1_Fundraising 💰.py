@@ -1,15 +1,20 @@
 import streamlit as st
 from plots import *
+from Model.sys_params import parameter_set_exists
+from UserInterface.helpers import start_simulation_workers
 
 st.title('Quantitative Token Model')
 
+# create the database tables and start or replace the job workers
+start_simulation_workers()
+
 # side bar
 if 'param_id' in st.session_state:
     param_id_init = st.session_state['param_id']
 else:
     param_id_init = ""
 st.session_state['param_id'] = st.sidebar.text_input('Parameter ID',param_id_init)
-if st.session_state['param_id'] not in get_simulation_data('simulationData.db', 'sys_param')['id'].to_list():
+if not parameter_set_exists(st.session_state['param_id']):
     st.sidebar.markdown(f"Parameter ID: {st.session_state['param_id']} does not exist. Please enter a valid parameter ID or run the simulation with your parameter set to get a parameter ID.")
 else:
     st.sidebar.markdown(f"This is a valid parameter ID ✅")
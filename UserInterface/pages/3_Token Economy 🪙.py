@@ -1,15 +1,22 @@
 import streamlit as st
+import time
 from plots import *
+from Model.sys_params import parameter_set_exists
+from UserInterface.helpers import start_simulation_workers
+from Model.jobs import get_active_job
 
 st.title('Quantitative Token Model')
 
+# create the database tables and start or replace the job workers
+start_simulation_workers()
+
 # side bar
 if 'param_id' in st.session_state:
     param_id_init = st.session_state['param_id']
 else:
     param_id_init = ""
 st.session_state['param_id'] = st.sidebar.text_input('Parameter ID',param_id_init)
-if st.session_state['param_id'] not in get_simulation_data('simulationData.db', 'sys_param')['id'].to_list():
+if not parameter_set_exists(st.session_state['param_id']):
     st.sidebar.markdown(f"Parameter ID: {st.session_state['param_id']} does not exist. Please enter a valid parameter ID or run the simulation with your parameter set to get a parameter ID.")
 else:
     st.sidebar.markdown(f"This is a valid parameter ID ✅")
@@ -19,4 +26,8 @@ st.sidebar.markdown("## Token Economy 🪙")
 st.markdown("## Token Economy 🪙")
 if 'param_id' in st.session_state:
     if st.session_state['param_id'] != "":
-        plot_token_economy(st.session_state['param_id'])
\ No newline at end of file
+        plot_token_economy(st.session_state['param_id'])
+        # update the charts with the newly simulated months while the simulation is in progress
+        if get_active_job(st.session_state['param_id']) is not None:
+            time.sleep(1)
+            st.rerun()
\ No newline at end of file
@@ -3,9 +3,24 @@ import pandas as pd
 import streamlit as st
 import numpy as np
 import sys, os
-import sqlite3
 import plotly.figure_factory as ff
 import plotly.express as px
+import plotly.graph_objects as go
+
+# Get the current directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+# Go up one folder
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+# Append the parent directory to sys.path
+sys.path.append(parent_dir)
+from Model.sys_params import stakeholder_names, read_parameter_set
+from Model.parts.ecosystem.vesting import calculate_vesting_schedule
+from Model.storage import load_simulation_data
+from Model.database import read_connection
+from Model.simulation import ensure_simulation_data, touch_simulation_data
+from Model.jobs import get_active_job
+from Model.streaming import load_stream_data
+from Model.run_summary import SUMMARY_QUANTILES, get_quantile_column, count_summary_runs, load_run_summary
 
 
 
@@ -37,18 +52,31 @@ def format_column_name(column_name):
 
 
 def get_simulation_data(db, dataset_name):
-    # Connect to the SQLite database
-    conn = sqlite3.connect(db)
-    # Read the data from the SQLite table into a DataFrame
-    df = pd.read_sql(f'SELECT * FROM {dataset_name}', conn)
+    # Borrow a pooled connection to the SQLite database
+    with read_connection(db) as conn:
+        # Read the data from the SQLite table into a DataFrame
+        df = pd.read_sql(f'SELECT * FROM {dataset_name}', conn)
 
-    # Close the connection
-    conn.close()
     return df
 
 def plot_results_plotly(x, y_columns, run, param_id):
 
-    df = get_simulation_data('simulationData.db', 'simulation_data_'+param_id)
+    with read_connection() as conn:
+        summary_runs = count_summary_runs(conn, param_id)
+
+    if get_active_job(param_id) is not None:
+        # the simulation is in progress -> plot the timesteps which have been streamed so far
+        with read_connection() as conn:
+            df = load_stream_data(conn, param_id, columns=[x]+y_columns)
+    elif summary_runs > 1:
+        # Monte Carlo runs -> plot the bands of their stored summary without loading the runs
+        fan_plot_plotly(x, y_columns, summary_runs, param_id)
+        return
+    else:
+        # simulate the parameter set again if its results have been evicted from the result cache
+        ensure_simulation_data(param_id)
+        with read_connection() as conn:
+            df = load_simulation_data(conn, param_id, columns=[x]+y_columns)
 
     # example for Monte Carlo plots
     #monte_carlo_plot_st(df,'timestep','timestep','seed_a_tokens_vested_cum',3)
@@ -69,11 +97,9 @@ def aggregate_runs(df,aggregate_dimension,x,y):
     Example run:
     mean_df,median_df,std_df,min_df = aggregate_runs(df,'timestep')
     '''
-    df = df[[x,y]].copy()
-    mean_df = df.astype(float).groupby(aggregate_dimension).mean().reset_index()
-    median_df = df.astype(float).groupby(aggregate_dimension).median().reset_index()
-    std_df = df.astype(float).groupby(aggregate_dimension).std().reset_index()
-    min_df = df.astype(float).groupby(aggregate_dimension).min().reset_index()
+    # all statistics in a single pass over the groups
+    aggregated_df = df[[x,y]].astype(float).groupby(aggregate_dimension)[y].agg(['mean','median','std','min'])
+    mean_df,median_df,std_df,min_df = [aggregated_df[[statistic]].rename(columns={statistic: y}).reset_index() for statistic in ['mean','median','std','min']]
 
     return mean_df,median_df,std_df,min_df
 
@@ -157,15 +183,37 @@ def line_plot_plotly(df,x,y_series,run):
     fig = px.line(chart_data, x=formatted_columns[0], y=formatted_columns[1:])
 
 
+    st.plotly_chart(fig, use_container_width=True)
+
+def fan_plot_plotly(x, y_series, runs, param_id):
+    '''
+    A function that generates a fan chart of the Monte Carlo runs of a parameter set from their stored summary in streamlit.
+    The band spans the lowest to the highest summary quantile, the line is the median.
+    '''
+    with read_connection() as conn:
+        summary = load_run_summary(conn, param_id, metrics=y_series)
+    lower_column = get_quantile_column(min(SUMMARY_QUANTILES))
+    upper_column = get_quantile_column(max(SUMMARY_QUANTILES))
+
+    fig = go.Figure()
+    for y in y_series:
+        metric_summary = summary[summary['metric'] == y]
+        fig.add_trace(go.Scatter(x=metric_summary['timestep'], y=metric_summary[upper_column], mode='lines', line=dict(width=0),
+                                 showlegend=False, name=f"{format_column_name(y)} {upper_column.upper()}"))
+        fig.add_trace(go.Scatter(x=metric_summary['timestep'], y=metric_summary[lower_column], mode='lines', line=dict(width=0),
+                                 fill='tonexty', name=f"{format_column_name(y)} {lower_column.upper()} - {upper_column.upper()}"))
+        fig.add_trace(go.Scatter(x=metric_summary['timestep'], y=metric_summary[get_quantile_column(0.5)], mode='lines', name=f"{format_column_name(y)} Median"))
+    fig.update_layout(xaxis_title=format_column_name(x), title=f"{runs} Monte Carlo Runs")
+
     st.plotly_chart(fig, use_container_width=True)
 
 def bar_plot_plotly(values_list, param_id):
     # Check if the values in values_list exist in the DataFrame
     
-    sys_param_df = get_simulation_data('simulationData.db', 'sys_param')
-    sys_param = sys_param_df[sys_param_df['id'] == param_id]
+    # read only the plotted parameters of the parameter set
+    sys_param = pd.DataFrame([read_parameter_set(param_id, columns=values_list) or {}], columns=values_list)
 
-    df = sys_param[values_list].sum().to_frame(name='Value').reset_index().rename(columns={'index':'Parameter'})
+    df = sys_param.sum().to_frame(name='Value').reset_index().rename(columns={'index':'Parameter'})
     
     # Format the 'Parameter' column
     df['Parameter'] = df['Parameter'].apply(format_column_name)
@@ -181,10 +229,10 @@ def bar_plot_plotly(values_list, param_id):
 def pie_plot_plotly(values_list, param_id):
     # Check if the values in values_list exist in the DataFrame
     
-    sys_param_df = get_simulation_data('simulationData.db', 'sys_param')
-    sys_param = sys_param_df[sys_param_df['id'] == param_id]
+    # read only the plotted parameters of the parameter set
+    sys_param = pd.DataFrame([read_parameter_set(param_id, columns=values_list) or {}], columns=values_list)
 
-    df = sys_param[values_list].sum().to_frame(name='Value').reset_index().rename(columns={'index':'Parameter'})
+    df = sys_param.sum().to_frame(name='Value').reset_index().rename(columns={'index':'Parameter'})
 
     # Format the 'Parameter' column
     df['Parameter'] = df['Parameter'].apply(format_column_name)
@@ -201,6 +249,27 @@ def pie_plot_plotly(values_list, param_id):
 
 
 
+def plot_vesting_schedule(param_id):
+    """
+    Plot the cumulative token unlock schedule of all stakeholders directly from the parameter set, i.e. without simulation data.
+    """
+    sys_param = read_parameter_set(param_id)
+    if sys_param is None:
+        st.warning(f"Parameter set {param_id} does not exist. Please run a simulation to plot its vesting schedule.")
+        return
+
+    vesting_schedule = calculate_vesting_schedule(sys_param, [name for name in stakeholder_names if name+'_token_allocation' in sys_param]).cumsum()
+    vesting_schedule = vesting_schedule.loc[:, (vesting_schedule != 0).any(axis=0)]
+    vesting_schedule.columns = [format_column_name(col) for col in vesting_schedule.columns]
+
+    fig = px.area(vesting_schedule, x=vesting_schedule.index, y=vesting_schedule.columns, labels={'month': 'Month', 'value': 'Unlocked Tokens', 'variable': 'Stakeholder'})
+
+    st.plotly_chart(fig, use_container_width=True)
+
+
+
+
+
 def plot_all_plotly(param_id):    
     ##FUNDRAISING TAB
     plot_results_plotly('timestep', ['seed_a_tokens_vested_cum','angle_a_tokens_vested_cum',
@@ -253,9 +322,14 @@ def plot_all_plotly(param_id):
     plot_results_plotly('timestep', ['u_staking_base_apr_allocation','u_staking_revenue_share_allocation','u_staking_vesting_allocation','u_liquidity_mining_allocation','u_burning_allocation','u_transfer_allocation','te_incentivised_tokens','te_airdrop_tokens','te_holding_allocation'], 1, param_id)
 
 def plot_fundraising(param_id):    
+    # mark the simulation results as recently used once per page
+    touch_simulation_data(param_id)
+
     ##FUNDRAISING TAB
     plot_results_plotly('timestep', ['seed_a_tokens_vested_cum','angle_a_tokens_vested_cum','team_a_tokens_vested_cum',
                                      'reserve_a_tokens_vested_cum','presale_1_a_tokens_vested_cum'], 1, param_id)
+        ##UNLOCK SCHEDULE OF ALL STAKEHOLDERS
+    plot_vesting_schedule(param_id)
         ##NEED EFFECTIVE TOKEN PRICE
     bar_plot_plotly([
         'angle_token_effective',
@@ -287,6 +361,9 @@ def plot_fundraising(param_id):
     ], param_id)
 
 def plot_business(param_id):    
+    # mark the simulation results as recently used once per page
+    touch_simulation_data(param_id)
+
     ##INPUTS TAB
     plot_results_plotly('timestep', ['ua_product_users','ua_token_holders'], 1, param_id)
     plot_results_plotly('timestep', ['ua_product_revenue'], 1, param_id)
@@ -294,6 +371,9 @@ def plot_business(param_id):
     plot_results_plotly('timestep', ['ba_cash_balance'], 1, param_id)
 
 def plot_token_economy(param_id):
+    # mark the simulation results as recently used once per page
+    touch_simulation_data(param_id)
+
     ##UTILITIES TAB
     pie_plot_plotly(['lock_share','lock_vesting_share','liquidity_mining_share','burning_share',
                      'holding_share','transfer_share','lock_buyback_distribute_share'], param_id)
@@ -0,0 +1,61 @@
+import os
+import sys
+import pytest
+
+# Get the current directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Go up one folder
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+
+# Append the parent directory to sys.path
+sys.path.append(parent_dir)
+
+# QTM radCAD inputs file of the default parameter set
+INPUT_FILE = parent_dir+'/data/Quantitative_Token_Model_V1.89_radCAD_integration - radCAD_inputs.csv'
+
+# the staging test is run as script by python tests/test_stage.py
+collect_ignore = ['test_stage.py']
+
+
+@pytest.fixture
+def input_file():
+    return INPUT_FILE
+
+@pytest.fixture
+def model_inputs(input_file):
+    """
+    Initial state and system parameters of the default parameter set, built without registering it in the database.
+    """
+    from Model.sys_params import load_sys_param, calculate_derived_parameters, stakeholder_name_mapping
+    from Model.state_variables import compose_initial_state, add_precomputed_params
+
+    sys_param = calculate_derived_parameters(load_sys_param(input_file, {}))
+    initial_state = compose_initial_state(sys_param, stakeholder_name_mapping)
+    add_precomputed_params(sys_param, stakeholder_name_mapping)
+
+    return initial_state, sys_param
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Run the test in an empty working directory, which holds its own simulationData.db and simulationResults.
+    """
+    from Model import database
+
+    monkeypatch.chdir(tmp_path)
+    # pooled read connections of former tests point to their own database files
+    monkeypatch.setattr(database, '_read_pools', {})
+
+    return tmp_path
+
+@pytest.fixture
+def conn(workdir):
+    """
+    Connection to the SQLite database of the working directory of the test.
+    """
+    from Model.database import connect_database
+
+    conn = connect_database()
+    yield conn
+    conn.close()
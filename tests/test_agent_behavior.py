@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from Model.parts.agents_behavior.agent_meta_bucket_behavior import generate_agent_meta_bucket_behavior, STOCHASTIC_BEHAVIOR_CONCENTRATION
+
+
+def draw_shares(initial_state, sys_param, timesteps=120, **adjusted_params):
+    """
+    Meta bucket shares of the stochastic agent behavior of all agents and timesteps as array of the shape
+    (timesteps * agents, 3).
+    """
+    params = {key: value[0] for key, value in sys_param.items()}
+    params.update({'agent_behavior': 'stochastic', 'monte_carlo_seed': 42, **adjusted_params})
+    shares = []
+    for timestep in range(1, timesteps + 1):
+        agent_behavior_dict = generate_agent_meta_bucket_behavior(params, 1, [], {**initial_state, 'timestep': timestep})['agent_behavior_dict']
+        shares += [[behavior['sell'], behavior['hold'], behavior['utility']] for behavior in agent_behavior_dict.values()]
+
+    return np.array(shares)
+
+def test_stochastic_shares_scatter_around_the_static_allocations(model_inputs):
+    initial_state, sys_param = model_inputs
+    avg_allocations = np.array([sys_param['avg_token_selling_allocation'][0], sys_param['avg_token_holding_allocation'][0], sys_param['avg_token_utility_allocation'][0]])
+
+    shares = draw_shares(initial_state, sys_param)
+
+    assert len(shares) == 120 * len(initial_state['agents'])
+    np.testing.assert_allclose(shares.sum(axis=1), avg_allocations.sum())
+    np.testing.assert_allclose(shares.mean(axis=0), avg_allocations, atol=0.01)
+    assert (shares.std(axis=0)[avg_allocations > 0] > 0).all()
+
+def test_concentration_is_a_parameter(model_inputs):
+    initial_state, sys_param = model_inputs
+
+    default_shares = draw_shares(initial_state, sys_param, timesteps=12)
+    # parameter sets without a concentration, e.g. stored ones of former inputs files, use the default
+    np.testing.assert_array_equal(draw_shares(initial_state, sys_param, timesteps=12, stochastic_behavior_concentration=np.nan), default_shares)
+    np.testing.assert_array_equal(draw_shares(initial_state, sys_param, timesteps=12, stochastic_behavior_concentration=STOCHASTIC_BEHAVIOR_CONCENTRATION), default_shares)
+
+    # higher concentrations keep the shares closer to the static allocations
+    spread = {concentration: draw_shares(initial_state, sys_param, stochastic_behavior_concentration=concentration).std(axis=0).sum() for concentration in [5, 50, 500]}
+    assert spread[5] > spread[50] > spread[500]
+
+    with pytest.raises(ValueError, match="Please choose a positive concentration"):
+        draw_shares(initial_state, sys_param, timesteps=1, stochastic_behavior_concentration=0)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Model.parts.agent_store import AgentStore, AgentView
+from Model.post_processing import flatten_agents
+
+
+def new_agents():
+    return {'key_seed': {'a_name': 'seed', 'a_type': 'early_investor', 'a_tokens': 10.0, 'a_actions': {'sell': 0.5}, 'a_current_action': 'hold'},
+            'key_team': {'a_name': 'team', 'a_type': 'early_investor', 'a_tokens': 20.0, 'a_actions': {'sell': 0.1}, 'a_current_action': 'sell'},
+            'key_market': {'a_name': 'market_investors', 'a_type': 'market_investors', 'a_tokens': 30.0, 'a_actions': {}, 'a_current_action': 'buy'}}
+
+def test_store_behaves_like_agent_dictionaries():
+    agents = new_agents()
+    store = AgentStore(agents)
+
+    assert store.keys() == list(agents.keys())
+    assert len(store) == 3
+    assert 'key_team' in store and 'key_unknown' not in store
+    assert store.to_dict() == agents
+    assert store['key_team'] == agents['key_team']
+    assert store.get('key_unknown') is None
+    with pytest.raises(KeyError):
+        store['key_unknown'] = agents['key_seed']
+
+def test_view_writes_through_to_the_store():
+    store = AgentStore(new_agents())
+    view = store['key_seed']
+    assert isinstance(view, AgentView)
+
+    view['a_tokens'] += 5
+    view['a_current_action'] = 'sell'
+    assert store.column('a_tokens').tolist() == [15.0, 20.0, 30.0]
+    assert store['key_seed']['a_current_action'] == 'sell'
+    assert view.keys() == ['a_name', 'a_type', 'a_tokens', 'a_actions', 'a_current_action']
+
+    # the column is a writable view of the store
+    store.column('a_tokens')[2] = 0
+    assert store['key_market']['a_tokens'] == 0.0
+
+    store['key_team'] = {'a_tokens': 1.0}
+    assert store['key_team']['a_tokens'] == 1.0
+
+def test_copy_shares_the_agent_rows():
+    store = AgentStore(new_agents())
+    store_copy = store.copy()
+    store_copy['key_team']['a_tokens'] = 99
+
+    assert store['key_team']['a_tokens'] == 99.0
+
+def test_masks():
+    store = AgentStore(new_agents())
+
+    assert store.type_mask('early_investor').tolist() == [True, True, False]
+    assert store.type_mask('early_investor', 'market_investors').tolist() == [True, True, True]
+    assert store.name_mask('INVESTOR').tolist() == [False, False, True]
+    assert store.name_in_mask('Seed & Team').tolist() == [True, True, False]
+
+def test_field_values_and_agent_keys():
+    store = AgentStore(new_agents())
+
+    assert store.agent_keys() == ['a_name', 'a_type', 'a_tokens', 'a_actions', 'a_current_action']
+    assert store.fields == ['a_tokens']
+    assert store.field_values('a_tokens').tolist() == [10.0, 20.0, 30.0]
+    assert store.field_values('a_current_action') == ['hold', 'sell', 'buy']
+
+def test_flatten_agents_matches_agent_dictionaries():
+    rows = [new_agents(), new_agents()]
+    rows[1]['key_team']['a_tokens'] = 25.0
+    rows[1]['key_team']['a_current_action'] = 'hold'
+
+    store_columns = flatten_agents(pd.Series([AgentStore(agents) for agents in rows]))
+    dict_columns = flatten_agents(pd.Series(rows))
+
+    assert list(store_columns.keys()) == list(dict_columns.keys())
+    for column in dict_columns:
+        assert list(store_columns[column]) == list(dict_columns[column])
+    assert list(store_columns['team_a_tokens']) == [20.0, 25.0]
+    assert list(store_columns['team_a_current_action']) == ['sell', 'hold']
+    assert np.array_equal(store_columns['seed_agents'], [1, 1])
@@ -0,0 +1,46 @@
+import pytest
+
+from Model.batch import find_input_files, parse_param_overrides, run_batch, main
+from Model.database import connect_database
+from Model.storage import simulation_data_exists, load_simulation_data
+
+
+def test_parse_param_overrides():
+    adjusted_params = parse_param_overrides(['product_users_after_10y=2600000', 'public_sale_supply_perc=2.75',
+                                             ' project_name =My Project', 'launch_date=01.12.23', 'formula=a=b', 'agent_behavior="static"'])
+
+    assert adjusted_params == {'product_users_after_10y': 2600000, 'public_sale_supply_perc': 2.75, 'project_name': 'My Project',
+                               'launch_date': '01.12.23', 'formula': 'a=b', 'agent_behavior': 'static'}
+    assert parse_param_overrides([]) == {}
+    with pytest.raises(ValueError):
+        parse_param_overrides(['product_users_after_10y'])
+
+def test_find_input_files(workdir):
+    (workdir / 'b - radCAD_inputs.csv').write_text('')
+    (workdir / 'a - radCAD_inputs.csv').write_text('')
+    (workdir / 'data tables.csv').write_text('')
+    (workdir / 'single.csv').write_text('')
+
+    assert find_input_files([str(workdir), str(workdir / 'single.csv')]) == [str(workdir / 'a - radCAD_inputs.csv'),
+                                                                               str(workdir / 'b - radCAD_inputs.csv'),
+                                                                               str(workdir / 'single.csv')]
+    with pytest.raises(FileNotFoundError):
+        find_input_files([str(workdir / 'missing.csv')])
+
+def test_run_batch_skips_stored_parameter_sets(workdir, input_file, capsys):
+    param_ids, failures = run_batch([input_file], {'product_users_after_10y': 2600000}, processes=1)
+
+    assert failures == []
+    assert len(param_ids[input_file]) == 1
+    conn = connect_database()
+    assert simulation_data_exists(conn, param_ids[input_file][0])
+    assert len(load_simulation_data(conn, param_ids[input_file][0], columns=['lp_tokens'])) > 0
+    conn.close()
+
+    capsys.readouterr()
+    assert run_batch([input_file], {'product_users_after_10y': 2600000}, processes=1) == (param_ids, [])
+    assert "All parameter sets have been simulated already." in capsys.readouterr().out
+
+def test_main_without_input_files(workdir):
+    with pytest.raises(SystemExit):
+        main([str(workdir)])
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+import pytest
+
+from Model.database import DATABASE_PATH, connect_database, write_transaction, insert_rows, read_connection
+from Model.jobs import get_active_job
+from Model.simulation import ensure_simulation_data, touch_simulation_data
+from Model.sys_params import read_parameter_set, parameter_set_exists
+
+
+def test_database_is_opened_in_wal_mode(conn):
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.isolation_level is None
+
+def test_write_transaction_commits_and_rolls_back(conn):
+    conn.execute('CREATE TABLE items (item INTEGER)')
+    with write_transaction(conn):
+        conn.execute('INSERT INTO items VALUES (1)')
+        # nested transactions join the outer one
+        with write_transaction(conn):
+            conn.execute('INSERT INTO items VALUES (2)')
+    assert not conn.in_transaction
+
+    with pytest.raises(RuntimeError):
+        with write_transaction(conn):
+            conn.execute('INSERT INTO items VALUES (3)')
+            raise RuntimeError("failed write")
+    assert not conn.in_transaction
+    assert [item for item, in conn.execute('SELECT item FROM items ORDER BY item')] == [1, 2]
+
+def test_concurrent_writers_do_not_lose_writes(conn):
+    conn.execute('CREATE TABLE counter (value INTEGER)')
+    conn.execute('INSERT INTO counter VALUES (0)')
+
+    def increment():
+        writer_conn = connect_database()
+        for _ in range(50):
+            # read and update within one transaction
+            with write_transaction(writer_conn):
+                value = writer_conn.execute('SELECT value FROM counter').fetchone()[0]
+                writer_conn.execute('UPDATE counter SET value = ?', (value + 1,))
+        writer_conn.close()
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert conn.execute('SELECT value FROM counter').fetchone()[0] == 200
+
+def test_insert_rows_creates_and_appends(conn):
+    df = pd.DataFrame({'id': ['a', 'b'], 'value': [1.5, None]})
+    with write_transaction(conn):
+        insert_rows(conn, 'rows', df)
+        insert_rows(conn, 'rows', df.iloc[:1])
+
+    assert conn.execute('SELECT id, value FROM rows').fetchall() == [('a', 1.5), ('b', None), ('a', 1.5)]
+
+def test_read_connection_does_not_create_a_missing_database(workdir):
+    with pytest.raises(FileNotFoundError, match="Please run a simulation first"):
+        with read_connection():
+            pass
+    assert not os.path.exists(DATABASE_PATH)
+
+    # lookups of the app treat a missing database like an empty one
+    assert read_parameter_set('unknown') is None
+    assert not parameter_set_exists('unknown')
+    assert get_active_job('unknown') is None
+    assert not ensure_simulation_data('unknown')
+    touch_simulation_data('unknown')
+    assert not os.path.exists(DATABASE_PATH)
+
+def test_read_connection_is_read_only(workdir):
+    conn = connect_database()
+    conn.execute('CREATE TABLE items (item INTEGER)')
+    conn.execute('INSERT INTO items VALUES (1)')
+
+    with read_connection() as read_conn:
+        assert read_conn.execute('SELECT item FROM items').fetchall() == [(1,)]
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            read_conn.execute('INSERT INTO items VALUES (2)')
+    conn.execute('INSERT INTO items VALUES (3)')
+    # pooled connections see the latest committed data
+    with read_connection() as read_conn:
+        assert read_conn.execute('SELECT item FROM items ORDER BY item').fetchall() == [(1,), (3,)]
+    conn.close()
@@ -0,0 +1,59 @@
+import glob
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.not_iterable_variables import parameter_list
+from Model.parts import utils
+from Model.parts.utils import compose_initial_parameters, create_parameter_list, read_initial_parameters
+
+# data directory of the repository
+data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# all QTM radCAD inputs files of the data directory
+INPUT_FILES = sorted(glob.glob(os.path.join(data_dir, '*radCAD_inputs*.csv')) + glob.glob(os.path.join(data_dir, '*radCAD_lower*.csv')))
+
+
+@pytest.mark.parametrize('input_file', INPUT_FILES, ids=os.path.basename)
+def test_columnwise_parser_matches_row_parser(input_file):
+    QTM_inputs = pd.read_csv(input_file)
+    initial_parameters = compose_initial_parameters(QTM_inputs, parameter_list)
+
+    for index, row in QTM_inputs.iterrows():
+        parameter_name = row['Parameter Name'].lower().replace(' ', '_').replace('/', '').replace('(', '').replace(')', '')
+        expected_values = create_parameter_list(parameter_name, parameter_list, row['Initial Value'], row['Min'], row['Max'], row['Interval Steps'])
+        values = initial_parameters[parameter_name]
+        assert len(values) == len(expected_values), parameter_name
+        for value, expected_value in zip(values, expected_values):
+            if isinstance(expected_value, float) and np.isnan(expected_value):
+                assert np.isnan(value), parameter_name
+            else:
+                assert value == expected_value, parameter_name
+
+def test_parsed_inputs_are_cached_by_content(workdir, input_file, monkeypatch):
+    monkeypatch.setattr(utils, '_parsed_inputs_cache', {})
+    parsed_files = []
+    original_read_csv = pd.read_csv
+    monkeypatch.setattr(utils.pd, 'read_csv', lambda path, *args, **kwargs: parsed_files.append(path) or original_read_csv(path, *args, **kwargs))
+
+    copied_input_file = str(workdir / 'copy - radCAD_inputs.csv')
+    shutil.copyfile(input_file, copied_input_file)
+    sys_param = read_initial_parameters(input_file, parameter_list)
+    # equal content of another file is only parsed once
+    assert read_initial_parameters(copied_input_file, parameter_list) == sys_param
+    assert parsed_files == [input_file]
+
+    # the callers get copies of the cached parameters
+    sys_param['initial_total_supply'][0] = -1
+    sys_param['supply_type'] = ['changed']
+    assert read_initial_parameters(input_file, parameter_list)['initial_total_supply'][0] != -1
+    assert read_initial_parameters(input_file, parameter_list)['supply_type'] != ['changed']
+
+    # changed files are parsed again
+    QTM_inputs = original_read_csv(copied_input_file)
+    QTM_inputs.loc[QTM_inputs['Parameter Name'] == 'initial_total_supply', 'Initial Value'] = '123456'
+    QTM_inputs.to_csv(copied_input_file, index=False)
+    assert read_initial_parameters(copied_input_file, parameter_list)['initial_total_supply'] == [123456.0]
+    assert parsed_files == [input_file, copied_input_file]
@@ -0,0 +1,78 @@
+import json
+import os
+import re
+
+from Model.instrumentation import SubstepProfiler, CALL_COLUMNS, main
+from Model.simulation import run_simulation
+from Model.state_update_blocks import state_update_blocks
+
+
+def functions_per_timestep():
+    return sum(len(block.get('policies', {})) + len(block.get('variables', {})) for block in state_update_blocks)
+
+def test_profiled_simulation_matches_uninstrumented_one(model_inputs):
+    initial_state, sys_param = model_inputs
+    df = run_simulation(initial_state, sys_param, timesteps=3)
+
+    with SubstepProfiler() as profiler:
+        profiled_df = run_simulation(initial_state, sys_param, timesteps=3, profiler=profiler)
+
+    assert profiled_df['timestep'].tolist() == df['timestep'].tolist() == [0, 1, 2, 3]
+    assert profiled_df['date'].tolist() == df['date'].tolist()
+    assert [pool['lp_tokens'] for pool in profiled_df['liquidity_pool']] == [pool['lp_tokens'] for pool in df['liquidity_pool']]
+    assert [economy['te_circulating_supply'] for economy in profiled_df['token_economy']] == [economy['te_circulating_supply'] for economy in df['token_economy']]
+
+def test_calls_are_recorded_per_substep_and_timestep(model_inputs):
+    initial_state, sys_param = model_inputs
+
+    with SubstepProfiler() as profiler:
+        run_simulation(initial_state, sys_param, timesteps=3, profiler=profiler)
+
+    calls = profiler.get_calls()
+    assert list(calls.columns) == CALL_COLUMNS
+    assert len(calls) == 3 * functions_per_timestep()
+    assert (calls['wall_time'] >= 0).all() and (calls['allocated_bytes'] >= 0).all()
+    assert calls['allocated_bytes'].sum() > 0
+
+    assert profiler.substep_summary()['substep'].tolist() == list(range(1, len(state_update_blocks) + 1))
+    timestep_summary = profiler.timestep_summary()
+    assert timestep_summary['timestep'].tolist() == [1, 2, 3]
+    assert (timestep_summary['calls'] == functions_per_timestep()).all()
+    summary = profiler.summary()
+    assert summary['calls'].sum() == len(calls)
+    assert (summary['calls'] == 3).all()
+    assert summary['wall_time'].is_monotonic_decreasing
+    assert abs(summary['wall_share'].sum() - 1) < 1e-9
+
+def test_memory_tracing_is_optional(model_inputs):
+    initial_state, sys_param = model_inputs
+
+    with SubstepProfiler(trace_memory=False) as profiler:
+        run_simulation(initial_state, sys_param, timesteps=1, profiler=profiler)
+
+    assert (profiler.get_calls()['allocated_bytes'] == 0).all()
+
+def test_exported_trace_files(model_inputs, tmp_path):
+    initial_state, sys_param = model_inputs
+    with SubstepProfiler(trace_memory=False) as profiler:
+        run_simulation(initial_state, sys_param, timesteps=2, profiler=profiler)
+
+    profiler.export_chrome_trace(tmp_path / 'trace.json')
+    profiler.export_folded_stacks(tmp_path / 'stacks.folded')
+
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+    assert len([event for event in events if event['cat'] == 'timestep']) == 2
+    assert len([event for event in events if event['cat'] == 'substep']) == 2 * len(state_update_blocks)
+    assert len([event for event in events if event['cat'] in ['policy', 'variable']]) == 2 * functions_per_timestep()
+
+    lines = (tmp_path / 'stacks.folded').read_text().splitlines()
+    assert len(lines) == len(profiler.summary())
+    assert all(re.fullmatch(r"substep \d+;(policy|variable);\S+ \d+", line) for line in lines)
+
+def test_main_does_not_write_the_database(workdir, input_file, capsys):
+    assert main([input_file, '--timesteps', '2', '--no-memory', '--trace', 'trace.json', '--folded', 'stacks.folded', '--top', '5']) == 0
+
+    assert os.path.exists('trace.json') and os.path.exists('stacks.folded')
+    assert not os.path.exists('simulationData.db')
+    assert "Chrome trace written to " in capsys.readouterr().out
@@ -0,0 +1,176 @@
+import os
+import subprocess
+import sys
+import threading
+
+import Model.jobs as jobs_module
+from Model.database import connect_database, write_transaction
+from Model.jobs import (create_jobs_table, create_simulation_tables, submit_simulation, get_job, get_active_job, claim_job,
+                        finish_job, is_worker_alive, requeue_interrupted_jobs, run_job_worker, start_job_workers)
+from Model.simulation import TIMESTEPS, MONTE_CARLO_RUNS
+from Model.storage import simulation_data_exists
+from Model.streaming import load_stream_data
+
+
+def queue_jobs(conn, amount):
+    with write_transaction(conn):
+        conn.executemany('''INSERT INTO simulation_jobs (job_id, param_id, status, total, submitted) VALUES (?, ?, 'queued', 120, ?)''',
+                         [(f'job_{job}', f'param_{job}', job) for job in range(amount)])
+
+    return [f'job_{job}' for job in range(amount)]
+
+def test_every_job_is_claimed_exactly_once(conn):
+    create_jobs_table(conn)
+    job_ids = queue_jobs(conn, 60)
+    claimed_jobs = []
+
+    def worker():
+        worker_conn = connect_database()
+        while True:
+            job = claim_job(worker_conn)
+            if job is None:
+                break
+            claimed_jobs.append(job[0])
+        worker_conn.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert sorted(claimed_jobs) == sorted(job_ids)
+    assert conn.execute("SELECT count(*) FROM simulation_jobs WHERE status = 'running' AND worker = ?", (os.getpid(),)).fetchone()[0] == 60
+    assert claim_job(conn) is None
+
+def test_jobs_are_claimed_in_submission_order(conn):
+    create_jobs_table(conn)
+    queue_jobs(conn, 3)
+
+    assert claim_job(conn) == ('job_0', 'param_0')
+    finish_job(conn, 'job_0')
+    assert claim_job(conn) == ('job_1', 'param_1')
+    finish_job(conn, 'job_1', error="Traceback")
+
+    assert get_job('job_0')['status'] == 'finished'
+    assert get_job('job_1')['status'] == 'failed' and get_job('job_1')['error'] == "Traceback"
+    assert get_job('unknown') is None
+    assert get_active_job('param_2')['status'] == 'queued'
+    assert get_active_job('param_0') is None
+
+def stopped_process_id():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+
+    return process.pid
+
+def test_interrupted_jobs_are_queued_again(conn):
+    create_jobs_table(conn)
+    queue_jobs(conn, 4)
+    for job in range(4):
+        claim_job(conn)
+    stopped_worker = stopped_process_id()
+    conn.execute("UPDATE simulation_jobs SET worker = ? WHERE job_id IN ('job_0', 'job_1')", (stopped_worker,))
+    conn.execute("UPDATE simulation_jobs SET worker = NULL WHERE job_id = 'job_2'")
+
+    requeue_interrupted_jobs(conn, workers=[stopped_worker])
+    assert [get_job(f'job_{job}')['status'] for job in range(4)] == ['queued', 'queued', 'running', 'running']
+    assert get_job('job_0')['worker'] is None
+
+    # jobs of the live worker of this process are kept, the one without a worker is queued again
+    requeue_interrupted_jobs(conn)
+    assert [get_job(f'job_{job}')['status'] for job in range(4)] == ['queued', 'queued', 'queued', 'running']
+    assert get_job('job_3')['worker'] == os.getpid()
+
+def test_startup_keeps_the_jobs_of_live_workers(conn):
+    create_simulation_tables(conn)
+    queue_jobs(conn, 2)
+    claim_job(conn)
+    claim_job(conn)
+    conn.execute("UPDATE simulation_jobs SET worker = ? WHERE job_id = 'job_1'", (stopped_process_id(),))
+
+    # a second app server or python -m Model.jobs starts its workers
+    assert start_job_workers(workers=0, worker_processes=[]) == []
+
+    assert get_job('job_0')['status'] == 'running' and get_job('job_0')['worker'] == os.getpid()
+    assert get_job('job_1')['status'] == 'queued'
+    assert is_worker_alive(os.getpid())
+    assert not is_worker_alive(None)
+
+def test_former_job_tables_are_migrated(conn):
+    conn.execute('''CREATE TABLE simulation_jobs (job_id TEXT PRIMARY KEY, param_id TEXT NOT NULL, status TEXT NOT NULL,
+                    progress INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL, error TEXT, submitted REAL NOT NULL,
+                    started REAL, finished REAL)''')
+    queue_jobs(conn, 1)
+
+    create_jobs_table(conn)
+
+    assert claim_job(conn) == ('job_0', 'param_0')
+    assert get_job('job_0')['worker'] == os.getpid()
+
+class StoppedProcess:
+    pid = 4242
+
+    def is_alive(self):
+        return False
+
+def test_stopped_workers_are_replaced(conn):
+    create_simulation_tables(conn)
+    queue_jobs(conn, 2)
+    claim_job(conn)
+    claim_job(conn)
+    conn.execute("UPDATE simulation_jobs SET worker = ? WHERE job_id = 'job_0'", (StoppedProcess.pid,))
+
+    worker_processes = [StoppedProcess()]
+    assert start_job_workers(workers=0, worker_processes=worker_processes) is worker_processes
+
+    # only the jobs of the stopped worker are queued again
+    assert worker_processes == []
+    assert get_job('job_0')['status'] == 'queued'
+    assert get_job('job_1')['status'] == 'running'
+
+def test_submitted_simulation_is_run_by_a_worker(workdir, input_file):
+    job_id, param_id, execute_sim = submit_simulation(input_file, {'product_users_after_10y': 2600000})
+    assert execute_sim
+    assert get_job(job_id)['status'] == 'queued'
+
+    # the queued job is returned for a second submission of the same parameter set
+    assert submit_simulation(input_file, {'product_users_after_10y': 2600000}) == (job_id, param_id, True)
+    conn = connect_database()
+    assert conn.execute('SELECT count(*) FROM simulation_jobs WHERE param_id = ?', (param_id,)).fetchone()[0] == 1
+    conn.close()
+
+    run_job_worker(stop_when_idle=True)
+
+    job = get_job(job_id)
+    assert job['status'] == 'finished', job['error']
+    assert job['progress'] == job['total'] == TIMESTEPS * MONTE_CARLO_RUNS
+    conn = connect_database()
+    assert simulation_data_exists(conn, param_id)
+    # the streamed timesteps are replaced by the stored results
+    assert len(load_stream_data(conn, param_id)) == 0
+    conn.close()
+
+    # stored parameter sets are finished right away
+    finished_job_id, same_param_id, execute_sim = submit_simulation(input_file, {'product_users_after_10y': 2600000})
+    assert same_param_id == param_id
+    assert get_job(finished_job_id)['status'] == 'finished'
+
+def test_stochastic_job_streams_its_progress(workdir, input_file, monkeypatch):
+    job_id, param_id, execute_sim = submit_simulation(input_file, {'agent_behavior': 'stochastic'})
+    streamed = []
+    update_job_progress = jobs_module.update_job_progress
+
+    def record_progress(conn, job_id, progress, total):
+        # the streamed timestep is written in the same transaction as the progress
+        assert conn.in_transaction
+        streamed.append((progress, len(load_stream_data(conn, param_id))))
+        update_job_progress(conn, job_id, progress, total)
+
+    monkeypatch.setattr(jobs_module, 'update_job_progress', record_progress)
+    run_job_worker(stop_when_idle=True)
+
+    job = get_job(job_id)
+    assert job['status'] == 'finished', job['error']
+    assert job['progress'] == job['total'] == TIMESTEPS * MONTE_CARLO_RUNS
+    assert streamed == [(timestep, timestep) for timestep in range(1, TIMESTEPS + 1)]
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from Model.database import connect_database
+from Model.parts.utils import get_run_seed
+from Model.run_summary import count_summary_runs
+from Model.simulation import simulation, simulate_monte_carlo, simulate_run
+from Model.state_variables import get_stored_initial_state
+from Model.storage import load_simulation_runs, load_simulation_data
+
+
+def test_run_seeds_are_reproducible():
+    seeds = [get_run_seed(param_id, run) for param_id in ['first', 'second'] for run in range(1, 101)]
+
+    assert seeds == [get_run_seed(param_id, run) for param_id in ['first', 'second'] for run in range(1, 101)]
+    assert len(set(seeds)) == len(seeds)
+    assert all(0 <= seed < 2**64 for seed in seeds)
+
+def test_monte_carlo_runs_are_topped_up(workdir, input_file, capsys):
+    param_id, execute_sim = simulation(input_file, {'agent_behavior': 'stochastic'}, runs=2, processes=2)
+    assert execute_sim
+    conn = connect_database()
+    stored_data = load_simulation_data(conn, param_id)
+    assert load_simulation_runs(conn, param_id) == [1, 2]
+    assert count_summary_runs(conn, param_id) == 2
+
+    capsys.readouterr()
+    assert simulate_monte_carlo(param_id, 3, processes=2) == [1, 2, 3]
+
+    # only the missing run is simulated
+    output = capsys.readouterr().out
+    assert "Finished run 3 " in output and "Finished run 1 " not in output and "Finished run 2 " not in output
+    assert load_simulation_runs(conn, param_id) == [1, 2, 3]
+    assert count_summary_runs(conn, param_id) == 3
+    pd.testing.assert_frame_equal(load_simulation_data(conn, param_id, runs=[1, 2]), stored_data)
+
+    # the stochastic runs differ, but every run is reproduced by its seed
+    run_data = {run: load_simulation_data(conn, param_id, columns=['lp_token_price'], runs=[run])['lp_token_price'].tolist() for run in [1, 2, 3]}
+    assert run_data[1] != run_data[2] != run_data[3]
+    initial_state, sys_param, stakeholder_name_mapping = get_stored_initial_state(param_id)
+    assert simulate_run(initial_state, sys_param, stakeholder_name_mapping, param_id, 3)['lp_token_price'].tolist() == run_data[3]
+    conn.close()
@@ -0,0 +1,57 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from Model.post_processing import postprocessing, postprocessing_substeps
+from Model.simulation import run_simulation
+
+# end of timestep analysis dataset of the first 24 months of the default parameter set by the former postprocessing
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'baseline_data.csv.gz')
+
+
+def load_baseline_data():
+    return pd.read_csv(BASELINE_FILE, parse_dates=['date'], float_precision='round_trip')
+
+def test_postprocessing_matches_the_former_analysis_dataset(model_inputs):
+    initial_state, sys_param = model_inputs
+    df = run_simulation(initial_state, sys_param, timesteps=24)
+    data = postprocessing(df, substep=df.substep.max(), category="all").reset_index(drop=True)
+    baseline_data = load_baseline_data()
+
+    assert list(data.columns) == list(baseline_data.columns)
+    for column in baseline_data.columns:
+        if column.endswith('_a_actions'):
+            assert [json.dumps(actions, sort_keys=True) for actions in data[column]] == baseline_data[column].tolist(), column
+        elif baseline_data[column].dtype == object or column == 'date':
+            assert data[column].tolist() == baseline_data[column].tolist(), column
+        else:
+            np.testing.assert_allclose(data[column].astype(float), baseline_data[column].astype(float), rtol=1e-9, atol=1e-9, err_msg=column)
+
+    # the numeric agent attributes are float64 columns of the agent store, so the agent attributes which the former
+    # postprocessing kept as integer zeros are float64 now, all other dtypes are unchanged
+    changed_dtypes = {column: (str(baseline_data[column].dtype), str(data[column].dtype))
+                      for column in baseline_data.columns if data[column].dtype != baseline_data[column].dtype}
+    assert len(changed_dtypes) > 0
+    assert set(changed_dtypes.values()) == {('int64', 'float64')}
+    assert all('_a_' in column and (data[column] == baseline_data[column]).all() for column in changed_dtypes)
+
+def test_substeps_are_extracted_in_one_pass(model_inputs):
+    initial_state, sys_param = model_inputs
+    df = run_simulation(initial_state, sys_param, timesteps=4, retention='all')
+    substeps = [16, 19, 20, 21, df.substep.max()]
+
+    data_substeps = postprocessing_substeps(df, substeps)
+
+    assert list(data_substeps) == substeps
+    for substep in substeps:
+        pd.testing.assert_frame_equal(data_substeps[substep], postprocessing(df, substep, 'all'))
+    for category in ['liquidity_pool', 'agents']:
+        pd.testing.assert_frame_equal(postprocessing_substeps(df, [16], category)[16], postprocessing(df, 16, category))
+
+    # the combined dataset holds the rows of all substeps with a substep column after the key columns
+    combined_data = postprocessing_substeps(df, substeps, categories=['liquidity_pool', 'token_economy'], combine=True)
+    assert list(combined_data.columns[:4]) == ['timestep', 'date', 'run', 'substep']
+    assert sorted(combined_data['substep'].unique()) == sorted(substeps)
+    pd.testing.assert_frame_equal(combined_data[combined_data['substep'] == 19].drop(columns='substep'),
+                                  postprocessing_substeps(df, [19], ['liquidity_pool', 'token_economy'])[19])
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+from Model.reporting import set_reporter, report_warning, print_reporter
+from Model.sys_params import save_sys_param
+
+
+def test_model_core_imports_without_streamlit():
+    modules = ['Model.simulation', 'Model.batch', 'Model.jobs', 'Model.instrumentation']
+    result = subprocess.run([sys.executable, '-c', f"import sys; import {', '.join(modules)}; print('streamlit' in sys.modules)"],
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == 'False'
+
+def test_warnings_are_passed_to_the_active_reporter(capsys):
+    warnings = []
+    former_reporter = set_reporter(lambda message, icon=None: warnings.append((message, icon)))
+    try:
+        report_warning("first warning", icon="⚠️")
+        report_warning("second warning")
+    finally:
+        assert set_reporter(former_reporter) is not former_reporter
+
+    assert warnings == [("first warning", "⚠️"), ("second warning", None)]
+    assert capsys.readouterr().out == ""
+
+    print_reporter("printed warning")
+    assert capsys.readouterr().out == "Warning: printed warning\n"
+
+def test_missing_project_name_is_reported(conn):
+    warnings = []
+    former_reporter = set_reporter(lambda message, icon=None: warnings.append(message))
+    try:
+        param_id, execute_sim = save_sys_param({'project_name': [' '], 'initial_total_supply': [1e9]}, conn, conn.cursor())
+    finally:
+        set_reporter(former_reporter)
+
+    assert not execute_sim
+    assert warnings == ["Please provide a project name before running the simulation!"]
@@ -0,0 +1,81 @@
+import pandas as pd
+
+from Model.storage import create_results_tables, save_simulation_data, simulation_data_exists
+from Model.result_cache import (create_result_cache_table, record_simulation, touch_simulation, evict_simulations,
+                                get_result_cache_size, get_simulation_size)
+from Model.simulation import ensure_simulation_data, touch_simulation_data
+
+
+def store_simulation(conn, param_id, last_access, backend='sqlite'):
+    data = pd.DataFrame({'run': [1] * 12, 'timestep': range(1, 13), 'lp_tokens': [float(timestep) for timestep in range(12)]})
+    save_simulation_data(data, param_id, conn, backend=backend)
+    record_simulation(conn, param_id)
+    conn.execute('UPDATE result_cache SET last_access = ? WHERE param_id = ?', (last_access, param_id))
+
+def cached_param_ids(conn):
+    return [param_id for param_id, in conn.execute('SELECT param_id FROM result_cache ORDER BY last_access')]
+
+def test_simulations_are_registered(conn):
+    create_results_tables(conn)
+    save_simulation_data(pd.DataFrame({'run': [1], 'timestep': [1], 'lp_tokens': [1.0]}), 'untracked', conn)
+    save_simulation_data(pd.DataFrame({'run': [1], 'timestep': [1], 'lp_tokens': [1.0]}), 'untracked_arrow', conn, backend='arrow')
+
+    create_result_cache_table(conn)
+
+    assert sorted(cached_param_ids(conn)) == ['untracked', 'untracked_arrow']
+    assert get_simulation_size(conn, 'untracked') > 0
+    assert get_result_cache_size(conn) == get_simulation_size(conn, 'untracked') + get_simulation_size(conn, 'untracked_arrow')
+
+def test_evict_least_recently_used_within_budget(conn):
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    for last_access, param_id in enumerate(['oldest', 'old', 'new', 'newest'], start=1):
+        store_simulation(conn, param_id, last_access, backend='arrow' if param_id == 'old' else 'sqlite')
+    size = get_simulation_size(conn, 'newest')
+
+    assert evict_simulations(conn, budget=get_result_cache_size(conn)) == []
+    evicted_param_ids = evict_simulations(conn, budget=2 * size)
+
+    assert evicted_param_ids == ['oldest', 'old']
+    assert cached_param_ids(conn) == ['new', 'newest']
+    assert get_result_cache_size(conn) <= 2 * size
+    assert not simulation_data_exists(conn, 'oldest') and not simulation_data_exists(conn, 'old')
+    assert simulation_data_exists(conn, 'new') and simulation_data_exists(conn, 'newest')
+
+def test_evict_skips_kept_simulations(conn):
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    for last_access, param_id in enumerate(['oldest', 'old', 'new', 'newest'], start=1):
+        store_simulation(conn, param_id, last_access)
+    size = get_simulation_size(conn, 'newest')
+
+    assert evict_simulations(conn, budget=2 * size, keep=['oldest']) == ['old', 'new']
+    assert cached_param_ids(conn) == ['oldest', 'newest']
+
+    # kept simulations stay cached even if they alone exceed the budget
+    assert evict_simulations(conn, budget=0, keep=['oldest', 'newest']) == []
+
+def test_touched_simulations_are_evicted_last(conn):
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    for last_access, param_id in enumerate(['first', 'second'], start=1):
+        store_simulation(conn, param_id, last_access)
+
+    touch_simulation(conn, 'first')
+
+    assert evict_simulations(conn, budget=get_simulation_size(conn, 'first')) == ['second']
+
+def test_plotted_simulations_are_only_read(conn):
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    store_simulation(conn, 'stored', 1)
+
+    # the check of stored simulation data does not write
+    assert ensure_simulation_data('stored')
+    assert not ensure_simulation_data('unknown')
+    assert conn.execute('SELECT last_access FROM result_cache').fetchone()[0] == 1
+
+    touch_simulation_data('stored')
+    touch_simulation_data('unknown')
+    assert conn.execute('SELECT last_access FROM result_cache').fetchone()[0] > 1
+    assert cached_param_ids(conn) == ['stored']
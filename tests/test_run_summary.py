@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Model.run_summary import (RunAggregator, SUMMARY_QUANTILES, get_quantile_column, create_summary_tables, save_run_summary,
+                               load_run_aggregator, load_run_summary, count_summary_runs)
+from Model.storage import create_results_tables
+
+
+def random_runs(amount, timesteps=4, seed=0):
+    """
+    Analysis datasets of random runs with a normal, a lognormal and a constant metric.
+    """
+    rng = np.random.default_rng(seed)
+    runs = []
+    for run in range(1, amount + 1):
+        runs.append(pd.DataFrame({'run': run, 'timestep': range(1, timesteps + 1),
+                                  'lp_token_price': rng.normal(1.0, 0.2, timesteps),
+                                  'te_MC': rng.lognormal(15, 1, timesteps),
+                                  'ua_product_users': np.full(timesteps, 1000),
+                                  'agent_behavior': 'stochastic'}))
+
+    return runs
+
+def aggregate(runs):
+    aggregator = RunAggregator.from_run(runs[0])
+    for data in runs:
+        aggregator.add_run(data)
+
+    return aggregator
+
+def stacked_values(runs, aggregator):
+    """
+    Values of the runs as array of the shape (runs, timesteps, metrics).
+    """
+    return np.stack([data.set_index('timestep')[aggregator.metrics].to_numpy(dtype=float) for data in runs])
+
+def summary_values(aggregator, column):
+    return aggregator.summary()[column].to_numpy().reshape(len(aggregator.timesteps), len(aggregator.metrics))
+
+def test_moments_match_numpy():
+    runs = random_runs(50)
+    aggregator = aggregate(runs)
+    values = stacked_values(runs, aggregator)
+
+    assert aggregator.metrics == ['lp_token_price', 'te_MC', 'ua_product_users']
+    assert (aggregator.summary()['runs'] == 50).all()
+    np.testing.assert_allclose(summary_values(aggregator, 'mean'), values.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(summary_values(aggregator, 'std'), values.std(axis=0, ddof=1), rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(summary_values(aggregator, 'min'), values.min(axis=0))
+    np.testing.assert_array_equal(summary_values(aggregator, 'max'), values.max(axis=0))
+
+@pytest.mark.parametrize('amount', [1, 3, 5])
+def test_quantiles_of_few_runs_are_exact(amount):
+    runs = random_runs(amount)
+    aggregator = aggregate(runs)
+    values = stacked_values(runs, aggregator)
+
+    for quantile in SUMMARY_QUANTILES:
+        np.testing.assert_allclose(summary_values(aggregator, get_quantile_column(quantile)), np.quantile(values, quantile, axis=0))
+    if amount == 1:
+        assert aggregator.summary()['std'].isna().all()
+
+def test_quantile_sketch_approximates_numpy():
+    runs = random_runs(1000, timesteps=3)
+    aggregator = aggregate(runs)
+    values = stacked_values(runs, aggregator)
+
+    spread = np.quantile(values, 0.95, axis=0) - np.quantile(values, 0.05, axis=0)
+    for quantile in SUMMARY_QUANTILES:
+        # the estimates are within a small fraction of the spread of the runs, the tails of the skewed metric converge slower
+        error = np.abs(summary_values(aggregator, get_quantile_column(quantile)) - np.quantile(values, quantile, axis=0))
+        assert (error[:, 0] <= 0.03 * spread[:, 0]).all(), quantile
+        assert (error[:, 1] <= 0.15 * spread[:, 1]).all(), quantile
+    # constant metrics stay exact
+    assert (aggregator.summary().query("metric == 'ua_product_users'")[['p5', 'p50', 'p95']] == 1000).all().all()
+
+def test_resumed_aggregation_matches_uninterrupted_one():
+    runs = random_runs(30)
+    aggregator = aggregate(runs[:12])
+
+    resumed_aggregator = RunAggregator.from_bytes(aggregator.to_bytes())
+    for data in runs[12:]:
+        resumed_aggregator.add_run(data)
+
+    pd.testing.assert_frame_equal(resumed_aggregator.summary(), aggregate(runs).summary())
+
+def test_stored_summary(conn):
+    create_results_tables(conn)
+    create_summary_tables(conn)
+    runs = random_runs(8)
+    aggregator = aggregate(runs[:6])
+
+    assert count_summary_runs(conn, 'param') == 0
+    assert load_run_aggregator(conn, 'param') == (None, [])
+    save_run_summary(conn, 'param', aggregator, [2, 1, 3, 4, 5, 6])
+    assert count_summary_runs(conn, 'param') == 6
+
+    # further runs are added to the stored aggregator
+    stored_aggregator, aggregated_runs = load_run_aggregator(conn, 'param')
+    assert aggregated_runs == [1, 2, 3, 4, 5, 6]
+    for data in runs[6:]:
+        stored_aggregator.add_run(data)
+    save_run_summary(conn, 'param', stored_aggregator, aggregated_runs + [7, 8])
+    assert count_summary_runs(conn, 'param') == 8
+
+    summary = load_run_summary(conn, 'param', metrics=['lp_token_price'])
+    expected_summary = aggregate(runs).summary().query("metric == 'lp_token_price'").reset_index(drop=True)
+    assert summary['metric'].unique().tolist() == ['lp_token_price']
+    assert summary['timestep'].tolist() == [1, 2, 3, 4]
+    for column in ['runs', 'mean', 'std', 'min', 'max', 'p5', 'p50', 'p95']:
+        np.testing.assert_allclose(summary[column], expected_summary[column], err_msg=column)
+    assert len(load_run_summary(conn, 'param')) == 4 * 3
+    assert len(load_run_summary(conn, 'unknown')) == 0
+
+def test_missing_summary_table_counts_no_runs(conn):
+    assert count_summary_runs(conn, 'param') == 0
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from Model.post_processing import postprocessing
+from Model.simulation import run_simulation
+from Model.state_update_blocks import state_update_blocks
+
+LAST_SUBSTEP = len(state_update_blocks)
+
+
+def end_of_timestep_data(df, substep=LAST_SUBSTEP):
+    return postprocessing(df, substep=substep, category="all").reset_index(drop=True)
+
+def test_retention_keeps_the_requested_substeps(model_inputs):
+    initial_state, sys_param = model_inputs
+    df_all = run_simulation(initial_state, sys_param, timesteps=4, retention='all')
+    df_last = run_simulation(initial_state, sys_param, timesteps=4, retention='last')
+    df_substeps = run_simulation(initial_state, sys_param, timesteps=4, retention=[16, 19, LAST_SUBSTEP])
+
+    # every retention keeps the initial state
+    assert sorted(df_all['substep'].unique()) == list(range(LAST_SUBSTEP + 1))
+    assert sorted(df_last['substep'].unique()) == [0, LAST_SUBSTEP]
+    assert sorted(df_substeps['substep'].unique()) == [0, 16, 19, LAST_SUBSTEP]
+    assert len(df_last) == 1 + 4 and len(df_substeps) == 1 + 3 * 4
+
+    pd.testing.assert_frame_equal(end_of_timestep_data(df_last), end_of_timestep_data(df_all))
+    for substep in [16, 19, LAST_SUBSTEP]:
+        pd.testing.assert_frame_equal(end_of_timestep_data(df_substeps, substep), end_of_timestep_data(df_all, substep))
+
+def test_stepwise_run_matches_the_radcad_engine(model_inputs):
+    initial_state, sys_param = model_inputs
+    progress = []
+
+    # a progress callback steps through the model timestep by timestep instead of running the radCAD engine
+    df_stepwise = run_simulation(initial_state, sys_param, timesteps=4, retention='last', progress=lambda *args: progress.append(args))
+
+    assert progress == [(timestep, 4) for timestep in range(1, 5)]
+    pd.testing.assert_frame_equal(end_of_timestep_data(df_stepwise), end_of_timestep_data(run_simulation(initial_state, sys_param, timesteps=4)))
@@ -0,0 +1,84 @@
+import os
+import pandas as pd
+from radcad.engine import Backend
+
+from Model import simulation as simulation_module
+from Model.database import connect_database
+from Model.simulation import simulation_sweep, run_sweep_chunk
+from Model.state_variables import get_initial_state
+from Model.storage import create_results_tables, simulation_data_exists, load_simulation_data
+from Model.result_cache import create_result_cache_table
+from Model.sys_params import read_parameter_set, stakeholder_name_mapping
+
+# inputs file with a sweep over three initial total supplies
+SWEEP_INPUT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data',
+                                'Quantitative_Token_Model_V1.89_radCAD_integration - radCAD_inputs_supply_interval.csv')
+
+
+def fail_simulation(*args, **kwargs):
+    raise AssertionError("Stored parameter sets must not be simulated again.")
+
+def test_sweep_stores_every_parameter_set_once(workdir, monkeypatch):
+    param_ids = simulation_sweep(SWEEP_INPUT_FILE, {}, processes=1)
+
+    assert len(param_ids) == len(set(param_ids)) == 3
+    # the ids are returned in the order of the sweep lists
+    assert [read_parameter_set(param_id)['initial_total_supply'] for param_id in param_ids] == [50000000.0, 125000000.0, 200000000.0]
+    conn = connect_database()
+    assert all(simulation_data_exists(conn, param_id) for param_id in param_ids)
+    assert len(load_simulation_data(conn, param_ids[0], columns=['lp_tokens'])) == 120
+    conn.close()
+
+    monkeypatch.setattr(simulation_module, 'run_static_simulation_batch', fail_simulation)
+    monkeypatch.setattr(simulation_module, 'Experiment', fail_simulation)
+    assert simulation_sweep(SWEEP_INPUT_FILE, {}, processes=1) == param_ids
+
+def test_chunk_splits_static_and_radcad_parameter_sets(workdir, input_file, capsys):
+    static_state, static_sys_param, _, _, conn, cur, static_param_id, execute_sim = get_initial_state(input_file, {})
+    conn.close()
+    stochastic_state, stochastic_sys_param, _, _, conn, cur, stochastic_param_id, execute_sim = get_initial_state(input_file, {'agent_behavior': 'stochastic'})
+    create_results_tables(conn)
+    create_result_cache_table(conn)
+    chunk = [(static_state, static_sys_param, static_param_id, True),
+             (stochastic_state, stochastic_sys_param, stochastic_param_id, True),
+             # duplicates and invalid parameter sets are skipped
+             (static_state, static_sys_param, static_param_id, True),
+             (static_state, static_sys_param, 'invalid', False)]
+    capsys.readouterr()
+
+    run_sweep_chunk(chunk, stakeholder_name_mapping, conn, processes=1, backend=Backend.SINGLE_PROCESS)
+
+    output = capsys.readouterr().out
+    assert "Running  1  static parameter subsets.." in output
+    assert "Running  1  parameter subsets.." in output
+    assert simulation_data_exists(conn, static_param_id) and simulation_data_exists(conn, stochastic_param_id)
+    assert not simulation_data_exists(conn, 'invalid')
+    static_data = load_simulation_data(conn, static_param_id, columns=['lp_token_price'])
+    stochastic_data = load_simulation_data(conn, stochastic_param_id, columns=['lp_token_price'])
+    assert len(static_data) == len(stochastic_data) == 120
+    assert static_data['lp_token_price'].tolist() != stochastic_data['lp_token_price'].tolist()
+
+    run_sweep_chunk(chunk, stakeholder_name_mapping, conn, processes=1, backend=Backend.SINGLE_PROCESS)
+    assert "Running" not in capsys.readouterr().out
+    conn.close()
+
+def test_zip_sweep_in_chunks(workdir, capsys):
+    # second sweep list of two values next to the three initial total supplies
+    QTM_inputs = pd.read_csv(SWEEP_INPUT_FILE)
+    QTM_inputs.loc[QTM_inputs['Parameter Name'] == 'product_users_after_10y', ['Min', 'Max', 'Interval Steps']] = ['40000', '60000', '2']
+    QTM_inputs.to_csv('two_sweeps - radCAD_inputs.csv', index=False)
+
+    param_ids = simulation_sweep('two_sweeps - radCAD_inputs.csv', {'agent_behavior': 'stochastic'}, processes=2,
+                                 backend=Backend.MULTIPROCESSING, grid='zip', chunk_size=2)
+
+    # the zip grid repeats the last value of the shorter sweep list like the former radCAD parameter sweep
+    assert [(read_parameter_set(param_id)['initial_total_supply'], read_parameter_set(param_id)['product_users_after_10y']) for param_id in param_ids] == \
+        [(50000000.0, 40000.0), (125000000.0, 60000.0), (200000000.0, 60000.0)]
+    output = capsys.readouterr().out
+    assert "Simulated  2  parameter subsets after " in output and "Simulated  3  parameter subsets after " in output
+    conn = connect_database()
+    assert all(simulation_data_exists(conn, param_id) for param_id in param_ids)
+    conn.close()
+
+    # the cartesian grid of the same inputs file contains all combinations
+    assert len(simulation_sweep('two_sweeps - radCAD_inputs.csv', {}, processes=1, grid='cartesian')) == 6
@@ -25,6 +25,8 @@ from Model.state_variables import get_initial_state
 from Model.state_update_blocks import state_update_blocks
 from Model.parts.utils import *
 from Model.post_processing import *
+from Model.static_engine import run_static_simulation
+from Model.simulation import run_simulation
 
 # Get the current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -45,21 +47,21 @@ if __name__ == '__main__'   :
     MONTE_CARLO_RUNS = 1
     TIMESTEPS = 12*10
 
-    model = Model(initial_state=initial_state, params=sys_param, state_update_blocks=state_update_blocks)
-    simulation = Simulation(model=model, timesteps=TIMESTEPS, runs=MONTE_CARLO_RUNS)
-
-    result = simulation.run()
-    df = pd.DataFrame(result)
+    # only keep the liquidity pool transaction substeps and the end of each timestep
+    df = run_simulation(initial_state, sys_param, TIMESTEPS, MONTE_CARLO_RUNS, retention=[16, 19, 20, 21, len(state_update_blocks)])
     simulation_end_time = time.process_time()
 
-    # post processing
-    data_tx1 = postprocessing(df, substep=16, category="all") # after adoption buy lp tx
-    data_tx2 = postprocessing(df, substep=19, category="all") # after vesting sell lp tx
-    data_tx3 = postprocessing(df, substep=20, category="all") # after liquidity addition lp tx
-    data_tx4 = postprocessing(df, substep=21, category="all") # after buyback lp tx
-    postprocessing_one_start_time = time.process_time()
-    data = postprocessing(df, substep=df.substep.max(), category="all") # at the end of the timestep = last substep
+    # post processing of all retained substeps in one pass
+    data_substeps = postprocessing_substeps(df, substeps=[16, 19, 20, 21, df.substep.max()], categories="all")
+    data_tx1 = data_substeps[16] # after adoption buy lp tx
+    data_tx2 = data_substeps[19] # after vesting sell lp tx
+    data_tx3 = data_substeps[20] # after liquidity addition lp tx
+    data_tx4 = data_substeps[21] # after buyback lp tx
+    data = data_substeps[df.substep.max()] # at the end of the timestep = last substep
     postprocessing_all_end_time = time.process_time()
+    static_engine_start_time = time.process_time()
+    static_data, static_data_lp_transactions = run_static_simulation(sys_param, stakeholder_name_mapping, TIMESTEPS)
+    static_engine_end_time = time.process_time()
 
 
     ### BEGIN TESTS ###
@@ -254,6 +256,18 @@ if __name__ == '__main__'   :
     test_timeseries(data=data, data_key="te_FDV_MC", data_row_multiplier=1, QTM_data_tables=QTM_data_tables, QTM_row=194, relative_tolerance=0.003)
 
 
+    ## TEST STATIC ENGINE ##
+    print("\n-----------------------------------------## TEST STATIC ENGINE ##---------------------------------------")
+    print("Testing vectorized static engine against radCad timeseries simulation...")
+    for static_df, radcad_df in [(static_data, data), (static_data_lp_transactions[16], data_tx1), (static_data_lp_transactions[19], data_tx2),
+                                 (static_data_lp_transactions[20], data_tx3), (static_data_lp_transactions[21], data_tx4)]:
+        for key in static_df.columns:
+            if pd.api.types.is_numeric_dtype(static_df[key]) and pd.api.types.is_numeric_dtype(radcad_df[key]):
+                np.testing.assert_allclose(static_df[key].values, radcad_df[key].values, rtol=0.003, atol=1e-6, err_msg=key)
+            else:
+                assert list(static_df[key]) == list(radcad_df[key]), key
+
+
     ### END OF TESTS ###
     print("\n")
     print(u'\u2713'+" ALL TESTS PASSED!")
@@ -265,8 +279,8 @@ if __name__ == '__main__'   :
     print("\n")
     # display necessery time data
     print("Simulation time: ", simulation_end_time - start_time, " s")
-    print("Post processing one dataframe time: ", postprocessing_all_end_time - postprocessing_one_start_time, " s")
     print("Post processing all dataframes time: ", postprocessing_all_end_time - simulation_end_time, " s")
+    print("Static engine simulation time: ", static_engine_end_time - static_engine_start_time, " s")
     print("Whole Test time: ", time.process_time() - start_time, " s")
 
 
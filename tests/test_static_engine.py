@@ -0,0 +1,67 @@
+import glob
+import os
+import pandas as pd
+import pytest
+
+from Model.post_processing import postprocessing_substeps
+from Model.simulation import run_simulation, TIMESTEPS
+from Model.state_update_blocks import state_update_blocks
+from Model.state_variables import compose_initial_state, add_precomputed_params
+from Model.static_engine import LP_TRANSACTION_SUBSTEPS, run_static_simulation, run_static_simulation_batch, static_engine_data
+from Model.sys_params import load_sys_param, calculate_derived_parameters, stakeholder_name_mapping
+
+# data directory of the repository
+data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+# QTM radCAD inputs files of single parameter sets of the current model version
+INPUT_FILES = [input_file for input_file in sorted(glob.glob(os.path.join(data_dir, '*V1.89*radCAD_inputs*.csv'))) if 'supply_interval' not in input_file]
+
+
+def get_model_inputs(input_file):
+    sys_param = calculate_derived_parameters(load_sys_param(input_file, {}))
+    initial_state = compose_initial_state(sys_param, stakeholder_name_mapping)
+    add_precomputed_params(sys_param, stakeholder_name_mapping)
+
+    return initial_state, sys_param
+
+@pytest.mark.parametrize('input_file', INPUT_FILES, ids=os.path.basename)
+def test_static_engine_matches_radcad(input_file):
+    initial_state, sys_param = get_model_inputs(input_file)
+    substeps = sorted(LP_TRANSACTION_SUBSTEPS.values()) + [len(state_update_blocks)]
+    df = run_simulation(initial_state, sys_param, TIMESTEPS, retention=substeps)
+    radcad_data = {substep: data.reset_index(drop=True) for substep, data in postprocessing_substeps(df, substeps).items()}
+
+    data, data_lp_transactions = run_static_simulation(sys_param, stakeholder_name_mapping, TIMESTEPS)
+
+    # the static engine keeps all numeric metrics as float64, e.g. te_minted_tokens, which radCAD leaves an integer zero
+    pd.testing.assert_frame_equal(data, radcad_data[len(state_update_blocks)], check_dtype=False, rtol=1e-9, atol=1e-6)
+    for substep, lp_data in data_lp_transactions.items():
+        pd.testing.assert_frame_equal(lp_data, radcad_data[substep][lp_data.columns], check_dtype=False, rtol=1e-9, atol=1e-6)
+
+@pytest.mark.parametrize('batch_size', [3, 2])
+def test_batch_matches_single_parameter_sets(input_file, batch_size):
+    adjusted_params = [{}, {'public_sale_supply_perc': 2.75}, {'product_users_after_10y': 2600000, 'token_holders_after_10y': 800000}]
+    sys_params = [calculate_derived_parameters(load_sys_param(input_file, params)) for params in adjusted_params]
+    for sys_param in sys_params:
+        add_precomputed_params(sys_param, stakeholder_name_mapping)
+
+    history = run_static_simulation_batch(sys_params, stakeholder_name_mapping, TIMESTEPS, batch_size=batch_size)
+
+    for scenario_index, sys_param in enumerate(sys_params):
+        data, data_lp_transactions = run_static_simulation(sys_param, stakeholder_name_mapping, TIMESTEPS)
+        pd.testing.assert_frame_equal(static_engine_data(history, scenario_index, stakeholder_name_mapping), data)
+        for substep, lp_data in data_lp_transactions.items():
+            pd.testing.assert_frame_equal(static_engine_data(history, scenario_index, stakeholder_name_mapping, substep=substep), lp_data)
+    # the scenarios differ
+    assert not static_engine_data(history, 0, stakeholder_name_mapping)['lp_tokens'].equals(static_engine_data(history, 1, stakeholder_name_mapping)['lp_tokens'])
+
+def test_batch_without_agents(input_file):
+    sys_param = calculate_derived_parameters(load_sys_param(input_file, {}))
+    add_precomputed_params(sys_param, stakeholder_name_mapping)
+
+    history = run_static_simulation_batch([sys_param], stakeholder_name_mapping, TIMESTEPS, keep_agents=False)
+    data = static_engine_data(history, 0, stakeholder_name_mapping)
+
+    assert history['agents'] is None
+    assert not any('_a_' in column for column in data.columns)
+    assert data['lp_tokens'].tolist() == run_static_simulation(sys_param, stakeholder_name_mapping, TIMESTEPS)[0]['lp_tokens'].tolist()
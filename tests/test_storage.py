@@ -0,0 +1,155 @@
+import json
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from Model.storage import (create_results_tables, simulation_data_exists, save_simulation_data, append_simulation_data, load_simulation_data,
+                           load_simulation_runs, delete_simulation_data, load_metrics_across_simulations, get_arrow_path,
+                           get_arrow_run_path, get_arrow_paths, LEGACY_TABLE_PREFIX)
+
+
+def simulation_data(runs=(1,), timesteps=3):
+    """
+    Small analysis dataset with numeric, text, date and object columns.
+    """
+    rows = []
+    for run in runs:
+        for timestep in range(1, timesteps + 1):
+            rows.append({'run': run, 'timestep': timestep,
+                         'date': pd.Timestamp('2024-01-01') + pd.DateOffset(months=timestep - 1),
+                         'lp_tokens': 1000.0 * run + timestep,
+                         'ua_product_users': 10 * timestep,
+                         'agent_behavior': 'static',
+                         'seed_a_actions': {'sell': 0.1 * timestep, 'hold': 1 - 0.1 * timestep}})
+
+    return pd.DataFrame(rows)
+
+def test_sqlite_round_trip(conn):
+    create_results_tables(conn)
+    data = simulation_data(runs=[1, 2])
+
+    assert not simulation_data_exists(conn, 'param')
+    save_simulation_data(data, 'param', conn, backend='sqlite')
+    assert simulation_data_exists(conn, 'param')
+
+    loaded = load_simulation_data(conn, 'param')
+    assert list(loaded.columns) == list(data.columns)
+    pdt.assert_series_equal(loaded['lp_tokens'], data['lp_tokens'])
+    assert loaded['ua_product_users'].tolist() == data['ua_product_users'].tolist()
+    assert loaded['agent_behavior'].tolist() == ['static'] * 6
+    assert [json.loads(actions) for actions in loaded['seed_a_actions']] == data['seed_a_actions'].tolist()
+    assert pd.to_datetime(loaded['date']).tolist() == data['date'].tolist()
+    assert load_simulation_runs(conn, 'param') == [1, 2]
+
+def test_sqlite_column_and_run_projection(conn):
+    create_results_tables(conn)
+    save_simulation_data(simulation_data(runs=[1, 2]), 'param', conn, backend='sqlite')
+
+    loaded = load_simulation_data(conn, 'param', columns=['lp_tokens'], runs=[2])
+    assert list(loaded.columns) == ['run', 'timestep', 'lp_tokens']
+    assert loaded['run'].tolist() == [2, 2, 2]
+    assert loaded['lp_tokens'].tolist() == [2001.0, 2002.0, 2003.0]
+
+def test_sqlite_save_replaces_former_results(conn):
+    create_results_tables(conn)
+    save_simulation_data(simulation_data(runs=[1, 2]), 'param', conn, backend='sqlite')
+    save_simulation_data(simulation_data(runs=[1], timesteps=2), 'param', conn, backend='sqlite')
+
+    assert len(load_simulation_data(conn, 'param')) == 2
+
+    delete_simulation_data(conn, 'param')
+    assert not simulation_data_exists(conn, 'param')
+
+def test_metrics_across_simulations(conn):
+    create_results_tables(conn)
+    save_simulation_data(simulation_data(), 'first', conn, backend='sqlite')
+    save_simulation_data(simulation_data(runs=[2]), 'second', conn, backend='sqlite')
+
+    results = load_metrics_across_simulations(conn, ['lp_tokens'], timestep=2).sort_values('param_id')
+    assert results['param_id'].tolist() == ['first', 'second']
+    assert results['metric'].tolist() == ['lp_tokens', 'lp_tokens']
+    assert results['value'].tolist() == [1002.0, 2002.0]
+
+def test_legacy_tables_are_migrated(conn):
+    # former result tables stored every value as JSON text
+    legacy_data = pd.DataFrame({'run': [1, 1], 'timestep': [1, 2], 'lp_tokens': ['1.5', '2.5'],
+                                'agent_behavior': ['"static"', '"static"'], 'seed_a_actions': ['{"sell": 0.1}', '{"sell": 0.2}']})
+    legacy_data.to_sql(LEGACY_TABLE_PREFIX + 'legacy', conn, index=False)
+
+    create_results_tables(conn)
+
+    tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    assert LEGACY_TABLE_PREFIX + 'legacy' not in tables
+    loaded = load_simulation_data(conn, 'legacy')
+    assert list(loaded.columns) == ['run', 'timestep', 'lp_tokens', 'agent_behavior', 'seed_a_actions']
+    assert np.allclose(loaded['lp_tokens'], [1.5, 2.5])
+    assert loaded['agent_behavior'].tolist() == ['static', 'static']
+    assert loaded['seed_a_actions'].tolist() == ['{"sell": 0.1}', '{"sell": 0.2}']
+
+def test_arrow_round_trip(conn):
+    create_results_tables(conn)
+    data = simulation_data(runs=[1, 2])
+    save_simulation_data(data, 'param', conn, backend='arrow')
+
+    assert simulation_data_exists(conn, 'param')
+    loaded = load_simulation_data(conn, 'param')
+    assert list(loaded.columns) == list(data.columns)
+    pdt.assert_series_equal(loaded['lp_tokens'], data['lp_tokens'])
+    assert loaded['ua_product_users'].dtype == data['ua_product_users'].dtype
+    assert loaded['date'].tolist() == data['date'].tolist()
+    assert [json.loads(actions) for actions in loaded['seed_a_actions']] == data['seed_a_actions'].tolist()
+
+    loaded = load_simulation_data(conn, 'param', columns=['lp_tokens'], runs=[2])
+    assert list(loaded.columns) == ['run', 'timestep', 'lp_tokens']
+    assert loaded['lp_tokens'].tolist() == [2001.0, 2002.0, 2003.0]
+
+def test_arrow_append_writes_one_file_per_run(conn):
+    create_results_tables(conn)
+    save_simulation_data(simulation_data(runs=[1]), 'param', conn, backend='arrow')
+    result_file = open(get_arrow_path('param'), 'rb').read()
+
+    append_simulation_data(simulation_data(runs=[2, 3]), 'param', conn)
+    append_simulation_data(simulation_data(runs=[4]), 'param', conn)
+
+    # the stored runs are not rewritten
+    assert open(get_arrow_path('param'), 'rb').read() == result_file
+    assert get_arrow_paths('param') == [get_arrow_path('param')] + [get_arrow_run_path('param', run) for run in [2, 3, 4]]
+    assert load_simulation_runs(conn, 'param') == [1, 2, 3, 4]
+    loaded = load_simulation_data(conn, 'param')
+    assert loaded['run'].tolist() == [1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4]
+    assert loaded['lp_tokens'].tolist() == simulation_data(runs=[1, 2, 3, 4])['lp_tokens'].tolist()
+    assert load_simulation_data(conn, 'param', runs=[3])['lp_tokens'].tolist() == [3001.0, 3002.0, 3003.0]
+
+def test_arrow_append_replaces_runs(conn):
+    create_results_tables(conn)
+    save_simulation_data(simulation_data(runs=[1, 2]), 'param', conn, backend='arrow')
+    replaced_run = simulation_data(runs=[1])
+    replaced_run['lp_tokens'] = -1.0
+    append_simulation_data(replaced_run, 'param', conn)
+
+    loaded = load_simulation_data(conn, 'param')
+    assert len(loaded) == 6
+    assert loaded.loc[loaded['run'] == 1, 'lp_tokens'].tolist() == [-1.0, -1.0, -1.0]
+    assert loaded.loc[loaded['run'] == 2, 'lp_tokens'].tolist() == [2001.0, 2002.0, 2003.0]
+
+    # saving the simulation data again replaces the appended runs
+    save_simulation_data(simulation_data(runs=[1]), 'param', conn, backend='arrow')
+    assert get_arrow_paths('param') == [get_arrow_path('param')]
+    assert load_simulation_data(conn, 'param')['lp_tokens'].tolist() == [1001.0, 1002.0, 1003.0]
+
+    delete_simulation_data(conn, 'param')
+    assert get_arrow_paths('param') == []
+    assert not simulation_data_exists(conn, 'param')
+
+def test_sqlite_append_keeps_other_runs(conn):
+    create_results_tables(conn)
+    save_simulation_data(simulation_data(runs=[1, 2]), 'param', conn, backend='sqlite')
+    replaced_run = simulation_data(runs=[2])
+    replaced_run['lp_tokens'] = -1.0
+
+    append_simulation_data(replaced_run, 'param', conn)
+    append_simulation_data(simulation_data(runs=[3]), 'param', conn)
+
+    assert load_simulation_runs(conn, 'param') == [1, 2, 3]
+    loaded = load_simulation_data(conn, 'param')
+    assert loaded['lp_tokens'].tolist() == [1001.0, 1002.0, 1003.0, -1.0, -1.0, -1.0, 3001.0, 3002.0, 3003.0]
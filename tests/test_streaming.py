@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from Model.state_variables import get_initial_state
+from Model.simulation import run_simulation, simulate_parameter_set
+from Model.post_processing import CATEGORIES, extract_columns, extract_state_metrics
+from Model.streaming import STREAM_METRICS, create_stream_sink, load_stream_data, clear_stream
+
+
+def test_sink_stores_the_streamed_metrics(conn):
+    sink = create_stream_sink(conn, 'streamed', metrics=['lp_tokens', 'ua_product_users'])
+    sink({'run': 1, 'timestep': 2, 'lp_tokens': np.float64(2.5), 'ua_product_users': np.int64(20), 'not_streamed': 1.0})
+    sink({'run': 1, 'timestep': 1, 'lp_tokens': 1.5, 'ua_product_users': 10})
+
+    data = load_stream_data(conn, 'streamed', columns=['run', 'timestep', 'lp_tokens', 'ua_product_users', 'te_MC'])
+
+    assert list(data.columns) == ['run', 'timestep', 'lp_tokens', 'ua_product_users', 'te_MC']
+    assert data['timestep'].tolist() == [1, 2]
+    assert data['lp_tokens'].tolist() == [1.5, 2.5]
+    assert data['ua_product_users'].tolist() == [10, 20]
+    # metrics which are not streamed are empty
+    assert data['te_MC'].isna().all()
+    assert list(load_stream_data(conn, 'streamed').columns) == ['run', 'timestep'] + STREAM_METRICS
+
+def test_new_sink_replaces_former_stream(conn):
+    sink = create_stream_sink(conn, 'streamed')
+    sink({'run': 1, 'timestep': 1, 'lp_tokens': 1.0})
+    sink({'run': 1, 'timestep': 2, 'lp_tokens': 2.0})
+    other_sink = create_stream_sink(conn, 'other')
+    other_sink({'run': 1, 'timestep': 1, 'lp_tokens': 5.0})
+
+    sink = create_stream_sink(conn, 'streamed')
+    sink({'run': 1, 'timestep': 1, 'lp_tokens': 3.0})
+
+    assert load_stream_data(conn, 'streamed')['lp_tokens'].tolist() == [3.0]
+    clear_stream(conn, 'streamed')
+    assert len(load_stream_data(conn, 'streamed')) == 0
+    assert load_stream_data(conn, 'other')['lp_tokens'].tolist() == [5.0]
+
+def test_missing_stream_table_loads_empty_data(conn):
+    data = load_stream_data(conn, 'unknown', columns=['lp_tokens'])
+
+    assert len(data) == 0
+    assert list(data.columns) == ['run', 'timestep', 'lp_tokens']
+
+def test_static_engine_streams_every_timestep(workdir, input_file):
+    initial_state, sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim = get_initial_state(input_file, {})
+    rows = []
+
+    data = simulate_parameter_set(initial_state, sys_param, stakeholder_name_mapping, sink=rows.append)
+    conn.close()
+
+    assert len(rows) == len(data)
+    pd.testing.assert_frame_equal(pd.DataFrame(rows)[STREAM_METRICS], data[STREAM_METRICS])
+
+def test_radcad_streams_the_end_of_every_timestep(workdir, input_file):
+    initial_state, sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim = get_initial_state(input_file, {})
+    conn.close()
+    states = []
+
+    df = run_simulation(initial_state, sys_param, timesteps=3, sink=states.append)
+
+    # the state at the end of every timestep
+    assert [state['timestep'] for state in states] == [1, 2, 3]
+    assert [state['substep'] for state in states] == [df.substep.max()] * 3
+    assert [state['date'] for state in states] == df[df.timestep > 0]['date'].tolist()
+    assert [state['liquidity_pool']['lp_tokens'] for state in states] == [pool['lp_tokens'] for pool in df[df.timestep > 0]['liquidity_pool']]
+
+def test_streamed_metrics_are_taken_from_the_state(workdir, input_file):
+    initial_state, sys_param, stakeholder_name_mapping, stakeholder_names, conn, cur, param_id, execute_sim = get_initial_state(input_file, {})
+    conn.close()
+    states = []
+    run_simulation(initial_state, sys_param, timesteps=3, sink=states.append)
+
+    for state in states:
+        row = extract_state_metrics(state, STREAM_METRICS + ['unknown_metric', 'unknown_a_tokens'])
+        columns = {key: values[0] for key, values in extract_columns(pd.DataFrame([state]), CATEGORIES).items()}
+
+        assert set(row) == {'timestep', 'date', 'run'} | set(STREAM_METRICS)
+        assert row == {key: columns[key] for key in row}
@@ -0,0 +1,50 @@
+import itertools
+import pytest
+
+from Model.sweep_grid import count_parameter_grid, iterate_parameter_grid, iterate_chunks
+
+SWEEPS = [
+    {'a': [1], 'b': ['static']},
+    {'a': [1, 2, 3], 'b': ['static'], 'c': [0.1, 0.2]},
+    {'a': [1, 2], 'b': [], 'c': [0.1, 0.2, 0.3]},
+    {'a': [], 'b': []},
+    {},
+]
+
+
+@pytest.mark.parametrize('grid', ['cartesian', 'zip'])
+@pytest.mark.parametrize('sys_param_sweep', SWEEPS)
+def test_count_matches_iteration(sys_param_sweep, grid):
+    assert count_parameter_grid(sys_param_sweep, grid) == len(list(iterate_parameter_grid(sys_param_sweep, grid)))
+
+def test_cartesian_grid():
+    param_sets = list(iterate_parameter_grid({'a': [1, 2, 3], 'b': ['static'], 'c': [0.1, 0.2]}, 'cartesian'))
+
+    assert param_sets == [{'a': a, 'b': 'static', 'c': c} for a, c in itertools.product([1, 2, 3], [0.1, 0.2])]
+
+def test_zip_grid_repeats_the_last_values():
+    param_sets = list(iterate_parameter_grid({'a': [1, 2, 3], 'b': ['static'], 'c': [0.1, 0.2]}, 'zip'))
+
+    assert param_sets == [{'a': 1, 'b': 'static', 'c': 0.1}, {'a': 2, 'b': 'static', 'c': 0.2}, {'a': 3, 'b': 'static', 'c': 0.2}]
+
+def test_empty_lists_are_unset_parameters():
+    for grid in ['cartesian', 'zip']:
+        assert count_parameter_grid({'a': [1], 'b': []}, grid) == 1
+        assert list(iterate_parameter_grid({'a': [1], 'b': []}, grid)) == [{'a': 1}]
+
+def test_grid_is_enumerated_lazily():
+    param_sets = iterate_parameter_grid({f'param_{i}': list(range(10)) for i in range(12)}, 'cartesian')
+
+    assert count_parameter_grid({f'param_{i}': list(range(10)) for i in range(12)}, 'cartesian') == 10**12
+    assert next(param_sets) == {f'param_{i}': 0 for i in range(12)}
+    assert next(param_sets)['param_11'] == 1
+
+def test_unknown_grid():
+    with pytest.raises(ValueError):
+        count_parameter_grid({'a': [1]}, 'diagonal')
+    with pytest.raises(ValueError):
+        list(iterate_parameter_grid({'a': [1]}, 'diagonal'))
+
+def test_iterate_chunks():
+    assert list(iterate_chunks(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iterate_chunks([], 3)) == []
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from Model.sys_params import canonicalize_param_value, get_param_hash, save_sys_param, read_parameter_set, parameter_set_exists
+
+
+def new_sys_param(**params):
+    return {'initial_total_supply': [1e9], 'public_sale_valuation': [5e7], 'agent_behavior': ['static'], **params}
+
+def test_equal_values_are_canonicalized_alike():
+    canonical_values = [canonicalize_param_value(value) for value in [1, 1.0, '1.0', '1', np.float64(1.0), [1.0], True]]
+    assert len(set(canonical_values)) == 1
+
+    assert canonicalize_param_value('static') == 'static'
+    assert canonicalize_param_value(float('nan')) is None
+    assert canonicalize_param_value([1, 2]) == [repr(1.0), repr(2.0)]
+
+def test_param_hash():
+    sys_param = new_sys_param()
+    reordered_sys_param = dict(reversed(list(sys_param.items())))
+
+    assert get_param_hash(sys_param) == get_param_hash(reordered_sys_param)
+    # ids, precomputed parameters and missing values are not part of the hash
+    assert get_param_hash(sys_param) == get_param_hash({**sys_param, 'id': ['other_id'], 'calendar': [object()], 'unset_param': [None]})
+    assert get_param_hash(sys_param) == get_param_hash({key: [str(value[0])] for key, value in sys_param.items()})
+    assert get_param_hash(sys_param) != get_param_hash(new_sys_param(initial_total_supply=[2e9]))
+
+def test_equal_parameter_sets_are_saved_once(conn):
+    cur = conn.cursor()
+    param_id, execute_sim = save_sys_param(new_sys_param(), conn, cur)
+    same_param_id, same_execute_sim = save_sys_param(new_sys_param(), conn, cur)
+    other_param_id, other_execute_sim = save_sys_param(new_sys_param(initial_total_supply=[2e9]), conn, cur)
+
+    assert execute_sim and same_execute_sim and other_execute_sim
+    assert same_param_id == param_id
+    assert other_param_id != param_id
+    assert conn.execute('SELECT count(*) FROM sys_param').fetchone()[0] == 2
+    assert parameter_set_exists(param_id)
+    assert not parameter_set_exists('unknown')
+    assert float(read_parameter_set(other_param_id, columns=['initial_total_supply'])['initial_total_supply']) == 2e9
+    assert read_parameter_set('unknown') is None
+
+def test_legacy_parameter_sets_keep_their_ids(conn):
+    # parameter sets stored before the hash index, incl. a duplicate with a later id
+    legacy_sys_params = pd.DataFrame([{'id': 'legacy_first', **{key: value[0] for key, value in new_sys_param().items()}},
+                                      {'id': 'legacy_duplicate', **{key: value[0] for key, value in new_sys_param().items()}}])
+    legacy_sys_params.to_sql('sys_param', conn, index=False)
+
+    param_id, execute_sim = save_sys_param(new_sys_param(), conn, conn.cursor())
+
+    assert execute_sim
+    assert param_id == 'legacy_first'
+    assert conn.execute('SELECT count(*) FROM sys_param').fetchone()[0] == 2
+    assert conn.execute('SELECT count(*) FROM sys_param_index').fetchone()[0] == 1